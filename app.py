@@ -1,99 +1,93 @@
-from flask import Flask, render_template, request
+from flask import Flask, Response, render_template, request
 from flask_socketio import SocketIO, emit, join_room, leave_room
 import uuid
 from src.state import ConvoState, RequiredInformation
 from src.graph.builder import create_graph
 from src.utils.misc import _print_event
 from langchain_core.messages import HumanMessage, AIMessage, ToolMessage, SystemMessage
-from src.utils.handle_convo import handle_contact_permission, handle_credit_pull_permission
+from src.utils.handle_convo import handle_permission, get_permission_question, PERMISSION_TOOLS
+from src.utils.session_store import create_session_store, checkpoint_restorer
+from src.utils.turn_events import TurnProcessor, replay_emits, save_question
 from src.utils.info_collector import check_all_required_info
+from src.utils.zip_index import get_zip_index
+from src.utils.greeting_cache import get_greeting_cache, greeting_message, seed_checkpoint
+from src.utils.history import warm_tokenizer
+from src.utils.telemetry import CONNECT_SECONDS, render_metrics
+from src.utils.resume_token import get_resume_tokens
 import os
+import time
+import logging
+from contextlib import closing
 from dotenv import load_dotenv
 import json
+from src.utils.log import configure_logging
 
 load_dotenv()
+# Queue-backed logging, LOG_LEVEL / LOG_FORMAT / LOG_DEBUG_SAMPLE (src/utils/log.py)
+configure_logging()
+logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = os.getenv('SECRET_KEY')
-socketio = SocketIO(app, manage_session=False)
+# Set SOCKETIO_MESSAGE_QUEUE (e.g. redis://...) when running several workers so emits reach every client
+socketio = SocketIO(app, manage_session=False, message_queue=os.getenv('SOCKETIO_MESSAGE_QUEUE'))
 
 part_1_graph = create_graph()
-_printed = set()
-session_store = {}
-
-def serialize_message(msg):
-    serialized = {
-        'type': msg.__class__.__name__,
-    }
-    for key, value in msg.__dict__.items():
-        if isinstance(value, (str, int, float, bool, list, dict, type(None))):
-            serialized[key] = value
-    return serialized
-
-def deserialize_message(msg_dict):
-    msg_type = msg_dict.pop('type')
-    message_classes = {
-        'human': HumanMessage,
-        'ai': AIMessage,
-        'tool': ToolMessage,
-        'system': SystemMessage
-    }
-    
-    if msg_type not in message_classes:
-        raise ValueError(f"Unknown message type: {msg_type}")
-    
-    # Create the message object with all the attributes in msg_dict
-    return message_classes[msg_type](**msg_dict)
+get_zip_index()
+warm_tokenizer()
+greeting_cache = get_greeting_cache()
 
 
-def serialize_convo_state(state):
-    return json.dumps({
-        'user_input': state['user_input'],
-        'messages': [serialize_message(msg) for msg in state['messages']],
-        'required_information': state['required_information'].__dict__,
-        'contact_permission': state['contact_permission'],
-        'credit_pull_permission': state['credit_pull_permission'],
-        'credit_pull_complete': state['credit_pull_complete'],
-        'lead_create_complete': state['lead_create_complete'],
-        'savings_estimate': state['savings_estimate'],
-        'reason_for_decline': state['reason_for_decline']
-    })
+def start_worker_tasks():
+    """Background threads of a serving process."""
+    greeting_cache.start()
 
-def deserialize_convo_state(state_json):
-    state_dict = json.loads(state_json)
-    return ConvoState(
-        user_input=state_dict['user_input'],
-        messages=[deserialize_message(msg) for msg in state_dict['messages']],
-        required_information=RequiredInformation(**state_dict['required_information']),
-        contact_permission=state_dict['contact_permission'],
-        credit_pull_permission=state_dict['credit_pull_permission'],
-        credit_pull_complete=state_dict['credit_pull_complete'],
-        lead_create_complete=state_dict['lead_create_complete'],
-        savings_estimate=state_dict['savings_estimate'],
-        reason_for_decline=state_dict['reason_for_decline']
-    )
 
+# With gunicorn --preload (GUNICORN_PRELOAD=1, see gunicorn.conf.py) this module is
+# imported once in the master and workers are forked from it. Threads do not
+# survive a fork, and anything that opens connections must not run before it,
+# so the master only warms up and post_fork calls start_worker_tasks().
+if os.getenv('GUNICORN_PRELOAD') != '1':
+    start_worker_tasks()
+_printed = set()
+# Rebuilds a thread's state from the graph's checkpoint: for sessions evicted from
+# the store (idle or over budget) and for clients resuming with a resume token
+restore_session = checkpoint_restorer(part_1_graph)
+session_store = create_session_store(restore=restore_session)
+resume_tokens = get_resume_tokens()
 
 @app.route('/')
 def index():
     return render_template('index.html')
 
 
+@app.route('/metrics')
+def metrics():
+    # Prometheus scrape endpoint: turn, span and token histograms (src/utils/telemetry.py)
+    body, content_type = render_metrics()
+    return Response(body, content_type=content_type)
+
+
 @socketio.on('connect')
-def handle_connect():
-    print('Client connected')
+def handle_connect(auth=None):
+    logger.info('Client connected: %s', request.sid)
+    started = time.perf_counter()
     session_id = request.sid
     join_room(session_id)
+    if resume_session(session_id, auth):
+        CONNECT_SECONDS.labels("resume").observe(time.perf_counter() - started)
+        return
     thread_id = str(uuid.uuid4())
     config = {
         "configurable": {
             "thread_id": thread_id,
         }
     }
-    initial_message = generate_initial_message(config)
+    # Pre-generated greeting instead of a graph run on "." (see src/utils/greeting_cache.py)
+    initial_message = greeting_message(greeting_cache.get())
     initial_state = ConvoState(
         user_input="",
-        messages=[AIMessage(content=initial_message)],
+        messages=[initial_message],
         required_information=RequiredInformation(),
         contact_permission=None,
         credit_pull_permission=None,
@@ -102,42 +96,71 @@ def handle_connect():
         savings_estimate=None,
         reason_for_decline=None
     )
-    session_store[session_id] = {
-        'state': serialize_convo_state(initial_state),
-        'config': config
+    session_store.create(session_id, initial_state, config)
+    logger.info("Session %s initialized with thread_id: %s", session_id, thread_id)
+    emit('session', {'resume_token': resume_tokens.issue(thread_id)}, room=session_id)
+    emit('bot_response', {'message': initial_message.content, 'id': initial_message.id}, room=session_id)
+    seed_checkpoint(part_1_graph, config, initial_state)
+    CONNECT_SECONDS.labels("new").observe(time.perf_counter() - started)
+
+
+def resume_session(session_id, auth):
+    """Continue the thread of the client's resume token, if it has one that is still good.
+
+    The state comes from the checkpointer and the replies the client has not
+    seen (after auth's last_message_id) are replayed; no model call is made.
+    Returns False when the client should start a new conversation instead.
+    """
+    if not isinstance(auth, dict) or not auth.get('resume_token'):
+        return False
+    thread_id = resume_tokens.verify(auth['resume_token'])
+    if thread_id is None:
+        logger.info("Session %s sent an invalid or expired resume token", session_id)
+        return False
+    config = {
+        "configurable": {
+            "thread_id": thread_id,
+        }
     }
-    print(f"Session {session_id} initialized with thread_id: {thread_id}")
-    emit('bot_response', {'message': initial_message}, room=session_id)
+    state = restore_session(config)
+    if state is None:
+        logger.info("Session %s cannot resume thread_id %s, no checkpoint", session_id, thread_id)
+        return False
+    session_store.create(session_id, state, config)
+    logger.info("Session %s resumed thread_id: %s", session_id, thread_id)
+    emit('session', {'resume_token': resume_tokens.issue(thread_id)}, room=session_id)
+    for name, payload in replay_emits(state, auth.get('last_message_id')):
+        emit(name, payload, room=session_id)
+    return True
 
 
 @socketio.on('disconnect')
 def handle_disconnect():
     session_id = request.sid
-    print(f'Client disconnected: {session_id}')
+    logger.info('Client disconnected: %s', session_id)
     leave_room(session_id)
-    if session_id in session_store:
-        del session_store[session_id]
-        print(f"Session {session_id} removed")
+    if session_store.delete(session_id):
+        logger.debug("Session %s removed", session_id)
 
 @socketio.on('user_message')
 def handle_message(message):
     session_id = request.sid
-    print(f"Received message from {session_id}: {message}")
-    if session_id not in session_store:
-        print(f"Session {session_id} not found")
+    logger.debug("Received message from %s: %s", session_id, message)
+    session = session_store.load(session_id)
+    if session is None:
+        logger.info("Session %s not found", session_id)
         emit('bot_response', {'message': "Session expired. Please refresh the page."}, room=session_id)
         return
     
     try:
-        conversation_state = deserialize_convo_state(session_store[session_id]['state'])
-        config = session_store[session_id]['config']
+        conversation_state, config = session
         conversation_state['user_input'] = message
         conversation_state['messages'].append(HumanMessage(content=message))
         updated_state = process_message(conversation_state, session_id, config)
-        session_store[session_id]['state'] = serialize_convo_state(updated_state)
-        print(f"Updated session {session_id} with new state")
-    except Exception as e:
-        print(f"Error processing message: {str(e)}")
+        session_store.save(session_id, updated_state)
+        logger.debug("Updated session %s with new state", session_id)
+    except Exception:
+        logger.exception("Error processing message for %s", session_id)
         emit('bot_response', {'message': "An error occurred. Please try again."}, room=session_id)
 
 # @socketio.on('user_input_response')
@@ -188,17 +211,17 @@ def handle_message(message):
 @socketio.on('user_input_response')
 def handle_user_input_response(data):
     session_id = request.sid
-    if session_id not in session_store:
+    session = session_store.load(session_id)
+    if session is None:
         emit('bot_response', {'message': "Session expired. Please refresh the page."}, room=session_id)
         return
     
-    conversation_state = deserialize_convo_state(session_store[session_id]['state'])
-    config = session_store[session_id]['config']
+    conversation_state, config = session
     tool_name = data['tool_name']
     user_response = data['response'].lower()
     tool_call_id = data['tool_call_id']
     
-    if tool_name in ["AskContactPermissionTool", "AskCreditPullPermissionTool"]:
+    if tool_name in PERMISSION_TOOLS:
         if user_response not in ['yes', 'no']:
             question = get_permission_question(tool_name)
             emit('user_input_required', {
@@ -223,62 +246,28 @@ def handle_user_input_response(data):
         
         conversation_state.update(result)
         updated_state = process_message(conversation_state, session_id, config)
-        session_store[session_id]['state'] = serialize_convo_state(updated_state)
+        session_store.save(session_id, updated_state)
     else:
         emit('bot_response', {'message': "Unknown tool called."}, room=session_id)
 
-def handle_permission(conversation_state, tool_name, user_response):
-    if tool_name == "AskContactPermissionTool":
-        return handle_contact_permission(conversation_state, user_response)
-    elif tool_name == "AskCreditPullPermissionTool":
-        return handle_credit_pull_permission(conversation_state, user_response)
-    else:
-        return {"message": "Unknown permission tool.", "invalid_input": True}
-
 def process_message(state, session_id, config):
-    events = part_1_graph.stream(state, config, stream_mode="values")
-    
-    for event in events:
-        message = event.get("messages")
-        if message:
-            if isinstance(message, list):
-                message = message[-1]
-            if message.id not in _printed:
-                if isinstance(message, AIMessage):
-                    if len(message.content.strip()) > 0:
-                        socketio.emit('bot_response', {'message': message.content}, room=session_id)
-                    if message.tool_calls:
-                        for tool_call in message.tool_calls:
-                            tool_name = tool_call["name"]
-                            tool_call_id = tool_call["id"]
-                            if tool_name in ["AskContactPermissionTool", "AskCreditPullPermissionTool"]:
-                                question = get_permission_question(tool_name)
-                                state['messages'].append(message)
-                                _print_event(event, _printed)
-                                socketio.emit('user_input_required', {
-                                    'tool_name': tool_name,
-                                    'tool_call_id': tool_call_id,
-                                    'message': question
-                                }, room=session_id)
-                                return state
+    turn = TurnProcessor(state, _printed)
+    question = []
 
-        _print_event(event, _printed)
-        
-        # Update the state with any new information from the event
-        for key in ['required_information', 'contact_permission', 'credit_pull_permission', 'credit_pull_complete', 'lead_create_complete', 'savings_estimate', 'reason_for_decline']:
-            if key in event:
-                state[key] = event[key]
+    with closing(part_1_graph.stream(state, turn.config(config), stream_mode="values")) as events:
+        for event in events:
+            emits = turn.feed(event)
+            if turn.done:
+                # Held back until the question is checkpointed, so a client resuming right away finds it
+                question = emits
+                break
+            for name, payload in emits:
+                socketio.emit(name, payload, room=session_id)
 
-    state['messages'].append(message)
-    return state
-
-def get_permission_question(tool_name):
-    if tool_name == "AskContactPermissionTool":
-        return "Do you give permission for us to contact you through email or phone number provided?* (Please type: yes or no) \n * **You understand that by typing 'yes', you are providing your consent for a ClearOne Advantage representative or one of our marketing partners or network providers to contact you by email, text and phone, which may include pre-recorded messages and use automated technology. Your consent to such contact is not required as a condition to use a network service provider. You can unsubscribe at any time.** "
-    elif tool_name == "AskCreditPullPermissionTool":
-        return "Do you give permission for us to obtain your credit profile? This will NOT affect your credit score.† (Please type: yes or no) \n † **You understand that by typing 'yes', you are providing written instructions to ClearOne Advantage, LLC (ClearOne) under the Fair Credit Reporting Act authorizing ClearOne Advantage to obtain information from your personal credit report or other information from a credit bureau solely for debt settlement. This will not impact your credit.** "
-    else:
-        raise ValueError(f"Unknown tool name: {tool_name}")
+    save_question(part_1_graph, config, turn)
+    for name, payload in question:
+        socketio.emit(name, payload, room=session_id)
+    return turn.finish()
 
 # def process_message(state, session_id, config):
 #     events = part_1_graph.stream(state, config, stream_mode="values")
@@ -353,21 +342,6 @@ def get_permission_question(tool_name):
 #     state['messages'].append(message)
 #     return state
 
-def generate_initial_message(config):
-    initial_state = ConvoState(
-        user_input=".",
-        messages=[HumanMessage(content=".")],
-    )
-    events = part_1_graph.stream(initial_state, config, stream_mode="values")
-    
-    for event in events:
-        if 'messages' in event:
-            for msg in event['messages']:
-                if isinstance(msg, AIMessage):
-                    return msg.content
-    
-    return "Hello! I'm Claire, a debt resolution specialist at ClearOne Advantage. How can I assist you today? May I have your first name to get started?"
-
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 8080))
     socketio.run(app, host='0.0.0.0', port=port)
\ No newline at end of file
@@ -0,0 +1,221 @@
+import os
+import time
+import uuid
+import asyncio
+import json
+import logging
+from contextlib import aclosing
+import socketio
+from asgiref.wsgi import WsgiToAsgi
+from langchain_core.messages import HumanMessage, ToolMessage
+from src.state import ConvoState, RequiredInformation
+from src.utils.handle_convo import handle_permission, get_permission_question, PERMISSION_TOOLS
+from src.utils.turn_events import TurnProcessor, replay_emits, asave_question
+from src.utils.info_collector import EXTRACTOR_TAG
+from src.utils.greeting_cache import greeting_message, aseed_checkpoint
+from src.utils.telemetry import CONNECT_SECONDS
+# Reuse the Flask routes, compiled graph and session store of the eventlet server
+from app import app as flask_app, part_1_graph, session_store, restore_session, resume_tokens, greeting_cache, _printed
+
+logger = logging.getLogger(__name__)
+
+# ASGI entrypoint: Socket.IO handlers run on the event loop and drive the graph with
+# astream, so one slow LLM or API call no longer stalls every other session in the worker.
+# SOCKETIO_MESSAGE_QUEUE lets workers emit to clients connected to another worker
+_message_queue = os.getenv('SOCKETIO_MESSAGE_QUEUE')
+sio = socketio.AsyncServer(
+    async_mode="asgi",
+    client_manager=socketio.AsyncRedisManager(_message_queue) if _message_queue else None,
+)
+asgi_app = socketio.ASGIApp(sio, other_asgi_app=WsgiToAsgi(flask_app))
+
+# Emit the assistant's reply token by token (bot_response_delta); STREAM_TOKENS=0
+# falls back to one bot_response per finished message.
+STREAM_TOKENS = os.getenv('STREAM_TOKENS', '1') != '0'
+
+
+@sio.event
+async def connect(sid, environ, auth=None):
+    logger.info('Client connected: %s', sid)
+    started = time.perf_counter()
+    if await resume_session(sid, auth):
+        CONNECT_SECONDS.labels("resume").observe(time.perf_counter() - started)
+        return
+    thread_id = str(uuid.uuid4())
+    config = {
+        "configurable": {
+            "thread_id": thread_id,
+        }
+    }
+    initial_message = greeting_message(greeting_cache.get())
+    initial_state = ConvoState(
+        user_input="",
+        messages=[initial_message],
+        required_information=RequiredInformation(),
+        contact_permission=None,
+        credit_pull_permission=None,
+        credit_pull_complete=None,
+        lead_create_complete=None,
+        savings_estimate=None,
+        reason_for_decline=None
+    )
+    await session_store.acreate(sid, initial_state, config)
+    logger.info("Session %s initialized with thread_id: %s", sid, thread_id)
+    await sio.emit('session', {'resume_token': resume_tokens.issue(thread_id)}, room=sid)
+    await sio.emit('bot_response', {'message': initial_message.content, 'id': initial_message.id}, room=sid)
+    await aseed_checkpoint(part_1_graph, config, initial_state)
+    CONNECT_SECONDS.labels("new").observe(time.perf_counter() - started)
+
+
+async def resume_session(sid, auth):
+    # See app.resume_session
+    if not isinstance(auth, dict) or not auth.get('resume_token'):
+        return False
+    thread_id = resume_tokens.verify(auth['resume_token'])
+    if thread_id is None:
+        logger.info("Session %s sent an invalid or expired resume token", sid)
+        return False
+    config = {
+        "configurable": {
+            "thread_id": thread_id,
+        }
+    }
+    # The checkpointer's get_tuple blocks (MSSQLSaver queries the database)
+    state = await asyncio.to_thread(restore_session, config)
+    if state is None:
+        logger.info("Session %s cannot resume thread_id %s, no checkpoint", sid, thread_id)
+        return False
+    await session_store.acreate(sid, state, config)
+    logger.info("Session %s resumed thread_id: %s", sid, thread_id)
+    await sio.emit('session', {'resume_token': resume_tokens.issue(thread_id)}, room=sid)
+    for name, payload in replay_emits(state, auth.get('last_message_id')):
+        await sio.emit(name, payload, room=sid)
+    return True
+
+
+@sio.event
+async def disconnect(sid):
+    logger.info('Client disconnected: %s', sid)
+    if await session_store.adelete(sid):
+        logger.debug("Session %s removed", sid)
+
+
+@sio.on('user_message')
+async def handle_message(sid, message):
+    logger.debug("Received message from %s: %s", sid, message)
+    session = await session_store.aload(sid)
+    if session is None:
+        logger.info("Session %s not found", sid)
+        await sio.emit('bot_response', {'message': "Session expired. Please refresh the page."}, room=sid)
+        return
+
+    try:
+        conversation_state, config = session
+        conversation_state['user_input'] = message
+        conversation_state['messages'].append(HumanMessage(content=message))
+        updated_state = await process_message(conversation_state, sid, config)
+        await session_store.asave(sid, updated_state)
+        logger.debug("Updated session %s with new state", sid)
+    except Exception:
+        logger.exception("Error processing message for %s", sid)
+        await sio.emit('bot_response', {'message': "An error occurred. Please try again."}, room=sid)
+
+
+@sio.on('user_input_response')
+async def handle_user_input_response(sid, data):
+    session = await session_store.aload(sid)
+    if session is None:
+        await sio.emit('bot_response', {'message': "Session expired. Please refresh the page."}, room=sid)
+        return
+
+    conversation_state, config = session
+    tool_name = data['tool_name']
+    user_response = data['response'].lower()
+    tool_call_id = data['tool_call_id']
+
+    if tool_name in PERMISSION_TOOLS:
+        if user_response not in ['yes', 'no']:
+            question = get_permission_question(tool_name)
+            await sio.emit('user_input_required', {
+                'tool_name': tool_name,
+                'tool_call_id': tool_call_id,
+                'message': f"Invalid input. {question}"
+            }, room=sid)
+            return
+
+        result = handle_permission(conversation_state, tool_name, user_response)
+
+        if result.get("invalid_input"):
+            await sio.emit('user_input_required', {
+                'tool_name': tool_name,
+                'tool_call_id': tool_call_id,
+                'message': result["message"]
+            }, room=sid)
+            return
+
+        tool_message = ToolMessage(content=json.dumps(result), tool_call_id=tool_call_id)
+        conversation_state['messages'].append(tool_message)
+
+        conversation_state.update(result)
+        updated_state = await process_message(conversation_state, sid, config)
+        await session_store.asave(sid, updated_state)
+    else:
+        await sio.emit('bot_response', {'message': "Unknown tool called."}, room=sid)
+
+
+async def process_message(state, session_id, config):
+    if not STREAM_TOKENS:
+        return await process_message_values(state, session_id, config)
+
+    turn = TurnProcessor(state, _printed)
+    question = []
+    # astream_events makes the chat models stream; the graph's own "values" output
+    # arrives as on_chain_stream events of the root run (no parent).
+    async with aclosing(part_1_graph.astream_events(state, turn.config(config), version="v2", stream_mode="values")) as events:
+        async for event in events:
+            kind = event["event"]
+            if kind == "on_chat_model_stream":
+                if event["metadata"].get("langgraph_node") != "assistant" or EXTRACTOR_TAG in event.get("tags", []):
+                    continue
+                emits = turn.feed_token(event["data"]["chunk"])
+            elif kind == "on_chain_stream" and not event["parent_ids"]:
+                emits = turn.feed(event["data"]["chunk"])
+            else:
+                continue
+            if turn.done:
+                # Held back until the question is checkpointed, so a client resuming right away finds it
+                question = emits
+                break
+            for name, payload in emits:
+                await sio.emit(name, payload, room=session_id)
+
+    await asave_question(part_1_graph, config, turn)
+    for name, payload in question:
+        await sio.emit(name, payload, room=session_id)
+    return turn.finish()
+
+
+async def process_message_values(state, session_id, config):
+    turn = TurnProcessor(state, _printed)
+    question = []
+
+    async with aclosing(part_1_graph.astream(state, turn.config(config), stream_mode="values")) as events:
+        async for event in events:
+            emits = turn.feed(event)
+            if turn.done:
+                question = emits
+                break
+            for name, payload in emits:
+                await sio.emit(name, payload, room=session_id)
+
+    await asave_question(part_1_graph, config, turn)
+    for name, payload in question:
+        await sio.emit(name, payload, room=session_id)
+    return turn.finish()
+
+
+if __name__ == '__main__':
+    import uvicorn
+
+    port = int(os.environ.get('PORT', 8080))
+    uvicorn.run(asgi_app, host='0.0.0.0', port=port)
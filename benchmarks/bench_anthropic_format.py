@@ -0,0 +1,138 @@
+"""CustomChatAnthropic message formatting cost at 50, 200 and 1000 messages.
+
+Compared per request:
+  legacy   - the previous path: deep copy of every message in _merge_messages, then format
+  cold     - _format_messages_2 with an empty formatted-message cache
+  reload   - _format_messages_2 on a fresh copy of the same history (as after a
+             checkpoint load: new objects, same ids), so every message is a cache hit
+  turn     - one new user/assistant exchange appended per request on top of the history
+
+Also checks that legacy and the new formatter produce identical payloads.
+
+Usage: python -m benchmarks.bench_anthropic_format [--sizes 50 200 1000] [--repeat 50]
+"""
+import argparse
+import copy
+import time
+import uuid
+
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+
+from src.utils import custom_chat_anthropic as cca
+
+
+def legacy_merge_messages(messages):
+    # The previous _merge_messages
+    merged = []
+    for curr in messages:
+        curr = curr.copy(deep=True)
+        if isinstance(curr, ToolMessage):
+            curr = HumanMessage([{"type": "tool_result", "content": curr.content, "tool_use_id": curr.tool_call_id}])
+        elif isinstance(curr, SystemMessage):
+            # Notes within the conversation, as _split_system_messages used to wrap them
+            curr = HumanMessage([{"type": "text", "text": curr.content}])
+        last = merged[-1] if merged else None
+        if isinstance(last, HumanMessage) and isinstance(curr, HumanMessage):
+            new_content = [{"type": "text", "text": last.content}] if isinstance(last.content, str) else last.content
+            if isinstance(curr.content, str):
+                new_content.append({"type": "text", "text": curr.content})
+            else:
+                new_content.extend(curr.content)
+            last.content = new_content
+        else:
+            merged.append(curr)
+    return merged
+
+
+def legacy_format_messages(messages):
+    system, body, trailing = cca._split_system_messages(messages)
+    formatted = []
+    for message in legacy_merge_messages(body):
+        role = cca._message_type_lookups[message.type]
+        if not isinstance(message.content, str):
+            content = cca._format_content_blocks(message, message.content)
+        elif isinstance(message, AIMessage) and message.tool_calls:
+            content = ([] if not message.content else [{"type": "text", "text": message.content}]) + cca._lc_tool_calls_to_anthropic_tool_use_blocks(message.tool_calls)
+        else:
+            content = message.content
+        formatted.append({"role": role, "content": content})
+    return system, formatted, trailing
+
+
+def make_exchange(i):
+    new_id = lambda: str(uuid.uuid4())
+    call_id = f"toolu_{i}"
+    kind = i % 4
+    if kind == 0:
+        return [HumanMessage(content=f"My debt is about {20000 + i} and my zip is 10001", id=new_id()),
+                AIMessage(content="Thanks! Let me estimate your savings.", id=new_id(), tool_calls=[{"name": "savings_estimate_tool", "args": {"debt": 20000 + i}, "id": call_id}]),
+                ToolMessage(content='{"monthly_payment": 412.5, "months": 48}', tool_call_id=call_id, id=new_id()),
+                AIMessage(content="You could pay about $412 a month over 48 months.", id=new_id())]
+    if kind == 1:
+        return [HumanMessage(content="My zip is 10001", id=new_id()),
+                SystemMessage(content="Inferred City: New York, Inferred State: NY", id=new_id()),
+                AIMessage(content="Got it, New York. What's the best email to reach you?", id=new_id())]
+    if kind == 2:
+        # Anthropic-style list content with a tool_use block
+        return [HumanMessage(content="Yes, you can contact me", id=new_id()),
+                AIMessage(content=[{"type": "text", "text": "Great, one moment."}, {"type": "tool_use", "id": call_id, "name": "ask_credit_pull_permission_tool", "input": {}}],
+                          tool_calls=[{"name": "ask_credit_pull_permission_tool", "args": {}, "id": call_id}], id=new_id()),
+                ToolMessage(content="Permission requested", tool_call_id=call_id, id=new_id())]
+    return [HumanMessage(content="Sounds good, what's next?", id=new_id()),
+            AIMessage(content="Next I'll need your date of birth to check eligibility.", id=new_id())]
+
+
+def make_history(size):
+    messages = [SystemMessage(content="You are Claire. " * 200)]
+    i = 0
+    while len(messages) < size:
+        messages.extend(make_exchange(i))
+        i += 1
+    return messages[:size] + [SystemMessage(content="Begin based on the latest user input: next.")]
+
+
+def per_call_ms(fn, repeat):
+    start = time.perf_counter()
+    for i in range(repeat):
+        fn(i)
+    return (time.perf_counter() - start) / repeat * 1e3
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[50, 200, 1000])
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    print(f"{'messages':>8} {'legacy':>9} {'cold':>9} {'reload':>9} {'turn':>9}   (ms/request)")
+    for size in args.sizes:
+        history = make_history(size)
+        assert legacy_format_messages(history) == cca._format_messages_2(history), "formatter output differs from legacy"
+
+        legacy_ms = per_call_ms(lambda _: legacy_format_messages(history), args.repeat)
+
+        def cold(_):
+            cca._formatted_cache.clear()
+            cca._format_messages_2(history)
+
+        cold_ms = per_call_ms(cold, args.repeat)
+
+        reloads = [copy.deepcopy(history) for _ in range(args.repeat)]
+        cca._format_messages_2(history)
+        reload_ms = per_call_ms(lambda i: cca._format_messages_2(reloads[i]), args.repeat)
+
+        growing = list(history[:-1])
+        cca._format_messages_2(growing)
+        exchanges = [make_exchange(i) for i in range(args.repeat)]
+
+        def turn(i):
+            growing.extend(exchanges[i])
+            cca._format_messages_2(growing + history[-1:])
+
+        turn_ms = per_call_ms(turn, args.repeat)
+        assert legacy_format_messages(growing) == cca._format_messages_2(growing), "formatter output differs from legacy"
+        print(f"{size:>8} {legacy_ms:>9.3f} {cold_ms:>9.3f} {reload_ms:>9.3f} {turn_ms:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""Tool latency against the stand-in carbon API with injected latency and faults.
+
+Runs the credit-pull tool call `--calls` times from `--threads` threads, once
+with the previous implementation (bare requests.post, no timeout, no session)
+and once through src/utils/http_client.py, and once more with the async tool
+on one event loop. Reports p50/p99/max latency and how many calls came back
+with a usable API response.
+
+Usage: python -m benchmarks.bench_api_tools [--calls 400] [--threads 16] [--hang-rate 0.02] [--hang-s 10]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from benchmarks.stub_carbon_api import Faults, start_stub_server
+
+REQUEST = {"FirstName": "Alex", "LastName": "Smith", "Zip": "10001", "Debt": 23000}
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+
+def legacy_post(url):
+    # The pre-http_client _post
+    response = requests.post(url, json=REQUEST, headers={"APIKEY": "x"})
+    try:
+        response.raise_for_status()
+    except requests.exceptions.HTTPError:
+        pass
+    return response.json()
+
+
+def timed(fn):
+    start = time.perf_counter()
+    try:
+        result = fn()
+        ok = bool(result.get("Success"))
+    except Exception:
+        ok = False
+    return time.perf_counter() - start, ok
+
+
+def run_threads(fn, calls, threads):
+    with ThreadPoolExecutor(threads) as pool:
+        return list(pool.map(lambda _: timed(fn), range(calls)))
+
+
+async def run_async(fn, calls, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                ok = bool((await fn()).get("Success"))
+            except Exception:
+                ok = False
+            return time.perf_counter() - start, ok
+
+    return await asyncio.gather(*(one() for _ in range(calls)))
+
+
+def report(name, results):
+    latencies = [latency for latency, _ in results]
+    ok = sum(1 for _, success in results if success)
+    print(
+        f"{name:<14} {len(results):>6} {ok:>6} {statistics.median(latencies) * 1e3:>10.1f} "
+        f"{percentile(latencies, 99) * 1e3:>10.1f} {max(latencies) * 1e3:>10.1f}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=400)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--latency-ms", type=float, default=80.0)
+    parser.add_argument("--error-rate", type=float, default=0.05)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    parser.add_argument("--hang-rate", type=float, default=0.02)
+    parser.add_argument("--hang-s", type=float, default=10.0)
+    parser.add_argument("--read-timeout", type=float, default=1.0)
+    parser.add_argument("--deadline", type=float, default=3.0)
+    args = parser.parse_args()
+
+    faults = dict(latency_ms=args.latency_ms, error_rate=args.error_rate, fail_rate=args.fail_rate, hang_rate=args.hang_rate, hang_s=args.hang_s)
+    server = start_stub_server(0, Faults(seed=1, **faults))
+    os.environ["CARBON_API_BASE_URL"] = f"http://127.0.0.1:{server.server_port}"
+    os.environ["CARBON_READ_TIMEOUT"] = str(args.read_timeout)
+    os.environ["CARBON_DEADLINE"] = str(args.deadline)
+    # After the env is set: the tools read the base URL and timeouts at import
+    from src.tools import api_tools
+    from src.utils.http_client import get_http_client
+
+    print(f"stub: {faults}; read timeout {args.read_timeout}s, deadline {args.deadline}s")
+    print(f"{'client':<14} {'calls':>6} {'ok':>6} {'p50 ms':>10} {'p99 ms':>10} {'max ms':>10}")
+    report("legacy", run_threads(lambda: legacy_post(api_tools.CREDIT_PULL_URL), args.calls, args.threads))
+
+    def tool_call():
+        return api_tools.credit_pull_api(REQUEST, True, True, None, None, None, None)
+
+    report("http_client", run_threads(tool_call, args.calls, args.threads))
+
+    async def atool_call():
+        return await api_tools.acredit_pull_api(REQUEST, True, True, None, None, None, None)
+
+    report("http_client/a", asyncio.run(run_async(atool_call, args.calls, args.threads)))
+    print(f"client stats: {get_http_client().stats}")
+    print(f"stub counts:  {server.faults.counts}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Bytes written per turn and get_tuple latency for full-blob vs delta checkpoints.
+
+Usage: python -m benchmarks.bench_checkpoint_delta [--turns 10 50 200]
+"""
+import argparse
+import sqlite3
+import statistics
+import time
+import uuid
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+from benchmarks.sqlite_standin import SQLiteStandInSaver
+
+AI_REPLY = (
+    "Thank you for sharing that with me. I understand how stressful managing debt can be, "
+    "and I'm here to help you explore options that could lower your monthly payments. "
+) * 3
+
+
+def stored_bytes(path):
+    conn = sqlite3.connect(path)
+    try:
+        return sum(
+            conn.execute(f"SELECT COALESCE(SUM(LENGTH({col})), 0) FROM {table}").fetchone()[0]
+            for table, col in (
+                ("checkpoints_data", "checkpoint_blob"),
+                ("checkpoints_data", "metadata"),
+                ("channel_blobs_data", "value"),
+                ("messages_data", "message_blob"),
+            )
+        )
+    finally:
+        conn.close()
+
+
+def run(delta, turns, reads=20):
+    saver = SQLiteStandInSaver(delta_checkpoints=delta)
+    saver.setup()
+    thread_id = str(uuid.uuid4())
+    messages = []
+    parent_ts = None
+    step = 0
+    last_turn_bytes = 0
+    for turn in range(turns):
+        before = stored_bytes(saver.path)
+        messages = messages + [HumanMessage(content=f"user message {turn}", id=str(uuid.uuid4()))]
+        # one checkpoint for the input, one for the assistant reply
+        for new_message in (None, AIMessage(content=AI_REPLY, id=str(uuid.uuid4()))):
+            if new_message is not None:
+                messages = messages + [new_message]
+            step += 1
+            checkpoint = {
+                "v": 1,
+                "id": f"{step:012d}",
+                "ts": "",
+                "channel_values": {
+                    "messages": messages,
+                    "user_input": f"user message {turn}",
+                    "required_information": {"FirstName": "Nick", "Debt": 25000.0},
+                },
+                "channel_versions": {"messages": f"{step:032}.", "user_input": f"{turn:032}.", "required_information": "1"},
+                "versions_seen": {},
+            }
+            config = saver.put({"configurable": {"thread_id": thread_id, "thread_ts": parent_ts}}, checkpoint, {"step": step})
+            parent_ts = config["configurable"]["thread_ts"]
+        last_turn_bytes = stored_bytes(saver.path) - before
+
+    # First read from a fresh process-level saver, i.e. no warm message cache
+    cold_saver = SQLiteStandInSaver(path=saver.path, delta_checkpoints=delta)
+    start = time.perf_counter()
+    cold_saver.get_tuple({"configurable": {"thread_id": thread_id}})
+    cold_latency = time.perf_counter() - start
+
+    latencies = []
+    for _ in range(reads):
+        start = time.perf_counter()
+        saver.get_tuple({"configurable": {"thread_id": thread_id}})
+        latencies.append(time.perf_counter() - start)
+    return last_turn_bytes, stored_bytes(saver.path), cold_latency, statistics.median(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--turns", type=int, nargs="+", default=[10, 50, 200])
+    args = parser.parse_args()
+
+    print(f"{'turns':>6} {'format':>6} {'bytes/turn':>12} {'total bytes':>12} {'cold get ms':>12} {'warm get ms':>12}")
+    for turns in args.turns:
+        for delta in (False, True):
+            per_turn, total, cold, warm = run(delta, turns)
+            print(f"{turns:>6} {'delta' if delta else 'full':>6} {per_turn:>12} {total:>12} {cold * 1e3:>12.2f} {warm * 1e3:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
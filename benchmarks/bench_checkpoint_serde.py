@@ -0,0 +1,117 @@
+"""Checkpoint serde cost on the real-shaped checkpoint in conversation_history_deserialized.txt.
+
+Compares JsonPlusSerializerCompat (the previous MSSQLSaver.serde) with
+MsgpackSerializer, with and without zstd:
+- size and dumps/loads time of the whole checkpoint (full-blob rows);
+- time per message (delta rows, one blob per message);
+- get_next_version for the messages channel: md5 over a re-serialization
+  before, a random suffix now;
+- put + get_tuple through the sqlite stand-in of MSSQLSaver.
+
+Also checks that every serde round-trips the checkpoint unchanged, and that a
+msgpack saver reads rows a JSON saver wrote.
+
+Usage: python -m benchmarks.bench_checkpoint_serde [--path conversation_history_deserialized.txt] [--repeat 200]
+"""
+import argparse
+import time
+import uuid
+from hashlib import md5
+
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage  # noqa: F401 (eval namespace)
+from langgraph.checkpoint.sqlite import JsonPlusSerializerCompat
+
+from benchmarks.sqlite_standin import SQLiteStandInSaver
+from src.state import RequiredInformation  # noqa: F401 (eval namespace)
+from src.utils.checkpoint_serde import MsgpackSerializer
+
+
+def load_checkpoint(path):
+    # The file is the repr of a checkpoint read back from production
+    with open(path) as f:
+        return eval(f.read())
+
+
+def per_call_us(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def saver_round_trip(serde, checkpoint, repeat):
+    saver = SQLiteStandInSaver(serde=serde, delta_checkpoints=False)
+    saver.setup()
+    thread_id = str(uuid.uuid4())
+    config = {"configurable": {"thread_id": thread_id}}
+
+    def put():
+        saver.put(config, {**checkpoint, "id": str(uuid.uuid4())}, {"step": 1})
+
+    def get():
+        saver.get_tuple(config)
+
+    return per_call_us(put, repeat), per_call_us(get, repeat)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--path", default="conversation_history_deserialized.txt")
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    checkpoint = load_checkpoint(args.path)
+    messages = checkpoint["channel_values"]["messages"]
+    serdes = {
+        "jsonplus": JsonPlusSerializerCompat(),
+        "msgpack": MsgpackSerializer(),
+        "msgpack+zstd": MsgpackSerializer(compress_min_bytes=1024),
+    }
+    print(f"checkpoint with {len(messages)} messages, {len(checkpoint['channel_values'])} channels")
+    print(f"{'serde':<14} {'bytes':>7} {'dumps us':>9} {'loads us':>9} {'msg dumps us':>13} {'msg loads us':>13} {'put us':>8} {'get us':>8}")
+
+    failures = []
+    for name, serde in serdes.items():
+        blob = serde.dumps(checkpoint)
+        if serde.loads(blob) != checkpoint:
+            failures.append(f"{name}: checkpoint changed in a round trip")
+        message_blobs = [serde.dumps(message) for message in messages]
+        if [serde.loads(b) for b in message_blobs] != messages:
+            failures.append(f"{name}: messages changed in a round trip")
+
+        dumps_us = per_call_us(lambda: serde.dumps(checkpoint), args.repeat)
+        loads_us = per_call_us(lambda: serde.loads(blob), args.repeat)
+        msg_dumps_us = per_call_us(lambda: [serde.dumps(message) for message in messages], args.repeat) / len(messages)
+        msg_loads_us = per_call_us(lambda: [serde.loads(b) for b in message_blobs], args.repeat) / len(messages)
+        put_us, get_us = saver_round_trip(serde, checkpoint, max(args.repeat // 4, 10))
+        print(f"{name:<14} {len(blob):>7} {dumps_us:>9.0f} {loads_us:>9.0f} {msg_dumps_us:>13.1f} {msg_loads_us:>13.1f} {put_us:>8.0f} {get_us:>8.0f}")
+
+    # get_next_version for the messages channel, once per graph step
+    json_serde = serdes["jsonplus"]
+    saver = SQLiteStandInSaver()
+    md5_us = per_call_us(lambda: md5(json_serde.dumps(messages)).hexdigest(), args.repeat)
+    current = checkpoint["channel_versions"]["messages"]
+    version_us = per_call_us(lambda: saver.get_next_version(current, None), args.repeat)
+    print(f"\nget_next_version(messages): md5 of the serialized channel {md5_us:.0f} us, now {version_us:.1f} us")
+
+    # Rows written with the previous serde stay readable
+    old_saver = SQLiteStandInSaver(serde=json_serde)
+    thread_id = str(uuid.uuid4())
+    old_saver.put({"configurable": {"thread_id": thread_id}}, checkpoint, {"step": 1})
+    new_saver = SQLiteStandInSaver(path=old_saver.path, serde=serdes["msgpack"])
+    read_back = new_saver.get_tuple({"configurable": {"thread_id": thread_id}})
+    if read_back is None or read_back.checkpoint["channel_values"] != checkpoint["channel_values"]:
+        failures.append("msgpack saver could not read a jsonplus row")
+    # ...and the new saver appends to the same thread
+    new_saver.put(read_back.config, {**checkpoint, "id": "2" + checkpoint["id"][1:]}, {"step": 2})
+    if new_saver.get_tuple({"configurable": {"thread_id": thread_id}}).checkpoint["channel_values"] != checkpoint["channel_values"]:
+        failures.append("mixed jsonplus/msgpack thread did not round-trip")
+
+    for failure in failures:
+        print("FAIL:", failure)
+    print("checkpoint serde check", "FAILED" if failures else "OK")
+    raise SystemExit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Connect-path cost: cached greeting vs running the graph on "." per connect.
+
+Measures, per connect, the handler work before the greeting is emitted
+(greeting + initial ConvoState + session_store.create), the checkpoint seeding
+that follows the emit, and, for comparison, the previous
+generate_initial_message path, which makes real LLM calls with the configured
+model.
+
+Usage: python -m benchmarks.bench_greeting [--connects 1000] [--graph-runs 5]
+"""
+import argparse
+import time
+import uuid
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+from src.graph.builder import create_graph
+from src.state import ConvoState, RequiredInformation
+from src.utils.greeting_cache import get_greeting_cache, greeting_message, seed_checkpoint
+from src.utils.session_store import InMemorySessionStore
+
+
+def initial_state(message):
+    return ConvoState(
+        user_input="",
+        messages=[message],
+        required_information=RequiredInformation(),
+        contact_permission=None,
+        credit_pull_permission=None,
+        credit_pull_complete=None,
+        lead_create_complete=None,
+        savings_estimate=None,
+        reason_for_decline=None
+    )
+
+
+def graph_greeting(graph, config):
+    # The pre-cache generate_initial_message
+    for event in graph.stream(ConvoState(user_input=".", messages=[HumanMessage(content=".")]), config, stream_mode="values"):
+        for msg in event.get("messages", []):
+            if isinstance(msg, AIMessage):
+                return msg.content
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--connects", type=int, default=1000)
+    parser.add_argument("--graph-runs", type=int, default=5)
+    args = parser.parse_args()
+
+    graph = create_graph()
+    cache = get_greeting_cache()
+    start = time.perf_counter()
+    cache.refresh()
+    fill_s = time.perf_counter() - start
+    store = InMemorySessionStore()
+
+    configs = [{"configurable": {"thread_id": str(uuid.uuid4())}} for _ in range(args.connects)]
+    start = time.perf_counter()
+    states = []
+    for i, config in enumerate(configs):
+        state = initial_state(greeting_message(cache.get()))
+        store.create(str(i), state, config)
+        states.append(state)
+    cached_s = (time.perf_counter() - start) / args.connects
+
+    start = time.perf_counter()
+    for config, state in zip(configs, states):
+        seed_checkpoint(graph, config, state)
+    seed_s = (time.perf_counter() - start) / args.connects
+
+    start = time.perf_counter()
+    for _ in range(args.graph_runs):
+        graph_greeting(graph, {"configurable": {"thread_id": str(uuid.uuid4())}})
+    graph_s = (time.perf_counter() - start) / args.graph_runs
+
+    print(f"pool fill ({len(cache.variants)} variants, once): {fill_s * 1e3:10.1f} ms")
+    print(f"cached greeting, before emit:       {cached_s * 1e6:10.1f} us/connect")
+    print(f"checkpoint seed, after emit:        {seed_s * 1e6:10.1f} us/connect")
+    print(f"graph run on '.' (previous):        {graph_s * 1e3:10.1f} ms/connect")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Prompt size of primary_assistant_prompt and info_collector_prompt with and without history compaction.
+
+Builds conversations of 20, 100 and 500 messages (human turn, tool call, tool
+result, inferred-city note, reply), renders both prompts from the full history
+and from compact_history(), and counts the rendered tokens with tiktoken.
+Also reports the cost of compaction itself per call (token counts are cached
+by message id, so only new messages are encoded on a live session).
+
+Usage: python -m benchmarks.bench_history [--sizes 20 100 500] [--repeat 200]
+"""
+import argparse
+import contextlib
+import io
+import time
+import uuid
+
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+
+from src.prompts import info_collector_prompt, primary_assistant_prompt
+from src.state import ConvoState, RequiredInformation
+from src.utils.history import EXTRACTOR_KEEP_TURNS, compact_history, count_tokens
+
+
+def make_messages(size):
+    messages = []
+    for i in range(size):
+        kind = i % 5
+        if kind == 0:
+            messages.append(HumanMessage(content=f"My debt is about {20000 + i} dollars and my zip is 10001, email alex{i}@example.com", id=str(uuid.uuid4())))
+        elif kind == 1:
+            messages.append(AIMessage(content="", id=str(uuid.uuid4()), tool_calls=[{"name": "savings_estimate_tool", "args": {"debt": 20000 + i}, "id": f"call_{i}"}]))
+        elif kind == 2:
+            messages.append(ToolMessage(content='{"saving_estimate": {"monthly": 412.5, "months": 48}}', tool_call_id=f"call_{i - 1}", id=str(uuid.uuid4())))
+        elif kind == 3:
+            messages.append(SystemMessage(content="Inferred City: New York, Inferred State: NY", id=str(uuid.uuid4())))
+        else:
+            messages.append(AIMessage(content="Thanks! You could save around $412 a month. May we contact you by phone or email about your options?", id=str(uuid.uuid4())))
+    return messages
+
+
+def make_state(size):
+    return ConvoState(
+        user_input="Yes, that's fine",
+        messages=make_messages(size),
+        required_information=RequiredInformation(FirstName="Alex", LastName="Smith", Debt=23000.0, Zip="10001", City="New York", State="NY"),
+        contact_permission=True,
+        credit_pull_permission=None,
+        credit_pull_complete=None,
+        lead_create_complete=None,
+        savings_estimate={"monthly": 412.5, "months": 48},
+        reason_for_decline=None,
+    )
+
+
+def prompt_tokens(prompt, inputs):
+    return count_tokens(prompt.invoke(inputs).to_messages())
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[20, 100, 500])
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"{'messages':>8} {'primary full':>13} {'compacted':>10} {'extractor full':>15} {'compacted':>10} {'compact ms':>11}")
+    for size in args.sizes:
+        state = make_state(size)
+        with contextlib.redirect_stdout(io.StringIO()):
+            primary = compact_history(state).messages
+            extractor = compact_history(state, keep_turns=EXTRACTOR_KEEP_TURNS).messages
+            start = time.perf_counter()
+            for _ in range(args.repeat):
+                compact_history(state)
+            compact_ms = (time.perf_counter() - start) / args.repeat * 1e3
+
+        extractor_inputs = {"provided_so_far": state["required_information"], "user_input": state["user_input"]}
+        print(
+            f"{size:>8} "
+            f"{prompt_tokens(primary_assistant_prompt, {**state, 'messages': state['messages']}):>13} "
+            f"{prompt_tokens(primary_assistant_prompt, {**state, 'messages': primary}):>10} "
+            f"{prompt_tokens(info_collector_prompt, {**extractor_inputs, 'messages': state['messages']}):>15} "
+            f"{prompt_tokens(info_collector_prompt, {**extractor_inputs, 'messages': extractor}):>10} "
+            f"{compact_ms:>11.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+"""Per-turn cost of the server's diagnostic output on the request thread: print vs the log pipeline.
+
+A turn here is the output one assistant turn produced: the new messages of
+its "values" events through _print_event (each event carries the whole
+history), the Assistant timings and both history compaction lines, the tool
+call arguments and the turn summary. Histories come from
+benchmarks/bench_history.py.
+
+- print: the previous code, writing to stdout. stdout is a pipe that a thread
+  drains, like a container's log collector.
+- logging INFO: the default LOG_LEVEL. The debug output is skipped and only
+  the turn summary is queued.
+- logging DEBUG: everything is queued; the listener thread renders and writes it.
+- logging DEBUG, 10% sampled: LOG_DEBUG_SAMPLE=0.1, drawn per turn by sample_turn().
+
+Reported per turn, best of --repeat runs: microseconds spent on the request
+thread, and for DEBUG also the time until the listener has written everything
+(drain). Then the log collector stalls for --stall-ms with DEBUG output on.
+print blocks the turns once the pipe buffer is full; the log pipeline keeps
+queueing.
+
+Usage: python -m benchmarks.bench_logging [--sizes 20 100 400] [--turns 300] [--repeat 5] [--stall-ms 200]
+"""
+import argparse
+import contextvars
+import logging
+import os
+import sys
+import threading
+import time
+
+from benchmarks.bench_history import make_messages
+from src.utils.log import SampleFilter, configure_logging, sample_turn
+from src.utils.misc import _print_event
+
+MESSAGES_PER_TURN = 4
+TIMINGS = {"primary": 0.912345, "extraction": 0.40123, "overlap": 0.40123, "total": 0.91301}
+TOOL_ARGS = {"first_name": "Alex", "last_name": "Smith", "email": "alex@example.com", "phone": "2155550100", "zip": "19103", "debt": 23000.0}
+SPANS = {"node:assistant": 0.913, "llm:primary": 0.902, "llm:extractor": 0.4, "node:update_convo_state": 0.001}
+
+
+def legacy_print_event(event: dict, _printed: set, max_length=1500):
+    # _print_event before the log pipeline
+    message = event.get("messages")
+    if message:
+        if isinstance(message, list):
+            message = message[-1]
+        if message.id not in _printed:
+            msg_repr = message.pretty_repr(html=True)
+            if len(msg_repr) > max_length:
+                msg_repr = msg_repr[:max_length] + " ... (truncated)"
+            print(msg_repr)
+            _printed.add(message.id)
+
+
+def turn_events(messages):
+    return [{"messages": messages[:i]} for i in range(len(messages) - MESSAGES_PER_TURN + 1, len(messages) + 1)]
+
+
+def print_turn(events, messages):
+    printed = set()
+    for event in events:
+        legacy_print_event(event, printed)
+    print("Assistant timings (s):", {k: round(v, 3) for k, v in TIMINGS.items()})
+    for label in ("Extractor history", "History"):
+        print(f"{label} tokens: {4000} -> {1200} ({len(messages) - 12} of {len(messages)} messages summarized)")
+    print("Modify with:", TOOL_ARGS)
+    print("Turn timings (s):", {"total": 0.913})
+    print("Turn spans (s):", SPANS, {"primary_prompt": 1200})
+
+
+assistant_log = logging.getLogger("src.agents.assistant")
+history_log = logging.getLogger("src.utils.history")
+turn_log = logging.getLogger("src.utils.turn_events")
+
+
+def log_turn(events, messages):
+    # The same output through the loggers, as the call sites now do it
+    printed = set()
+    for event in events:
+        _print_event(event, printed)
+    if assistant_log.isEnabledFor(logging.DEBUG):
+        assistant_log.debug("Assistant timings (s): %s", {k: round(v, 3) for k, v in TIMINGS.items()})
+    for label in ("Extractor history", "History"):
+        history_log.debug("%s tokens: %d -> %d (%d of %d messages summarized)", label, 4000, 1200, len(messages) - 12, len(messages))
+    assistant_log.debug("Modify with: %s", TOOL_ARGS)
+    if turn_log.isEnabledFor(logging.INFO):
+        timings = {"total": 0.913}
+        turn_log.info("Turn timings (s): %s spans: %s", timings, SPANS, extra={"timings": timings, "spans": SPANS, "tokens": {"primary_prompt": 1200}})
+
+
+def sampled_log_turn(events, messages):
+    # A fresh context per turn, like a new Socket.IO handler
+    contextvars.Context().run(_sampled_log_turn, events, messages)
+
+
+def _sampled_log_turn(events, messages):
+    sample_turn()
+    log_turn(events, messages)
+
+
+class PipeSink:
+    """A writable pipe drained by a thread, like a container's stdout."""
+
+    def __init__(self):
+        read_fd, write_fd = os.pipe()
+        self.stream = os.fdopen(write_fd, "w", buffering=1)
+        self._reader = os.fdopen(read_fd, "rb", buffering=0)
+        self.resume_at = 0.0
+        threading.Thread(target=self._drain, daemon=True).start()
+
+    def stall(self, seconds):
+        self.resume_at = time.monotonic() + seconds
+        # Let the reader finish its current read and see the stall
+        time.sleep(0.01)
+
+    def _drain(self):
+        while True:
+            delay = self.resume_at - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            if not self._reader.read(65536):
+                return
+
+
+def wait_for_queue(pipeline):
+    while not pipeline.handler.queue.empty():
+        time.sleep(0.0005)
+    pipeline.output.flush()
+
+
+def run(turn, events, messages, turns, pipeline=None):
+    """Request-thread microseconds per turn, and including the listener's drain."""
+    start = time.perf_counter()
+    for _ in range(turns):
+        turn(events, messages)
+    caller = time.perf_counter() - start
+    if pipeline is not None:
+        wait_for_queue(pipeline)
+    return caller / turns * 1e6, (time.perf_counter() - start) / turns * 1e6
+
+
+def best(repeat, *args):
+    runs = [run(*args) for _ in range(repeat)]
+    return min(caller for caller, _ in runs), min(drain for _, drain in runs)
+
+
+def slowest_turn_ms(turn, events, messages, turns):
+    slowest = 0.0
+    for _ in range(turns):
+        start = time.perf_counter()
+        turn(events, messages)
+        slowest = max(slowest, time.perf_counter() - start)
+    return slowest * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[20, 100, 400])
+    parser.add_argument("--turns", type=int, default=300)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--stall-ms", type=float, default=200.0)
+    args = parser.parse_args()
+
+    sink = PipeSink()
+    os.environ["LOG_QUEUE_SIZE"] = "1000000"
+    pipeline = configure_logging(stream=sink.stream)
+    root = logging.getLogger()
+    sampler = SampleFilter(0.1)
+
+    print(f"{'messages':>8} {'print us':>9} {'INFO us':>8} {'DEBUG us':>9} {'DEBUG drain us':>15} {'sampled us':>11}")
+    for size in args.sizes:
+        messages = make_messages(size)
+        events = turn_events(messages)
+
+        stdout = sys.stdout
+        sys.stdout = sink.stream
+        try:
+            print_us, _ = best(args.repeat, print_turn, events, messages, args.turns)
+        finally:
+            sys.stdout = stdout
+
+        root.setLevel(logging.INFO)
+        info_us, _ = best(args.repeat, log_turn, events, messages, args.turns, pipeline)
+
+        root.setLevel(logging.DEBUG)
+        debug_us, drain_us = best(args.repeat, log_turn, events, messages, args.turns, pipeline)
+
+        pipeline.handler.addFilter(sampler)
+        pipeline.sample_rate = sampler.rate
+        sampled_us, _ = best(args.repeat, sampled_log_turn, events, messages, args.turns, pipeline)
+        pipeline.handler.removeFilter(sampler)
+        pipeline.sample_rate = 1.0
+        root.setLevel(logging.INFO)
+
+        print(f"{size:>8} {print_us:>9.0f} {info_us:>8.1f} {debug_us:>9.1f} {drain_us:>15.0f} {sampled_us:>11.1f}")
+
+    stall_s = args.stall_ms / 1000
+    messages = make_messages(args.sizes[-1])
+    events = turn_events(messages)
+    sink.stall(stall_s)
+    stdout = sys.stdout
+    sys.stdout = sink.stream
+    try:
+        print_ms = slowest_turn_ms(print_turn, events, messages, args.turns)
+    finally:
+        sys.stdout = stdout
+    time.sleep(stall_s)
+    root.setLevel(logging.DEBUG)
+    sink.stall(stall_s)
+    debug_ms = slowest_turn_ms(log_turn, events, messages, args.turns)
+    root.setLevel(logging.INFO)
+    wait_for_queue(pipeline)
+    print(f"\ncollector stalled {args.stall_ms:.0f} ms, slowest of {args.turns} turns: print {print_ms:.1f} ms, logging DEBUG {debug_ms:.1f} ms")
+    print(f"records dropped: {pipeline.handler.dropped}")
+
+
+if __name__ == "__main__":
+    main()
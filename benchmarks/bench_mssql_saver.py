@@ -0,0 +1,113 @@
+"""Checkpoints/sec for MSSQLSaver at 1, 8 and 32 concurrent writers, against a sqlite stand-in.
+
+"pooled" is the current saver (connection pool, per-thread-id locks, batched
+put_writes). "legacy" reproduces the previous behaviour: a fresh connection per
+call, one process-wide lock, and one statement per write.
+
+Usage: python -m benchmarks.bench_mssql_saver [--checkpoints 200] [--connect-latency-ms 5]
+"""
+import argparse
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+from benchmarks.sqlite_standin import SQLiteStandInSaver, sqlite_connect
+
+
+class LegacyStandInSaver(SQLiteStandInSaver):
+    _global_lock = threading.Lock()
+
+    @contextmanager
+    def connection(self):
+        conn = self.pool._connect()
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def thread_lock(self, thread_id):
+        return self._global_lock
+
+    def put_writes(self, config, writes, task_id):
+        self.setup()
+        with self._global_lock, self.connection() as conn:
+            cursor = conn.cursor()
+            for idx, (channel, value) in enumerate(writes):
+                cursor.execute(
+                    self.UPSERT_WRITE,
+                    (str(config["configurable"]["thread_id"]), str(config["configurable"]["thread_ts"]), task_id, idx, channel, self.serde.dumps(value)),
+                )
+            conn.commit()
+
+
+def make_checkpoint(step: int, messages):
+    return {
+        "v": 1,
+        "id": f"{step:012d}",
+        "ts": datetime.now(timezone.utc).isoformat(),
+        "channel_values": {"messages": messages, "user_input": "hello"},
+        "channel_versions": {"messages": f"{step:032}."},
+        "versions_seen": {},
+        "pending_sends": [],
+    }
+
+
+def run_writer(saver, n_checkpoints, errors):
+    thread_id = str(uuid.uuid4())
+    messages = []
+    parent_ts = None
+    try:
+        for step in range(n_checkpoints):
+            messages = messages + [HumanMessage(content=f"message {step}"), AIMessage(content="reply " * 20)]
+            config = {"configurable": {"thread_id": thread_id, "thread_ts": parent_ts}}
+            new_config = saver.put(config, make_checkpoint(step, messages[-10:]), {"step": step})
+            saver.put_writes(
+                new_config,
+                [("messages", messages[-1]), ("user_input", "hello"), ("required_information", None)],
+                task_id=str(uuid.uuid4()),
+            )
+            parent_ts = new_config["configurable"]["thread_ts"]
+    except Exception as e:
+        errors.append(e)
+
+
+def bench(saver_cls, concurrency, n_checkpoints, connect_latency):
+    def connect():
+        # A real SQL Server round-trip for login costs milliseconds; emulate it.
+        time.sleep(connect_latency)
+        return sqlite_connect(saver.path)
+
+    saver = saver_cls(connect=connect, pool_size=concurrency)
+    saver.setup()
+    errors = []
+    threads = [threading.Thread(target=run_writer, args=(saver, n_checkpoints, errors)) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    if errors:
+        raise errors[0]
+    return concurrency * n_checkpoints / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--checkpoints", type=int, default=200, help="checkpoints per writer thread")
+    parser.add_argument("--connect-latency-ms", type=float, default=5.0)
+    args = parser.parse_args()
+
+    print(f"{'threads':>8} {'legacy ckpt/s':>15} {'pooled ckpt/s':>15} {'speedup':>8}")
+    for concurrency in (1, 8, 32):
+        legacy = bench(LegacyStandInSaver, concurrency, args.checkpoints, args.connect_latency_ms / 1000)
+        pooled = bench(SQLiteStandInSaver, concurrency, args.checkpoints, args.connect_latency_ms / 1000)
+        print(f"{concurrency:>8} {legacy:>15.1f} {pooled:>15.1f} {pooled / legacy:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
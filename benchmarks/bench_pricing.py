@@ -0,0 +1,71 @@
+"""Scores N debts with the pricing engine (src/pricing.py), batch vs one at a time.
+
+Draws N debts (log-normal, median ~$18k), prices them with estimate_batch, and
+prices them again with the scalar estimate the chat tool uses. The memo cache
+is bypassed so every debt is computed. Checks that both agree on every field,
+then prints campaign totals and a what-if table.
+
+Usage: python -m benchmarks.bench_pricing [--debts 1000000] [--scalar-sample 1000000] [--seed 7]
+"""
+import argparse
+import time
+
+import numpy as np
+
+from src.pricing import PRICING_TABLE, SavingsEstimate, estimate, estimate_batch, is_eligible, what_if_table
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--debts", type=int, default=1_000_000)
+    parser.add_argument("--scalar-sample", type=int, default=1_000_000, help="how many of the debts to also price one at a time")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    debts = np.round(rng.lognormal(mean=np.log(18000), sigma=0.7, size=args.debts), 2)
+
+    start = time.perf_counter()
+    batch = estimate_batch(debts)
+    batch_s = time.perf_counter() - start
+
+    sample = debts[:args.scalar_sample].tolist()
+    start = time.perf_counter()
+    scalar = [estimate.__wrapped__(debt, PRICING_TABLE) for debt in sample]
+    eligible = [is_eligible(debt) for debt in sample]
+    scalar_s = time.perf_counter() - start
+
+    print(f"{args.debts:,} debts, {len(PRICING_TABLE)} pricing tier(s)")
+    print(f"estimate_batch          {batch_s * 1000:>9.1f} ms  {batch_s / args.debts * 1e9:>7.1f} ns/debt")
+    print(f"estimate, one at a time {scalar_s * 1000:>9.1f} ms  {scalar_s / len(sample) * 1e9:>7.1f} ns/debt  ({len(sample):,} debts)")
+    print(f"speedup                 {scalar_s / len(sample) / (batch_s / args.debts):>9.1f}x")
+
+    mismatches = {}
+    for i, field in enumerate(SavingsEstimate._fields):
+        expected = np.array([row[i] for row in scalar])
+        mismatches[field] = int(np.count_nonzero(batch[field][:len(sample)] != expected))
+    mismatches["eligible"] = int(np.count_nonzero(batch["eligible"][:len(sample)] != np.array(eligible)))
+
+    # Campaign sizing: the eligible debts and what the program would save them
+    mask = batch["eligible"]
+    print(f"\neligible: {mask.sum():,} of {args.debts:,} ({mask.mean():.1%})")
+    print(f"eligible debt ${batch['debt'][mask].sum():,.0f}, estimated savings ${batch['savings'][mask].sum():,}")
+    print(f"median payment ${int(np.median(batch['payment'][mask])):,}, median program length {np.median(batch['program_length'][mask]):.1f} years")
+
+    print("\n" + what_if_table([10000, 20000, 35000, 60000]))
+
+    if any(mismatches.values()):
+        print(f"\nFAIL: batch and scalar differ: {mismatches}")
+        raise SystemExit(1)
+    print("\nbatch matches scalar on every field")
+
+    # The memoized path the tool takes when it prices the same debt again
+    estimate(23000.0)
+    start = time.perf_counter()
+    for _ in range(100_000):
+        estimate(23000.0)
+    print(f"memoized estimate: {(time.perf_counter() - start) / 100_000 * 1e9:.0f} ns/call")
+
+
+if __name__ == "__main__":
+    main()
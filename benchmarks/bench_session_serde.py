@@ -0,0 +1,109 @@
+"""Per-turn session serialization cost at 20, 100 and 500 messages.
+
+A turn is: load the session, append a user message and an assistant reply,
+save it. Compared:
+  json      - the previous path: deserialize_convo_state + serialize_convo_state of the whole state
+  memory    - InMemorySessionStore, live ConvoState objects
+  redis     - RedisSessionStore against fakeredis, same worker on every turn
+  redis-2w  - RedisSessionStore, two workers alternating turns (each load fetches the other's tail)
+
+Usage: python -m benchmarks.bench_session_serde [--sizes 20 100 500] [--turns 50]
+"""
+import argparse
+import time
+import uuid
+
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+
+from src.state import ConvoState, RequiredInformation
+from src.utils.convo_serde import serialize_convo_state, deserialize_convo_state
+from src.utils.session_store import InMemorySessionStore, RedisSessionStore
+
+
+def make_message(i):
+    kind = i % 4
+    if kind == 0:
+        return HumanMessage(content=f"My answer number {i}, my email is alex{i}@example.com", id=str(uuid.uuid4()))
+    if kind == 1:
+        return AIMessage(
+            content="Thanks! Could you share your zip code so I can look up your city and state?",
+            id=str(uuid.uuid4()),
+            tool_calls=[{"name": "savings_estimate_tool", "args": {"debt": 20000 + i}, "id": f"call_{i}"}],
+            response_metadata={"token_usage": {"prompt_tokens": 900 + i, "completion_tokens": 40}, "model_name": "gpt-4o-mini"},
+        )
+    if kind == 2:
+        return ToolMessage(content='{"saving_estimate": {"monthly": 412.5, "months": 48}}', tool_call_id=f"call_{i - 1}", id=str(uuid.uuid4()))
+    return SystemMessage(content=f"Inferred City: New York, Inferred State: NY ({i})", id=str(uuid.uuid4()))
+
+
+def make_state(size):
+    return ConvoState(
+        user_input="",
+        messages=[make_message(i) for i in range(size)],
+        required_information=RequiredInformation(FirstName="Alex", Debt=20000.0, Zip="10001"),
+        contact_permission=None,
+        credit_pull_permission=None,
+        credit_pull_complete=None,
+        lead_create_complete=None,
+        savings_estimate=None,
+        reason_for_decline=None
+    )
+
+
+def append_turn(state, i):
+    state["user_input"] = f"turn {i}"
+    state["messages"].append(HumanMessage(content=f"turn {i}", id=str(uuid.uuid4())))
+    state["messages"].append(AIMessage(content=f"reply {i}", id=str(uuid.uuid4())))
+
+
+def bench_json(size, turns):
+    stored = serialize_convo_state(make_state(size))
+    start = time.perf_counter()
+    for i in range(turns):
+        state = deserialize_convo_state(stored)
+        append_turn(state, i)
+        stored = serialize_convo_state(state)
+    return (time.perf_counter() - start) / turns
+
+
+def bench_store(stores, size, turns):
+    session_id = str(uuid.uuid4())
+    stores[0].create(session_id, make_state(size), {"configurable": {"thread_id": session_id}})
+    for store in stores[1:]:
+        store.load(session_id)
+    start = time.perf_counter()
+    for i in range(turns):
+        store = stores[i % len(stores)]
+        state, _ = store.load(session_id)
+        append_turn(state, i)
+        store.save(session_id, state)
+    elapsed = (time.perf_counter() - start) / turns
+    final, _ = stores[0].load(session_id)
+    assert len(final["messages"]) == size + 2 * turns
+    return elapsed
+
+
+def fake_redis_stores(workers):
+    import fakeredis
+
+    server = fakeredis.FakeServer()
+    return [RedisSessionStore(fakeredis.FakeRedis(server=server)) for _ in range(workers)]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[20, 100, 500])
+    parser.add_argument("--turns", type=int, default=50)
+    args = parser.parse_args()
+
+    print(f"{'messages':>8} {'json':>10} {'memory':>10} {'redis':>10} {'redis-2w':>10}   (ms/turn)")
+    for size in args.sizes:
+        json_s = bench_json(size, args.turns)
+        memory_s = bench_store([InMemorySessionStore()], size, args.turns)
+        redis_s = bench_store(fake_redis_stores(1), size, args.turns)
+        redis_2w_s = bench_store(fake_redis_stores(2), size, args.turns)
+        print(f"{size:>8} {json_s * 1e3:>10.3f} {memory_s * 1e3:>10.3f} {redis_s * 1e3:>10.3f} {redis_2w_s * 1e3:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""Compare the preloaded zip index with building pgeocode.Nominatim on every call.
+
+Usage: python -m benchmarks.bench_zip_lookup [--calls 200]
+"""
+import argparse
+import random
+import time
+
+from src.utils.zip_index import get_zip_index
+
+
+def nominatim_per_call(zip_code):
+    # The pre-index get_city_state path
+    import pgeocode
+    import pandas as pd
+
+    location = pgeocode.Nominatim('us').query_postal_code(zip_code)
+    if pd.notnull(location.place_name) and pd.notnull(location.state_code):
+        return location.place_name, location.state_code
+    return None, None
+
+
+def timed(fn, zips):
+    start = time.perf_counter()
+    for zip_code in zips:
+        fn(zip_code)
+    return (time.perf_counter() - start) / len(zips)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=200)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    index = get_zip_index()
+    load_s = time.perf_counter() - start
+
+    zips = random.Random(0).choices(list(index.entries), k=args.calls)
+
+    index_s = timed(index.lookup, zips * 100)
+    nominatim_s = timed(nominatim_per_call, zips)
+
+    mismatches = sum(index.lookup(z) != nominatim_per_call(z) for z in zips[:50])
+
+    print(f"zip codes in index:         {len(index)}")
+    print(f"index load (startup):       {load_s * 1e3:10.2f} ms")
+    print(f"index lookup:               {index_s * 1e6:10.2f} us/call")
+    print(f"Nominatim per call:         {nominatim_s * 1e6:10.2f} us/call")
+    print(f"speedup:                    {nominatim_s / index_s:10.0f}x")
+    print(f"mismatches (first 50 zips): {mismatches}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""Worst-case latency of Assistant under empty model responses, sync and async.
+
+The primary model is a ReplayChatModel (benchmarks/fake_llm.py) with per-call
+latency. Scenarios: a normal reply, two empties then a reply, empties forever
+(canned response), empties forever with a fallback model, the same with a
+fallback slower than its timeout (cut off, canned response), slow empties
+that run into the deadline, and a single reply slower than the deadline,
+which must still be answered rather than cut off. Each run must finish within
+RetryPolicy.worst_case_seconds(); the previous `while True` loop never
+returned in the two "forever" scenarios. The backoff defaults are small
+enough that "2 empty, reply" (three calls and two jittered waits) ends well
+inside the deadline whatever the jitter draws.
+
+Usage: python -m benchmarks.check_empty_responses [--latency-ms 200] [--deadline 1.0] [--max-attempts 3] [--backoff-base 0.05] [--backoff-max 0.1]
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import time
+import uuid
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+import src.config as config
+from benchmarks.fake_llm import ReplayChatModel
+
+# The extractor binds src.config.llm at import
+config.llm = ReplayChatModel(script=["-"])
+
+from src.agents.assistant import Assistant  # noqa: E402
+from src.prompts import primary_assistant_prompt  # noqa: E402
+from src.state import ConvoState, RequiredInformation  # noqa: E402
+from src.utils.retry_policy import RetryPolicy  # noqa: E402
+
+SLACK_S = 0.05
+
+
+def new_state():
+    return ConvoState(
+        user_input="My name is Alex and I owe about 20k",
+        messages=[
+            AIMessage(content="Hi, I'm Claire. May I have your first name?", id=str(uuid.uuid4())),
+            HumanMessage(content="My name is Alex and I owe about 20k", id=str(uuid.uuid4())),
+        ],
+        required_information=RequiredInformation(),
+        contact_permission=None,
+        credit_pull_permission=None,
+        credit_pull_complete=None,
+        lead_create_complete=None,
+        savings_estimate=None,
+        reason_for_decline=None,
+    )
+
+
+def scenarios(latency_s, deadline, fallback_timeout):
+    slow = latency_s * 3
+    return [
+        # name, primary script, primary latency, fallback script (None: no fallback), fallback latency, expected outcome
+        ("reply", ["Nice to meet you, Alex!"], latency_s, None, None, "first_attempt"),
+        ("2 empty, reply", ["", "", "Nice to meet you, Alex!"], latency_s, None, None, "retried"),
+        ("empty forever", [""], latency_s, None, None, "canned"),
+        ("empty + fallback", [""], latency_s, ["Nice to meet you, Alex!"], latency_s, "fallback"),
+        ("slow fallback", [""], latency_s, ["Nice to meet you, Alex!"], fallback_timeout * 3, "canned"),
+        ("slow empties", [""], slow, None, None, "canned"),
+        ("slow reply", ["Nice to meet you, Alex!"], deadline * 1.5, None, None, "first_attempt"),
+    ]
+
+
+def run_one(args, script, latency_s, fallback_script, fallback_latency_s, mode):
+    primary = ReplayChatModel(script=script, latency_s=latency_s)
+    fallback = ReplayChatModel(script=fallback_script, latency_s=fallback_latency_s) if fallback_script else None
+    policy = RetryPolicy(
+        max_attempts=args.max_attempts,
+        deadline=args.deadline,
+        backoff_base=args.backoff_base,
+        backoff_max=args.backoff_max,
+        fallback=primary_assistant_prompt | fallback if fallback else None,
+        fallback_timeout=args.fallback_timeout,
+    )
+    assistant = Assistant(primary_assistant_prompt | primary, policy)
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        if mode == "sync":
+            result = assistant(new_state(), {})
+        else:
+            result = asyncio.run(assistant.acall(new_state(), {}))
+    elapsed = time.perf_counter() - start
+    outcome = next(k for k in ("first_attempt", "retried", "fallback", "canned") if policy.stats[k])
+    bound = policy.worst_case_seconds(max(latency_s, fallback_latency_s or 0.0))
+    return elapsed, primary.calls, outcome, bound, result["messages"].content
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latency-ms", type=float, default=200.0)
+    parser.add_argument("--deadline", type=float, default=1.0)
+    parser.add_argument("--max-attempts", type=int, default=3)
+    parser.add_argument("--fallback-timeout", type=float, default=0.5)
+    parser.add_argument("--backoff-base", type=float, default=0.05)
+    parser.add_argument("--backoff-max", type=float, default=0.1)
+    args = parser.parse_args()
+
+    latency_s = args.latency_ms / 1000
+    # Worst case of "2 empty, reply": three calls plus the two longest waits
+    retried_s = 3 * latency_s + min(args.backoff_max, args.backoff_base) + min(args.backoff_max, 2 * args.backoff_base)
+    if retried_s > args.deadline - 0.2:
+        parser.error(f"'2 empty, reply' may need {retried_s:.2f}s; keep it 0.2s under the {args.deadline}s deadline")
+    print(f"max_attempts={args.max_attempts} deadline={args.deadline}s fallback_timeout={args.fallback_timeout}s call latency={args.latency_ms:.0f} ms")
+    print(f"{'scenario':<18} {'mode':<6} {'calls':>5} {'seconds':>8} {'bound':>7}  outcome")
+    failures = []
+    for name, script, call_latency, fallback_script, fallback_latency, expected in scenarios(latency_s, args.deadline, args.fallback_timeout):
+        for mode in ("sync", "async"):
+            elapsed, calls, outcome, bound, content = run_one(args, script, call_latency, fallback_script, fallback_latency, mode)
+            print(f"{name:<18} {mode:<6} {calls:>5} {elapsed:>8.3f} {bound:>7.3f}  {outcome}: {content!r}")
+            if outcome != expected:
+                failures.append(f"{name}/{mode}: outcome {outcome}, expected {expected}")
+            if elapsed > bound + SLACK_S:
+                failures.append(f"{name}/{mode}: {elapsed:.3f}s over the {bound:.3f}s bound")
+            if calls > args.max_attempts:
+                failures.append(f"{name}/{mode}: {calls} primary calls, max_attempts is {args.max_attempts}")
+    for failure in failures:
+        print("FAIL:", failure)
+    print("empty response check", "FAILED" if failures else "OK")
+    raise SystemExit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""Model calls and end-to-end latency of a completed funnel, per routing mode.
+
+Starts from a session whose details are all collected and whose contact
+permission was just granted. It drives the compiled graph the way the servers
+do: a TurnProcessor over graph.stream that stops at a permission question. The
+user then says yes to the credit pull, and the run continues to the savings
+estimate. The primary model is a ReplayChatModel (benchmarks/fake_llm.py), and
+the API tools call benchmarks/stub_carbon_api.py with --api-latency-ms per
+request. Every Assistant run also makes one extraction call, so "primary calls"
+is also the number of extractor calls.
+
+Modes:
+- model picks tools (FUNNEL_FAST_PATH=0): the model chooses every tool.
+- fast path: the funnel router (src/agents/funnel_router.py) issues the tool
+  calls, and the model only phrases the estimate.
+- speculative lead (FUNNEL_SPECULATIVE_LEAD=1): the lead create is posted in
+  the same step as the credit pull.
+- speculative, pull fails once: compensation. The held-back lead must not
+  count, and the retried lead create, which the stub reports as a duplicate,
+  must not decline the user.
+All modes must end in the same state.
+
+Usage: python -m benchmarks.check_funnel [--llm-latency-ms 300] [--api-latency-ms 300]
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import time
+import uuid
+
+from benchmarks.stub_carbon_api import Faults, start_stub_server
+
+_stub = start_stub_server(faults=Faults(latency_ms=0, jitter_ms=0, track_duplicates=True))
+os.environ["CARBON_API_BASE_URL"] = f"http://127.0.0.1:{_stub.server_port}"
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage  # noqa: E402
+
+import src.config as config  # noqa: E402
+from benchmarks.fake_llm import ReplayChatModel  # noqa: E402
+
+# The extractor binds src.config.llm at import
+config.llm = ReplayChatModel(script=["-"])
+
+import src.agents.funnel_router as funnel_router  # noqa: E402
+import src.graph.builder as builder  # noqa: E402
+from src.prompts import primary_assistant_prompt  # noqa: E402
+from src.state import ConvoState, RequiredInformation  # noqa: E402
+from src.utils.handle_convo import handle_permission  # noqa: E402
+from src.utils.turn_events import TurnProcessor  # noqa: E402
+
+ESTIMATE_REPLY = "Great news, Alex! Here is your free savings estimate."
+# name: (fast path, speculative lead, credit pulls the stub declines, primary model script)
+MODES = {
+    "model picks tools": (False, False, 0, [
+        {"name": "AskCreditPullPermissionTool"},
+        {"name": "credit_pull_api_tool"},
+        {"name": "lead_create_api_tool"},
+        {"name": "savings_estimate_tool"},
+        ESTIMATE_REPLY,
+    ]),
+    "fast path": (True, False, 0, [ESTIMATE_REPLY]),
+    "speculative lead": (True, True, 0, [ESTIMATE_REPLY]),
+    # After the failed pull the model retries it; the router carries on from there
+    "spec., pull fails once": (True, True, 1, [{"name": "credit_pull_api_tool"}, ESTIMATE_REPLY]),
+}
+RESULT_KEYS = ["credit_pull_permission", "credit_pull_complete", "lead_create_complete", "savings_estimate", "reason_for_decline"]
+
+
+def new_state():
+    ask_id = f"call_{uuid.uuid4().hex[:24]}"
+    return ConvoState(
+        user_input="Yes, that's all correct",
+        messages=[
+            AIMessage(content="Here is what I have: ... Is everything correct?", id=str(uuid.uuid4())),
+            HumanMessage(content="Yes, that's all correct", id=str(uuid.uuid4())),
+            AIMessage(content="", tool_calls=[{"name": "AskContactPermissionTool", "args": {}, "id": ask_id}], id=str(uuid.uuid4())),
+            ToolMessage(content=json.dumps({"contact_permission": True}), tool_call_id=ask_id, id=str(uuid.uuid4())),
+        ],
+        required_information=RequiredInformation(
+            Debt=23000.0, FirstName="Alex", LastName="Smith", Zip="19103", Phone="2155550100",
+            Email="alex@example.com", City="Philadelphia", State="PA", Address="1 Market St", DateOfBirth="1980-01-01",
+        ),
+        contact_permission=True,
+        credit_pull_permission=None,
+        credit_pull_complete=None,
+        lead_create_complete=None,
+        savings_estimate=None,
+        reason_for_decline=None,
+    )
+
+
+def process_message(graph, state, config, emits):
+    # Same loop as app.process_message
+    turn = TurnProcessor(state, set())
+    for event in graph.stream(state, turn.config(config), stream_mode="values"):
+        emits.extend(turn.feed(event))
+        if turn.done:
+            break
+    return turn.finish()
+
+
+def run_funnel(mode, llm_latency_s):
+    fast_path, speculative, declines, script = MODES[mode]
+    primary = ReplayChatModel(script=script, latency_s=llm_latency_s)
+    builder.primary_assistant_chain = primary_assistant_prompt | primary
+    os.environ["FUNNEL_FAST_PATH"] = "1" if fast_path else "0"
+    funnel_router.SPECULATIVE_LEAD_CREATE = speculative
+    graph = builder.create_graph()
+    config = {"configurable": {"thread_id": str(uuid.uuid4())}}
+    _stub.faults.credit_pull_declines = declines
+    _stub.faults.leads.clear()
+    requests_before = _stub.faults.counts["requests"]
+
+    emits = []
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        state = process_message(graph, new_state(), config, emits)
+        question = next(payload for name, payload in emits if name == "user_input_required")
+        # The user answers "yes" to the credit pull question (handle_user_input_response)
+        result = handle_permission(state, question["tool_name"], "yes")
+        state["messages"].append(ToolMessage(content=json.dumps(result), tool_call_id=question["tool_call_id"]))
+        state.update(result)
+        state = process_message(graph, state, config, emits)
+    elapsed = time.perf_counter() - start
+    replies = [payload["message"] for name, payload in emits if name == "bot_response"]
+    return {
+        "primary_calls": primary.calls,
+        "api_calls": _stub.faults.counts["requests"] - requests_before,
+        "seconds": elapsed,
+        "question": question["tool_name"],
+        "last_reply": replies[-1] if replies else None,
+        "state": {key: state.get(key) for key in RESULT_KEYS},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--llm-latency-ms", type=float, default=300.0)
+    parser.add_argument("--api-latency-ms", type=float, default=300.0)
+    args = parser.parse_args()
+    _stub.faults.latency_ms = args.api_latency_ms
+
+    print(f"funnel from contact permission to savings estimate; model latency {args.llm_latency_ms:.0f} ms, API latency {args.api_latency_ms:.0f} ms")
+    print(f"{'mode':<24} {'primary calls':>13} {'API calls':>9} {'seconds':>8}")
+    results = {}
+    for mode in MODES:
+        results[mode] = run = run_funnel(mode, args.llm_latency_ms / 1000)
+        print(f"{mode:<24} {run['primary_calls']:>13} {run['api_calls']:>9} {run['seconds']:>8.2f}")
+
+    legacy = results["model picks tools"]
+    for mode in ("fast path", "speculative lead"):
+        run = results[mode]
+        print(f"{mode} vs model picks tools: {legacy['primary_calls'] - run['primary_calls']} fewer primary and extraction calls each, "
+              f"{legacy['seconds'] - run['seconds']:.2f}s faster")
+
+    failures = []
+    for mode, run in results.items():
+        if run["question"] != "AskCreditPullPermissionTool":
+            failures.append(f"{mode}: asked {run['question']}")
+        if run["last_reply"] != ESTIMATE_REPLY:
+            failures.append(f"{mode}: last reply {run['last_reply']!r}")
+        if not (run["state"]["credit_pull_complete"] and run["state"]["lead_create_complete"] and run["state"]["savings_estimate"]):
+            failures.append(f"{mode}: funnel incomplete {run['state']}")
+        if run["state"] != legacy["state"]:
+            failures.append(f"{mode}: state {run['state']} differs from {legacy['state']}")
+    for failure in failures:
+        print("FAIL:", failure)
+    print("funnel check", "FAILED" if failures else "OK")
+    raise SystemExit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
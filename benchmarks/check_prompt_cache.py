@@ -0,0 +1,171 @@
+"""Check CustomChatAnthropic's prompt-cache breakpoints against a recording fake Anthropic API.
+
+Plays a conversation through primary_assistant_prompt | CustomChatAnthropic.bind_tools(...)
+(history compacted as in Assistant), alternating invoke and stream, and the
+extractor chain once per turn. Then checks that:
+  - the cached tool definitions and static system prompt are byte-identical on every turn,
+  - every turn after the first reads at least the tools + system prefix from the cache,
+  - while the history window is not sliding, each turn reads the previous turn's conversation prefix,
+  - the cache counts reach usage_metadata["input_token_details"] on both paths.
+Prints per-turn usage with caching on and off.
+
+Usage: python -m benchmarks.check_prompt_cache [--turns 10]
+"""
+import argparse
+import contextlib
+import io
+import json
+import uuid
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+from benchmarks.fake_anthropic_api import _estimate_tokens, prompt_blocks, start_fake_anthropic
+from src.prompts import info_collector_prompt, primary_assistant_prompt
+from src.state import ConvoState, RequiredInformation
+from src.tools.api_tools import credit_pull_api_tool, lead_create_api_tool
+from src.tools.permission_tools import ask_contact_permission_tool, ask_credit_pull_permission_tool
+from src.tools.savings_estimate_tool import savings_estimate_tool
+from src.utils.custom_chat_anthropic import CustomChatAnthropic
+from src.utils.history import EXTRACTOR_KEEP_TURNS, HISTORY_KEEP_TURNS, compact_history
+
+# Same order as all_tools in src/graph/builder.py
+TOOLS = [savings_estimate_tool, lead_create_api_tool, credit_pull_api_tool, ask_contact_permission_tool, ask_credit_pull_permission_tool]
+
+USER_TURNS = [
+    "Hi, I have around 25k in credit card debt",
+    "My name is Alex Smith",
+    "Sure, what would I save?",
+    "My zip is 10001",
+    "You can reach me at alex@example.com or 2125550100",
+    "Yes, you can contact me",
+    "My address is 1 Main St",
+    "I was born 1985-04-02",
+    "Yes, go ahead with the credit check",
+    "Thanks, what happens next?",
+    "Great, talk soon",
+    "Bye",
+]
+
+
+def new_state():
+    return ConvoState(
+        user_input="",
+        messages=[AIMessage(content="Hi, I'm Claire from ClearOne Advantage. How can I help you today?", id=str(uuid.uuid4()))],
+        required_information=RequiredInformation(),
+        contact_permission=None,
+        credit_pull_permission=None,
+        credit_pull_complete=None,
+        lead_create_complete=None,
+        savings_estimate=None,
+        reason_for_decline=None,
+    )
+
+
+def run_conversation(base_url, turns, prompt_caching):
+    llm = CustomChatAnthropic(model="claude-3-5-sonnet-20240620", api_key="test", base_url=base_url, max_tokens=1000, prompt_caching=prompt_caching)
+    primary = primary_assistant_prompt | llm.bind_tools(TOOLS)
+    extractor = info_collector_prompt | llm.with_structured_output(RequiredInformation)
+
+    state = new_state()
+    usages = []
+    for turn in range(turns):
+        text = USER_TURNS[turn % len(USER_TURNS)]
+        state["user_input"] = text
+        state["messages"].append(HumanMessage(content=text, id=str(uuid.uuid4())))
+        with contextlib.redirect_stdout(io.StringIO()):
+            prompt_state = {**state, "messages": compact_history(state).messages}
+            extractor.invoke({
+                "messages": compact_history(state, keep_turns=EXTRACTOR_KEEP_TURNS).messages,
+                "provided_so_far": state["required_information"],
+                "user_input": text,
+            })
+        if turn % 2:
+            reply = None
+            for chunk in primary.stream(prompt_state):
+                reply = chunk if reply is None else reply + chunk
+        else:
+            reply = primary.invoke(prompt_state)
+        usages.append(reply.usage_metadata)
+        state["messages"].append(AIMessage(content=reply.content, id=str(uuid.uuid4())))
+        if turn == 2:
+            # A completed tool exchange in the history
+            call_id = f"toolu_{uuid.uuid4().hex[:20]}"
+            state["messages"].append(AIMessage(content="", tool_calls=[{"name": "savings_estimate_tool", "args": {"debt": 25000}, "id": call_id}], id=str(uuid.uuid4())))
+            state["messages"].append(ToolMessage(content='{"monthly_payment": 412.5, "months": 48}', tool_call_id=call_id, id=str(uuid.uuid4())))
+    return usages
+
+
+def is_primary(payload):
+    return not payload.get("tool_choice")
+
+
+def check(server, usages):
+    payloads = [p for p in server.payloads if is_primary(p)]
+    failures = []
+
+    def cached_prefix(payload):
+        tools = [t for t in payload["tools"] if "cache_control" in t]
+        system = [b for b in payload["system"] if "cache_control" in b]
+        return json.dumps(payload["tools"], sort_keys=True), json.dumps(system, sort_keys=True), len(tools), len(system)
+
+    first = cached_prefix(payloads[0])
+    if first[2] != 1 or first[3] != 1:
+        failures.append(f"expected one tools and one system breakpoint, got {first[2]} and {first[3]}")
+    for turn, payload in enumerate(payloads[1:], start=2):
+        if cached_prefix(payload)[:2] != first[:2]:
+            failures.append(f"turn {turn}: tools or static system prompt changed")
+        breakpoints = sum("cache_control" in block for m in payload["messages"] if isinstance(m["content"], list) for block in m["content"])
+        if breakpoints != 1:
+            failures.append(f"turn {turn}: {breakpoints} conversation breakpoints")
+        last = payload["messages"][-1]["content"][-1]
+        if "cache_control" in last or not last.get("text", "").startswith("Begin based on the latest user input"):
+            failures.append(f"turn {turn}: the per-turn input line is not the uncached last block")
+
+    # Tools + the static system prompt, up to the system breakpoint
+    blocks = prompt_blocks(payloads[0])
+    system_breakpoint = next(i for i, (block, marked) in enumerate(blocks) if marked and block["kind"] == "system")
+    static_tokens = sum(_estimate_tokens(block) for block, _ in blocks[:system_breakpoint + 1])
+    for turn, usage in enumerate(usages[1:], start=2):
+        details = usage.get("input_token_details")
+        if not details:
+            failures.append(f"turn {turn}: no input_token_details in usage_metadata")
+            continue
+        if details["cache_read"] < static_tokens:
+            failures.append(f"turn {turn}: read {details['cache_read']} cached tokens, expected at least the {static_tokens} of tools + system")
+        # Window not sliding yet: everything up to the new user message should come from the cache
+        if turn <= HISTORY_KEEP_TURNS and details["cache_read"] <= static_tokens:
+            failures.append(f"turn {turn}: previous conversation prefix not read from the cache")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--turns", type=int, default=10)
+    args = parser.parse_args()
+
+    results = {}
+    for prompt_caching in (True, False):
+        server = start_fake_anthropic(0)
+        usages = run_conversation(f"http://127.0.0.1:{server.server_port}", args.turns, prompt_caching)
+        results[prompt_caching] = (server, usages)
+
+    print(f"history window: {HISTORY_KEEP_TURNS} turns; primary prompt per turn (odd turns invoke, even turns stream)")
+    print(f"{'turn':>4} {'input':>7} {'cache read':>11} {'cache write':>12} {'uncached':>9}   {'input (caching off)':>20}")
+    for turn, (on, off) in enumerate(zip(results[True][1], results[False][1]), start=1):
+        details = on.get("input_token_details", {"cache_read": 0, "cache_creation": 0})
+        uncached = on["input_tokens"] - details["cache_read"] - details["cache_creation"]
+        print(f"{turn:>4} {on['input_tokens']:>7} {details['cache_read']:>11} {details['cache_creation']:>12} {uncached:>9}   {off['input_tokens']:>20}")
+
+    server, usages = results[True]
+    failures = check(server, usages)
+    off_payloads = results[False][0].payloads
+    if any("cache_control" in json.dumps(p) for p in off_payloads):
+        failures.append("cache_control sent with prompt_caching off")
+    for failure in failures:
+        print("FAIL:", failure)
+    print("prompt cache check", "FAILED" if failures else "OK")
+    raise SystemExit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
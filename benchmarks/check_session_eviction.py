@@ -0,0 +1,189 @@
+"""Conversations survive session eviction, and the memory checkpointer stays bounded.
+
+Runs --customers conversations through the graph the way the servers do
+(connect, then one user message at a time), round-robin, so every turn
+comes back to sessions that were pushed out in between. The customers
+are the scripted ones of benchmarks/load_harness.py and the model is
+FunnelChatModel. They stop before the permission questions, so no API is
+called. The run is done four times:
+- reference: unbounded InMemorySessionStore and the stock MemorySaver;
+- bounded: at most --max-sessions sessions (the rest are evicted and
+  rebuilt from the checkpoint on their next message) and BoundedMemorySaver;
+- tight: the same, but the saver holds fewer threads than there are
+  conversations, so it keeps the threads of evicted sessions pinned and
+  drops live ones, whose state the store writes back when it evicts them;
+- overflow: the saver holds fewer threads than there are evicted sessions,
+  so it has to drop pinned ones and those conversations are lost.
+Every conversation must end with the same details and the same user and
+assistant messages as in the reference in the bounded and tight runs (a
+restored session also holds the system notes the graph keeps in the
+checkpoint, such as the inferred city), and none may be lost there. In every
+bounded run the store and the saver must stay within their limits. Then it
+prints the sessions restored, the chat_memory gauges, and the checkpoint bytes
+and checkpoints per thread each checkpointer holds.
+
+Usage: python -m benchmarks.check_session_eviction [--customers 40] [--max-sessions 10] [--zips 19103 ...]
+"""
+import argparse
+import random
+import uuid
+
+from prometheus_client import REGISTRY
+
+import src.config as config
+from benchmarks.fake_llm import FunnelChatModel
+
+# Before the graph module binds the model into its chains
+config.llm = FunnelChatModel()
+
+import src.graph.builder as builder  # noqa: E402
+from benchmarks.load_harness import ZIPS, customer_script  # noqa: E402
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage  # noqa: E402
+from langgraph.checkpoint.memory import MemorySaver  # noqa: E402
+from src.state import ConvoState, RequiredInformation  # noqa: E402
+from src.utils.greeting_cache import seed_checkpoint  # noqa: E402
+from src.utils.memory_saver import BoundedMemorySaver  # noqa: E402
+from src.utils.session_store import InMemorySessionStore, checkpoint_restorer  # noqa: E402
+from src.utils.turn_events import TurnProcessor  # noqa: E402
+
+# Details only; "Yes, that's all correct" would lead to the permission questions
+DETAIL_MESSAGES = 5
+
+
+def run(scripts, checkpointer, make_store, lost=None):
+    builder.create_checkpointer = lambda: checkpointer
+    graph = builder.create_graph()
+    store = make_store(graph)
+    printed = set()
+    for session_id in scripts:
+        initial_state = ConvoState(
+            user_input="",
+            messages=[AIMessage(content="Hi, I'm Claire. May I have your first name?", id=str(uuid.uuid4()))],
+            required_information=RequiredInformation(),
+            contact_permission=None,
+            credit_pull_permission=None,
+            credit_pull_complete=None,
+            lead_create_complete=None,
+            savings_estimate=None,
+            reason_for_decline=None
+        )
+        graph_config = {"configurable": {"thread_id": str(uuid.uuid4())}}
+        store.create(session_id, initial_state, graph_config)
+        seed_checkpoint(graph, graph_config, initial_state)
+
+    for turn in range(DETAIL_MESSAGES):
+        for session_id, script in scripts.items():
+            if lost is not None and session_id in lost:
+                continue
+            session = store.load(session_id)
+            if session is None and lost is not None:
+                lost.add(session_id)
+                continue
+            if session is None:
+                raise AssertionError(f"session {session_id} lost before turn {turn + 1}")
+            state, graph_config = session
+            state['user_input'] = script[turn]
+            state['messages'].append(HumanMessage(content=script[turn]))
+            processor = TurnProcessor(state, printed)
+            for event in graph.stream(state, processor.config(graph_config), stream_mode="values"):
+                processor.feed(event)
+                if processor.done:
+                    break
+            store.save(session_id, processor.finish())
+
+    results = {}
+    for session_id in scripts:
+        if lost is not None and session_id in lost:
+            continue
+        state, _ = store.load(session_id)
+        conversation = [(type(m).__name__, m.content) for m in state['messages'] if not isinstance(m, SystemMessage)]
+        results[session_id] = (conversation, state['required_information'].dict())
+    return results, store
+
+
+def metric(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+def checkpoint_bytes(saver):
+    checkpoints = [saved for thread in saver.storage.values() for saved in thread.values()]
+    size = sum(len(checkpoint) + len(metadata) for checkpoint, metadata in checkpoints)
+    size += sum(len(value) for writes in saver.writes.values() for _, _, value in writes)
+    return size, len(checkpoints) / max(1, len(saver.storage))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--customers", type=int, default=40)
+    parser.add_argument("--max-sessions", type=int, default=10)
+    parser.add_argument("--zips", nargs="+", default=ZIPS)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    scripts = {f"sid-{index}": customer_script(index, rng, args.zips) for index in range(args.customers)}
+
+    stock = MemorySaver()
+    reference, _ = run(scripts, stock, lambda graph: InMemorySessionStore())
+    def bounded_store(graph):
+        return InMemorySessionStore(max_sessions=args.max_sessions, restore=checkpoint_restorer(graph))
+
+    failures = []
+
+    def check_limits(name, store, saver):
+        if len(store) > args.max_sessions:
+            failures.append(f"{name}: {len(store)} sessions held, limit {args.max_sessions}")
+        if saver.max_threads is not None and len(saver.storage) > saver.max_threads:
+            failures.append(f"{name}: {len(saver.storage)} checkpoint threads held, limit {saver.max_threads}")
+
+    # Before the bounded run, whose gauges are printed below
+    tight_threads = args.customers - args.max_sessions // 2
+    rewritten_before = metric("chat_session_handoffs_total", outcome="rewritten")
+    tight_saver = BoundedMemorySaver(max_threads=tight_threads)
+    tight, tight_store = run(scripts, tight_saver, bounded_store)
+    rewritten = metric("chat_session_handoffs_total", outcome="rewritten") - rewritten_before
+    check_limits("tight", tight_store, tight_saver)
+
+    overflow_threads = args.customers - args.max_sessions - 5
+    pinned_before = metric("chat_memory_evictions_total", store="checkpoints", reason="pinned")
+    overflow_saver = BoundedMemorySaver(max_threads=overflow_threads)
+    lost = set()
+    _, overflow_store = run(scripts, overflow_saver, bounded_store, lost)
+    pinned_dropped = metric("chat_memory_evictions_total", store="checkpoints", reason="pinned") - pinned_before
+    check_limits("overflow", overflow_store, overflow_saver)
+
+    bounded_saver = BoundedMemorySaver()
+    restored_before = metric("chat_session_restores_total", outcome="restored")
+    bounded, store = run(scripts, bounded_saver, bounded_store)
+    restored = metric("chat_session_restores_total", outcome="restored") - restored_before
+
+    check_limits("bounded", store, bounded_saver)
+    failures += [f"{session_id} differs ({name})" for name, results in (("bounded", bounded), ("tight", tight))
+                 for session_id in scripts if results[session_id] != reference[session_id]]
+    complete = sum(all(value is not None for value in details.values()) for _, details in reference.values())
+    print(f"{args.customers} conversations x {DETAIL_MESSAGES} turns, {complete} with every detail collected")
+    print(f"bounded store: {len(store)} sessions held, {restored:.0f} restored from the checkpoint, "
+          f"~{metric('chat_memory_bytes', store='sessions') / 1024:.0f} KiB estimated")
+    print(f"tight ({tight_threads} checkpoint threads): {len(tight_store)} sessions held, "
+          f"{rewritten:.0f} written back to the checkpoint on eviction, none lost")
+    print(f"overflow ({overflow_threads} checkpoint threads): {len(overflow_store)} sessions held, "
+          f"{pinned_dropped:.0f} pinned threads dropped, {len(lost)} conversations lost")
+    for name, saver in (("MemorySaver", stock), ("BoundedMemorySaver", bounded_saver)):
+        size, per_thread = checkpoint_bytes(saver)
+        print(f"{name:<19} {size / 1024:>8.0f} KiB of checkpoints, {per_thread:.1f} checkpoints per thread")
+    print(f"chat_memory_bytes{{store=\"checkpoints\"}} {metric('chat_memory_bytes', store='checkpoints'):.0f}, "
+          f"chat_memory_entries{{store=\"checkpoints\"}} {metric('chat_memory_entries', store='checkpoints'):.0f}")
+
+    if restored == 0:
+        failures.append("no session was restored")
+    if rewritten == 0:
+        failures.append("tight: no session state was written back")
+    if not lost or pinned_dropped == 0:
+        failures.append("overflow: no pinned thread was dropped")
+    for failure in failures:
+        print("FAIL:", failure)
+    print("eviction check", "FAILED" if failures else "OK")
+    raise SystemExit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
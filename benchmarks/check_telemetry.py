@@ -0,0 +1,164 @@
+"""Spans and metrics of a funnel run, as served on /metrics.
+
+Runs the fast-path funnel of benchmarks/check_funnel.py, which is two turns:
+the user grants contact permission, then agrees to the credit pull. Neither
+answer can carry a detail, so a third turn gives an email address to get an
+extractor call. The graph
+is checkpointed by the sqlite stand-in of MSSQLSaver, and the final state is
+saved to and loaded from a RedisSessionStore on fakeredis. The check then reads
+the Prometheus exposition from render_metrics() and expects:
+- node spans for funnel, tools, assistant and update_convo_state;
+- primary and extractor model calls, with their token counts;
+- the credit pull, lead and savings tools, and the HTTP attempts of the API tools;
+- checkpoint and session (de)serialization;
+- one chat_turn_seconds observation per turn (3).
+
+The overhead of the callback handler is also timed: the same funnel is run with
+the model and the API answering instantly, with and without telemetry.
+
+Usage: python -m benchmarks.check_telemetry [--llm-latency-ms 100] [--api-latency-ms 100] [--repeat 20]
+"""
+import argparse
+import contextlib
+import io
+import time
+import uuid
+
+from prometheus_client.parser import text_string_to_metric_families
+
+import benchmarks.check_funnel as check_funnel
+import src.graph.builder as builder
+from benchmarks.fake_llm import ReplayChatModel
+from benchmarks.sqlite_standin import SQLiteStandInSaver
+from langchain_core.messages import HumanMessage
+from src.prompts import primary_assistant_prompt
+from src.state import RequiredInformation
+from src.utils.session_store import RedisSessionStore
+from src.utils.telemetry import render_metrics
+from src.utils.turn_events import TurnProcessor
+
+EXPECTED_SPANS = [
+    ("node", "funnel"), ("node", "tools"), ("node", "assistant"), ("node", "update_convo_state"),
+    ("llm", "primary"), ("llm", "extractor"),
+    ("tool", "credit_pull_api_tool"), ("tool", "lead_create_api_tool"), ("tool", "savings_estimate_tool"),
+    ("serde", "checkpoint_dumps"), ("serde", "checkpoint_loads"), ("serde", "session_dumps"), ("serde", "session_loads"),
+]
+
+
+def sqlite_checkpointer():
+    saver = SQLiteStandInSaver()
+    saver.setup()
+    return saver
+
+
+def collecting_turn(llm_latency_s):
+    """One turn while details are still being collected, so the extractor runs."""
+    builder.primary_assistant_chain = primary_assistant_prompt | ReplayChatModel(script=["Thanks! And your phone number?"], latency_s=llm_latency_s)
+    graph = builder.create_graph()
+    state = check_funnel.new_state()
+    message = "My email is alex@example.com"
+    state.update(
+        user_input=message,
+        messages=[HumanMessage(content=message, id=str(uuid.uuid4()))],
+        required_information=RequiredInformation(Debt=23000.0, FirstName="Alex"),
+        contact_permission=None,
+    )
+    with contextlib.redirect_stdout(io.StringIO()):
+        check_funnel.process_message(graph, state, {"configurable": {"thread_id": str(uuid.uuid4())}}, [])
+
+
+def scrape():
+    """{(metric sample name, labels tuple): value} from the /metrics body."""
+    body, _ = render_metrics()
+    samples = {}
+    for family in text_string_to_metric_families(body.decode()):
+        for sample in family.samples:
+            samples[(sample.name, tuple(sorted(sample.labels.items())))] = sample.value
+    return samples
+
+
+def span_counts(samples):
+    counts = {}
+    for (name, labels), value in samples.items():
+        if name == "chat_span_seconds_count":
+            labels = dict(labels)
+            counts[(labels["kind"], labels["name"])] = value
+    return counts
+
+
+def delta(after, before):
+    return {key: value - before.get(key, 0) for key, value in after.items() if value - before.get(key, 0)}
+
+
+def funnel_seconds(repeat, telemetry):
+    original = TurnProcessor.config
+    if not telemetry:
+        TurnProcessor.config = lambda self, config: config
+    try:
+        start = time.perf_counter()
+        for _ in range(repeat):
+            check_funnel.run_funnel("fast path", 0)
+        return (time.perf_counter() - start) / repeat
+    finally:
+        TurnProcessor.config = original
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--llm-latency-ms", type=float, default=100.0)
+    parser.add_argument("--api-latency-ms", type=float, default=100.0)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    import fakeredis
+
+    create_checkpointer = builder.create_checkpointer
+    builder.create_checkpointer = sqlite_checkpointer
+    check_funnel._stub.faults.latency_ms = args.api_latency_ms
+    before = scrape()
+    run = check_funnel.run_funnel("fast path", args.llm_latency_ms / 1000)
+    collecting_turn(args.llm_latency_ms / 1000)
+    # Saved by one worker, loaded by another
+    client = fakeredis.FakeRedis()
+    state = check_funnel.new_state()
+    state.update(run["state"])
+    RedisSessionStore(client).create("sid", state, {"configurable": {"thread_id": "t"}})
+    RedisSessionStore(client).load("sid")
+    changes = delta(scrape(), before)
+
+    spans = span_counts(changes)
+    sums = {key: changes.get(("chat_span_seconds_sum", tuple(sorted({"kind": key[0], "name": key[1]}.items()))), 0.0) for key in spans}
+    print(f"fast-path funnel, model latency {args.llm_latency_ms:.0f} ms, API latency {args.api_latency_ms:.0f} ms: {run['seconds']:.2f}s")
+    print(f"{'kind':<6} {'name':<34} {'count':>5} {'seconds':>8}")
+    for key in sorted(spans, key=lambda key: -sums[key]):
+        print(f"{key[0]:<6} {key[1]:<34} {spans[key]:>5.0f} {sums[key]:>8.3f}")
+    tokens = {dict(labels)["role"] + " " + dict(labels)["type"]: value for (name, labels), value in changes.items() if name == "chat_llm_tokens_total"}
+    turns = changes.get(("chat_turn_seconds_count", ()), 0)
+    print("tokens:", tokens)
+    print("turns observed:", turns)
+
+    failures = [f"no {kind} span {name!r}" for kind, name in EXPECTED_SPANS if not spans.get((kind, name))]
+    if not any(kind == "http" for kind, _ in spans):
+        failures.append("no http spans")
+    for role in ("primary", "extractor"):
+        if not tokens.get(f"{role} prompt"):
+            failures.append(f"no {role} prompt tokens")
+    if turns != 3:
+        failures.append(f"{turns} turns observed, expected 3")
+    if spans.get(("llm", "primary")) != run["primary_calls"] + 1:
+        failures.append(f"{spans.get(('llm', 'primary'))} primary spans for {run['primary_calls'] + 1} primary calls")
+
+    builder.create_checkpointer = create_checkpointer
+    check_funnel._stub.faults.latency_ms = 0
+    funnel_seconds(3, True)
+    with_telemetry = funnel_seconds(args.repeat, True)
+    without = funnel_seconds(args.repeat, False)
+    print(f"instant funnel (2 turns): {without * 1000:.1f} ms without telemetry, {with_telemetry * 1000:.1f} ms with")
+
+    for failure in failures:
+        print("FAIL:", failure)
+    print("telemetry check", "FAILED" if failures else "OK")
+    raise SystemExit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+"""Local stand-in for the Anthropic Messages API that records payloads and simulates prompt caching.
+
+Answers POST /v1/messages, streaming (SSE) or not, with a short text reply, or
+with an empty tool_use block when tool_choice forces a tool (structured
+output). Every request body is kept in server.payloads.
+
+Prompt caching follows the documented behaviour closely enough to check
+breakpoint placement: the prompt is read as a sequence of blocks in the order
+tools -> system -> messages; a block with cache_control writes the prefix up to
+it; a later request reads the longest cached prefix ending at one of its
+breakpoints, or at a block boundary up to LOOKBACK_BLOCKS before one. Prefixes
+under --min-cache-tokens are not cached. Tokens are estimated as chars/4.
+
+Point CustomChatAnthropic at it with base_url=http://127.0.0.1:<port>.
+
+Usage: python -m benchmarks.fake_anthropic_api --port 8098
+"""
+import argparse
+import hashlib
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+LOOKBACK_BLOCKS = 20
+
+
+def _estimate_tokens(block):
+    return max(1, len(json.dumps(block, sort_keys=True)) // 4)
+
+
+def prompt_blocks(payload):
+    """(block without cache_control, has breakpoint) in cache order."""
+    blocks = []
+
+    def add(kind, block):
+        if isinstance(block, str):
+            block = {"type": "text", "text": block}
+        marked = "cache_control" in block
+        blocks.append(({"kind": kind, **{k: v for k, v in block.items() if k != "cache_control"}}, marked))
+
+    for tool in payload.get("tools") or []:
+        add("tool", tool)
+    system = payload.get("system")
+    for block in [system] if isinstance(system, str) else system or []:
+        add("system", block)
+    for message in payload["messages"]:
+        content = message["content"]
+        for block in [content] if isinstance(content, str) else content:
+            add(message["role"], block)
+    return blocks
+
+
+class PromptCache:
+    def __init__(self, min_cache_tokens=1024):
+        self.min_cache_tokens = min_cache_tokens
+        self.entries = set()
+        self.lock = threading.Lock()
+
+    def usage(self, payload):
+        """input_tokens, cache_read_input_tokens, cache_creation_input_tokens for one request."""
+        blocks = prompt_blocks(payload)
+        digests, tokens = [], [0]
+        digest = hashlib.sha256()
+        for block, _ in blocks:
+            digest.update(json.dumps(block, sort_keys=True).encode())
+            digests.append(digest.copy().hexdigest())
+            tokens.append(tokens[-1] + _estimate_tokens(block))
+        breakpoints = [i for i, (_, marked) in enumerate(blocks) if marked]
+
+        with self.lock:
+            read_end = 0
+            for bp in breakpoints:
+                for i in range(bp, max(-1, bp - LOOKBACK_BLOCKS - 1), -1):
+                    if digests[i] in self.entries:
+                        read_end = max(read_end, i + 1)
+                        break
+            write_end = read_end
+            for bp in breakpoints:
+                if tokens[bp + 1] >= self.min_cache_tokens:
+                    self.entries.add(digests[bp])
+                    write_end = max(write_end, bp + 1)
+
+        cache_read = tokens[read_end]
+        cache_creation = tokens[write_end] - cache_read
+        return tokens[-1] - cache_read - cache_creation, cache_read, cache_creation
+
+
+def make_handler(server):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send_json(self, status, body):
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            payload = json.loads(self.rfile.read(length) or b"{}")
+            if not self.path.startswith("/v1/messages"):
+                return self._send_json(404, {"type": "error", "error": {"type": "not_found_error", "message": self.path}})
+            with server.lock:
+                server.payloads.append(payload)
+            input_tokens, cache_read, cache_creation = server.cache.usage(payload)
+            usage = {
+                "input_tokens": input_tokens,
+                "output_tokens": 0,
+                "cache_read_input_tokens": cache_read,
+                "cache_creation_input_tokens": cache_creation,
+            }
+            time.sleep(server.latency_s)
+
+            tool_choice = payload.get("tool_choice") or {}
+            if tool_choice.get("type") == "tool":
+                content = [{"type": "tool_use", "id": f"toolu_{uuid.uuid4().hex[:20]}", "name": tool_choice["name"], "input": {}}]
+                stop_reason = "tool_use"
+            else:
+                content = [{"type": "text", "text": server.reply}]
+                stop_reason = "end_turn"
+            usage["output_tokens"] = sum(_estimate_tokens(block) for block in content)
+            message = {
+                "id": f"msg_{uuid.uuid4().hex[:24]}",
+                "type": "message",
+                "role": "assistant",
+                "model": payload.get("model"),
+                "content": content,
+                "stop_reason": stop_reason,
+                "stop_sequence": None,
+                "usage": usage,
+            }
+            if payload.get("stream"):
+                return self._stream(message)
+            self._send_json(200, message)
+
+        def _stream(self, message):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Connection", "close")
+            self.end_headers()
+
+            def event(name, data):
+                self.wfile.write(f"event: {name}\ndata: {json.dumps({'type': name, **data})}\n\n".encode())
+                self.wfile.flush()
+
+            usage = message["usage"]
+            event("message_start", {"message": {**message, "content": [], "stop_reason": None, "usage": {**usage, "output_tokens": 1}}})
+            for index, block in enumerate(message["content"]):
+                if block["type"] == "text":
+                    event("content_block_start", {"index": index, "content_block": {"type": "text", "text": ""}})
+                    for word in block["text"].split(" "):
+                        event("content_block_delta", {"index": index, "delta": {"type": "text_delta", "text": word + " "}})
+                else:
+                    event("content_block_start", {"index": index, "content_block": {**block, "input": {}}})
+                    event("content_block_delta", {"index": index, "delta": {"type": "input_json_delta", "partial_json": json.dumps(block["input"])}})
+                event("content_block_stop", {"index": index})
+            event("message_delta", {"delta": {"stop_reason": message["stop_reason"], "stop_sequence": None}, "usage": {"output_tokens": usage["output_tokens"]}})
+            event("message_stop", {})
+            self.close_connection = True
+
+    return Handler
+
+
+class FakeAnthropicServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256
+
+
+def start_fake_anthropic(port=0, *, min_cache_tokens=1024, latency_s=0.0, reply="Sure, happy to help with that."):
+    """Serve from a daemon thread; returns the server (server.server_port is the bound port)."""
+    server = FakeAnthropicServer(("127.0.0.1", port), None)
+    server.RequestHandlerClass = make_handler(server)
+    server.payloads = []
+    server.lock = threading.Lock()
+    server.cache = PromptCache(min_cache_tokens)
+    server.latency_s = latency_s
+    server.reply = reply
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8098)
+    parser.add_argument("--min-cache-tokens", type=int, default=1024)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = start_fake_anthropic(args.port, min_cache_tokens=args.min_cache_tokens, latency_s=args.latency_ms / 1000)
+    print(f"Fake Anthropic API on http://127.0.0.1:{server.server_port}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+"""Offline chat model that replays a script of responses, for the benchmark harnesses.
+
+Each call returns the next entry of `script`, the last one repeating:
+  ""          - an empty response (no content, no tool calls)
+  "text"      - a text reply
+  {"name": .., "args": ..} - a tool call
+after sleeping `latency_s` (asyncio.sleep on the async path, so event-loop
+concurrency stays realistic). bind_tools() returns the model itself and
+with_structured_output() returns an extractor that finds nothing; it goes
+through its own instant ReplayChatModel, so extraction shows up as a model call
+to callbacks. Replies carry usage_metadata of roughly 4 characters per token.
+
+FunnelChatModel plays both models of a whole conversation instead, for the load
+harness (benchmarks/load_harness.py). Its answers depend only on the prompt:
+- primary: asks for the first detail the customer has not given yet, then
+  summarizes them and asks for confirmation; a "yes" to that calls
+  AskContactPermissionTool. After a tool result it calls the next funnel tool
+  (for FUNNEL_FAST_PATH=0) and, after savings_estimate_tool, presents the estimate.
+- extractor (with_structured_output): reads the details out of the customer's
+  messages with the regexes in DETAIL_PATTERNS, so customer scripts must use
+  those phrasings.
+Text replies are padded to `reply_tokens` words and stream one word per
+`token_s` after `latency_s` to the first token.
+"""
+import asyncio
+import json
+import re
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage, SystemMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.pydantic_v1 import PrivateAttr
+from langchain_core.runnables import RunnableLambda
+
+
+class ReplayChatModel(BaseChatModel):
+    script: List[Union[str, dict]] = [""]
+    latency_s: float = 0.0
+    calls: int = 0
+    _lock: Any = PrivateAttr(default_factory=threading.Lock)
+
+    @property
+    def _llm_type(self) -> str:
+        return "replay"
+
+    def _next_message(self, messages) -> AIMessage:
+        with self._lock:
+            entry = self.script[min(self.calls, len(self.script) - 1)]
+            self.calls += 1
+        input_tokens = sum(len(str(message.content)) for message in messages) // 4
+        if isinstance(entry, dict):
+            output_tokens = 10
+            content, tool_calls = "", [{"name": entry["name"], "args": entry.get("args", {}), "id": f"call_{uuid.uuid4().hex[:12]}"}]
+        else:
+            output_tokens = len(entry) // 4 + 1
+            content, tool_calls = entry, []
+        usage = {"input_tokens": input_tokens, "output_tokens": output_tokens, "total_tokens": input_tokens + output_tokens}
+        return AIMessage(content=content, tool_calls=tool_calls, usage_metadata=usage)
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        time.sleep(self.latency_s)
+        return ChatResult(generations=[ChatGeneration(message=self._next_message(messages))])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        await asyncio.sleep(self.latency_s)
+        return ChatResult(generations=[ChatGeneration(message=self._next_message(messages))])
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def with_structured_output(self, schema, **kwargs):
+        return ReplayChatModel() | RunnableLambda(lambda _: schema())
+
+
+# field(s) -> pattern; the groups fill the fields in order
+DETAIL_PATTERNS = [
+    (("FirstName", "LastName"), re.compile(r"\bI'?m ([A-Z][a-z]+) ([A-Z][a-z]+)")),
+    (("Debt",), re.compile(r"\$([\d,]+(?:\.\d+)?)")),
+    (("Email",), re.compile(r"([\w.+-]+@[\w-]+(?:\.[\w-]+)+)")),
+    (("Phone",), re.compile(r"\b(\d{3}[-. ]?\d{3}[-. ]?\d{4})\b")),
+    (("Address", "Zip"), re.compile(r"\blive at ([^,]+), zip (\d{5})")),
+    (("DateOfBirth",), re.compile(r"\b(\d{4}-\d{2}-\d{2})\b")),
+]
+# What the primary model asks for, in order; City and State come from the zip
+QUESTIONS = [
+    (("FirstName", "LastName"), "May I have your first and last name?"),
+    (("Debt",), "Thanks! About how much unsecured debt do you have?"),
+    (("Email", "Phone"), "Got it. What is the best email and phone number to reach you?"),
+    (("Address", "Zip"), "What is your street address and zip code?"),
+    (("DateOfBirth",), "And finally, what is your date of birth?"),
+]
+CONFIRM_QUESTION = "Is everything correct?"
+AFFIRMATIVE = re.compile(r"^\s*(yes|yeah|yep|correct|that's right)\b", re.IGNORECASE)
+ESTIMATE_REPLY = "Great news! Based on your credit report, here is your free savings estimate."
+DECLINED_REPLY = "No problem, I understand. Is there anything else I can help you with?"
+# Funnel order when the model picks the tools (FUNNEL_FAST_PATH=0)
+NEXT_TOOL = {
+    "AskContactPermissionTool": "AskCreditPullPermissionTool",
+    "AskCreditPullPermissionTool": "credit_pull_api_tool",
+    "credit_pull_api_tool": "lead_create_api_tool",
+    "lead_create_api_tool": "savings_estimate_tool",
+}
+FILLER = "I am here to help you find the right program for your situation".split()
+_COLLECTED = re.compile(r"^- Collected: (.*)$", re.MULTILINE)
+
+
+def parse_details(text: str) -> Dict[str, Any]:
+    details = {}
+    for fields, pattern in DETAIL_PATTERNS:
+        match = pattern.search(text)
+        if match:
+            for field, value in zip(fields, match.groups()):
+                details[field] = float(value.replace(",", "")) if field == "Debt" else re.sub(r"[-. ]", "", value) if field == "Phone" else value
+    return details
+
+
+def _known_details(messages) -> Dict[str, Any]:
+    """Details in the customer's messages, plus those a history summary lists."""
+    details = {}
+    for message in messages:
+        if isinstance(message, HumanMessage):
+            details.update(parse_details(str(message.content)))
+        elif isinstance(message, SystemMessage):
+            collected = _COLLECTED.search(str(message.content))
+            if collected:
+                details.update(item.split("=", 1) for item in collected.group(1).split(", ") if "=" in item)
+    return details
+
+
+def _tool_name(messages, tool_call_id: str) -> Optional[str]:
+    for message in messages:
+        if isinstance(message, AIMessage):
+            for tool_call in message.tool_calls:
+                if tool_call["id"] == tool_call_id:
+                    return tool_call["name"]
+    return None
+
+
+def primary_reply(messages) -> Tuple[str, Optional[str]]:
+    """(text, tool name) the primary model answers with."""
+    # The prompt's system lines (instructions, latest input) carry no history
+    history = [m for m in messages if not isinstance(m, SystemMessage) or _COLLECTED.search(str(m.content))]
+    last = history[-1] if history else None
+    if isinstance(last, ToolMessage):
+        name = _tool_name(history, last.tool_call_id)
+        if "false" in str(last.content).lower() and name in NEXT_TOOL and name.startswith("Ask"):
+            return DECLINED_REPLY, None
+        if name in NEXT_TOOL:
+            return "", NEXT_TOOL[name]
+        return ESTIMATE_REPLY, None
+
+    details = _known_details(history)
+    for fields, question in QUESTIONS:
+        if any(field not in details for field in fields):
+            return question, None
+    previous = next((m for m in reversed(history[:-1]) if isinstance(m, AIMessage)), None)
+    if isinstance(last, HumanMessage) and AFFIRMATIVE.match(str(last.content)) \
+            and previous is not None and CONFIRM_QUESTION in str(previous.content):
+        return "", "AskContactPermissionTool"
+    summary = ", ".join(f"{field}: {details[field]}" for fields, _ in QUESTIONS for field in fields)
+    return f"Here is what I have: {summary}. {CONFIRM_QUESTION}", None
+
+
+class FunnelChatModel(BaseChatModel):
+    latency_s: float = 0.0
+    token_s: float = 0.0
+    reply_tokens: int = 0
+    extractor: bool = False
+    calls: int = 0
+    _lock: Any = PrivateAttr(default_factory=threading.Lock)
+
+    @property
+    def _llm_type(self) -> str:
+        return "funnel"
+
+    def _reply(self, messages) -> Tuple[List[str], Optional[dict], Dict[str, int]]:
+        """Content pieces (one per output token), tool call and usage of the answer."""
+        with self._lock:
+            self.calls += 1
+        tool_call = None
+        if self.extractor:
+            pieces = [json.dumps(_known_details(m for m in messages if isinstance(m, HumanMessage)))]
+            output_tokens = len(pieces[0]) // 4 + 1
+        else:
+            text, tool_name = primary_reply(messages)
+            words = text.split()
+            if words and len(words) < self.reply_tokens:
+                words += (FILLER * (self.reply_tokens // len(FILLER) + 1))[:self.reply_tokens - len(words)]
+            pieces = [word if i == 0 else " " + word for i, word in enumerate(words)]
+            output_tokens = len(pieces)
+            if tool_name is not None:
+                tool_call = {"name": tool_name, "args": {}, "id": f"call_{uuid.uuid4().hex[:12]}"}
+                output_tokens += 10
+        input_tokens = sum(len(str(message.content)) for message in messages) // 4
+        usage = {"input_tokens": input_tokens, "output_tokens": output_tokens, "total_tokens": input_tokens + output_tokens}
+        return pieces, tool_call, usage
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        pieces, tool_call, usage = self._reply(messages)
+        time.sleep(self.latency_s + self.token_s * max(0, len(pieces) - 1))
+        message = AIMessage(content="".join(pieces), tool_calls=[tool_call] if tool_call else [], usage_metadata=usage)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        pieces, tool_call, usage = self._reply(messages)
+        await asyncio.sleep(self.latency_s + self.token_s * max(0, len(pieces) - 1))
+        message = AIMessage(content="".join(pieces), tool_calls=[tool_call] if tool_call else [], usage_metadata=usage)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        pieces, tool_call, usage = self._reply(messages)
+        await asyncio.sleep(self.latency_s)
+        for i, piece in enumerate(pieces):
+            if i:
+                await asyncio.sleep(self.token_s)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=piece))
+            if run_manager:
+                await run_manager.on_llm_new_token(piece, chunk=chunk)
+            yield chunk
+        tool_call_chunks = [{"name": tool_call["name"], "args": "{}", "id": tool_call["id"], "index": 0}] if tool_call else []
+        yield ChatGenerationChunk(message=AIMessageChunk(content="", tool_call_chunks=tool_call_chunks, usage_metadata=usage))
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def with_structured_output(self, schema, **kwargs):
+        extractor = FunnelChatModel(latency_s=self.latency_s, token_s=self.token_s, extractor=True)
+        return extractor | RunnableLambda(lambda message: schema(**json.loads(message.content)))
@@ -0,0 +1,59 @@
+"""The chat server with FunnelChatModel (benchmarks/fake_llm.py) in place of the provider.
+
+Runs app.py on eventlet or asgi_app.py on uvicorn, as deployed, with every model
+call answered by the scripted funnel model, so the whole conversation can be
+driven offline (benchmarks/load_harness.py starts it). The API tools call
+CARBON_API_BASE_URL when it is set, otherwise a stub_carbon_api started in
+this process. Greetings are cached in a temporary file rather than the real
+greeting cache.
+
+Usage: python -m benchmarks.fake_server [--server asgi|eventlet] [--port 8080] [--llm-latency-ms 400] [--llm-token-ms 15] [--reply-tokens 40] [--api-latency-ms 150]
+"""
+import argparse
+import os
+import tempfile
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--server", choices=["asgi", "eventlet"], default="asgi")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--llm-latency-ms", type=float, default=400.0, help="time to the first token of every model call")
+    parser.add_argument("--llm-token-ms", type=float, default=15.0, help="time per further output token")
+    parser.add_argument("--reply-tokens", type=int, default=40, help="length of the text replies")
+    parser.add_argument("--api-latency-ms", type=float, default=150.0, help="stub API latency, without CARBON_API_BASE_URL")
+    args = parser.parse_args()
+
+    if args.server == "eventlet":
+        # What gunicorn's eventlet worker does before loading the app
+        import eventlet
+        eventlet.monkey_patch()
+
+    if not os.getenv("CARBON_API_BASE_URL"):
+        from benchmarks.stub_carbon_api import Faults, start_stub_server
+
+        stub = start_stub_server(faults=Faults(latency_ms=args.api_latency_ms))
+        os.environ["CARBON_API_BASE_URL"] = f"http://127.0.0.1:{stub.server_port}"
+    os.environ.setdefault("GREETING_CACHE_PATH", os.path.join(tempfile.mkdtemp(), "greetings.json"))
+
+    import src.config as config
+    from benchmarks.fake_llm import FunnelChatModel
+
+    # Before app imports the graph, which binds the model into its chains
+    config.llm = FunnelChatModel(latency_s=args.llm_latency_ms / 1000, token_s=args.llm_token_ms / 1000, reply_tokens=args.reply_tokens)
+
+    if args.server == "eventlet":
+        import app
+
+        app.socketio.run(app.app, host=args.host, port=args.port)
+    else:
+        import uvicorn
+
+        import asgi_app
+
+        uvicorn.run(asgi_app.asgi_app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
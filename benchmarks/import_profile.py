@@ -0,0 +1,91 @@
+"""Import-time profile of the server entrypoint, from `python -X importtime`.
+
+Imports the module (asgi_app by default) in a fresh interpreter with
+-X importtime. Prints the wall time and the slowest top-level packages by
+total self time. Also prints the slowest import chains by cumulative time.
+--save writes the per-package numbers to a JSON file. --baseline compares
+against such a file and exits 1 when the total grew by more than
+--max-regression, so a regression can be caught in CI.
+
+This reports the cost each worker pays when it imports the app itself; with
+gunicorn --preload (gunicorn.conf.py) it is paid once, in the master.
+
+Usage: python -m benchmarks.import_profile [--module asgi_app] [--top 15] [--save importtime.json] [--baseline importtime.json]
+"""
+import argparse
+import json
+import re
+import subprocess
+import sys
+from collections import defaultdict
+
+LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)$")
+
+
+def profile(module):
+    code = f"import time; start = time.perf_counter(); import {module}; print(time.perf_counter() - start)"
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        raise SystemExit(f"import {module} failed:\n{proc.stderr[-3000:]}")
+    wall = float(proc.stdout.strip().splitlines()[-1])
+    rows = []
+    for line in proc.stderr.splitlines():
+        match = LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            rows.append((name, int(self_us) / 1e6, int(cumulative_us) / 1e6, len(indent) // 2))
+    return wall, rows
+
+
+def by_package(rows):
+    packages = defaultdict(float)
+    for name, self_s, _, _ in rows:
+        packages[name.split(".")[0]] += self_s
+    return dict(sorted(packages.items(), key=lambda item: -item[1]))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--module", default="asgi_app")
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--save", help="write the per-package profile to this JSON file")
+    parser.add_argument("--baseline", help="compare against a profile written with --save")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="allowed growth of the total over the baseline (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    # Warm the bytecode cache first, so both runs measure imports rather than compilation
+    profile(args.module)
+    wall, rows = profile(args.module)
+    packages = by_package(rows)
+
+    print(f"import {args.module}: {wall:.3f}s wall, {len(rows)} modules")
+    print(f"\n{'package':<28} {'self s':>8}")
+    for name, seconds in list(packages.items())[:args.top]:
+        print(f"{name:<28} {seconds:>8.3f}")
+
+    print(f"\n{'slowest imports (depth <= 2)':<52} {'cumulative s':>12}")
+    for name, _, cumulative_s, depth in sorted((r for r in rows if r[3] <= 2), key=lambda r: -r[2])[:args.top]:
+        print(f"{'  ' * depth + name:<52} {cumulative_s:>12.3f}")
+
+    result = {"module": args.module, "wall": wall, "packages": packages}
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(result, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        growth = wall / baseline["wall"] - 1
+        print(f"\nvs baseline: {baseline['wall']:.3f}s -> {wall:.3f}s ({growth:+.0%})")
+        for name in sorted(set(packages) | set(baseline["packages"]), key=lambda n: -abs(packages.get(n, 0) - baseline["packages"].get(n, 0)))[:5]:
+            print(f"  {name:<26} {baseline['packages'].get(name, 0):>7.3f} -> {packages.get(name, 0):>7.3f}")
+        if growth > args.max_regression:
+            print(f"FAIL: import time grew more than {args.max_regression:.0%}")
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
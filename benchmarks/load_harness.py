@@ -0,0 +1,311 @@
+"""Offline load test: simulated customers run the whole funnel against one server process.
+
+Starts benchmarks/fake_server.py (the real app.py or asgi_app.py, with the
+scripted FunnelChatModel as the provider) pointed at a stub_carbon_api running
+in this process, then sends N customers at once through the conversation over
+Socket.IO: name, debt, email and phone, address and zip, date of birth,
+confirming the summary, then "yes" to the contact and credit pull permission
+questions. Customers and their messages come from --seed, and the model's
+answers only depend on the prompt, so a run can be repeated exactly and two
+builds compared. Each session level runs on the same server, one after
+another.
+
+Reported per level:
+- throughput: leads created per second, and turns per second; "ended" counts
+  the customers who got through their script and both permission questions;
+- turn latency p50/p95/p99, from sending a message (or permission answer)
+  until its bot_response or user_input_required, and time to the first
+  streamed token;
+- memory per session: the server's peak RSS above its RSS before the level,
+  divided by the sessions, and what is still held once they disconnected;
+- LLM calls per completed lead: primary and extractor calls (from the
+  server's /metrics) over the leads the stub created;
+- connect latency p50, from connecting until the greeting, and resume
+  latency p50, from reconnecting with the resume token until the replay.
+After --resume-after turns (0: never) every customer drops its connection and
+reconnects with its resume token, giving the id of the reply before the last
+one it saw. The server has to restore the thread from the checkpointer and
+replay that last reply, without a model call (LLM/lead is unchanged);
+anything else fails the customer.
+--output writes every turn as a JSON line. The customers' zip codes must be in
+the zip index (--zips); with FUNNEL_FAST_PATH=0 or STREAM_TOKENS=0 set through
+--server-env the other code paths are measured. Reads the server's RSS from
+/proc, so memory is only reported on Linux.
+
+Customers pause --think-ms before each message. Both servers emit a turn's
+reply before they save the session, so an answer sent within milliseconds can
+be handled against the previous state; the eventlet server shows this with no
+pause at 10 sessions.
+
+Usage: python -m benchmarks.load_harness [--server asgi|eventlet] [--sessions 1 10 50] [--resume-after 3] [--llm-latency-ms 400] [--llm-token-ms 15] [--reply-tokens 40] [--api-latency-ms 150] [--server-env FUNNEL_FAST_PATH=0] [--output turns.jsonl]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+from pathlib import Path
+
+import socketio
+from prometheus_client.parser import text_string_to_metric_families
+
+from benchmarks.load_test_sessions import percentile
+from benchmarks.stub_carbon_api import Faults, start_stub_server
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+FIRST_NAMES = ["Alex", "Jordan", "Taylor", "Morgan", "Casey", "Riley", "Jamie", "Avery"]
+LAST_NAMES = ["Smith", "Johnson", "Garcia", "Miller", "Davis", "Lopez", "Wilson", "Clark"]
+STREETS = ["Market St", "Walnut St", "Pine St", "Chestnut St", "Oak Ave", "Maple Dr"]
+ZIPS = ["19103", "10001", "60601", "94103", "30303", "75201", "98101", "85004"]
+# Permission questions answered per customer; a model asking again after that is a failure
+MAX_PERMISSION_ANSWERS = 4
+
+
+def customer_script(index, rng, zips):
+    """The messages of one customer, in the phrasings benchmarks/fake_llm.py extracts."""
+    first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+    debt = rng.randrange(8, 60) * 1000
+    email = f"{first.lower()}.{last.lower()}.{index}@example.com"
+    phone = f"215-555-{rng.randrange(10000):04d}"
+    address = f"{rng.randint(1, 9999)} {rng.choice(STREETS)}"
+    birth_date = f"{rng.randint(1950, 2000)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+    return [
+        f"Hi, I'm {first} {last}",
+        f"I have about ${debt:,} in credit card debt",
+        f"My email is {email} and my phone is {phone}",
+        f"I live at {address}, zip {zips[index % len(zips)]}",
+        f"I was born on {birth_date}",
+        "Yes, that's all correct",
+    ]
+
+
+async def open_session(url, events, deltas, tokens, timeout, auth=None):
+    """Connects a client and waits for its greeting (or replay): (client, first event, seconds)."""
+    client = socketio.AsyncClient(reconnection=False)
+    client.on("session", lambda data: tokens.append(data["resume_token"]))
+    client.on("bot_response", lambda data: events.put_nowait(("bot_response", data)))
+    client.on("user_input_required", lambda data: events.put_nowait(("user_input_required", data)))
+    client.on("bot_response_delta", lambda data: deltas.append(time.perf_counter()))
+    start = time.perf_counter()
+    await client.connect(url, transports=["websocket"], auth=auth)
+    try:
+        first = await asyncio.wait_for(events.get(), timeout)
+    except BaseException:
+        await client.disconnect()
+        raise
+    return client, first, time.perf_counter() - start
+
+
+async def run_customer(url, index, script, timeout, think_s, resume_after):
+    events: asyncio.Queue = asyncio.Queue()
+    deltas = []
+    tokens = []
+    # Ids of the replies seen, for the resume's last_message_id
+    seen = []
+
+    turns = []
+    permission_answers = 0
+    client, (event, data), connect_s = await open_session(url, events, deltas, tokens, timeout)
+    timings = {"connect_s": connect_s, "resume_s": None}
+    try:
+        seen.append(data.get("id"))
+        pending = list(script)
+        while True:
+            if resume_after and len(turns) == resume_after and timings["resume_s"] is None:
+                await client.disconnect()
+                auth = {"resume_token": tokens[-1], "last_message_id": seen[-2]}
+                client, (event, data), timings["resume_s"] = await open_session(url, events, deltas, tokens, timeout, auth)
+                if data.get("id") != seen[-1]:
+                    raise AssertionError(f"customer {index} resumed with {event} {data.get('id')}, expected a replay of {seen[-1]}")
+            if event == "user_input_required" and permission_answers < MAX_PERMISSION_ANSWERS:
+                permission_answers += 1
+                kind, sent = "user_input_response", {"tool_name": data["tool_name"], "tool_call_id": data["tool_call_id"], "response": "yes"}
+            elif event == "bot_response" and pending:
+                kind, sent = "user_message", pending.pop(0)
+            else:
+                break
+            await asyncio.sleep(think_s)
+            deltas.clear()
+            start = time.perf_counter()
+            await client.emit(kind, sent)
+            event, data = await asyncio.wait_for(events.get(), timeout)
+            done = time.perf_counter()
+            if data.get("id") and data["id"] != seen[-1]:
+                seen.append(data["id"])
+            turns.append({
+                "customer": index,
+                "sent": sent if kind == "user_message" else f"{sent['tool_name']}: yes",
+                "reply": event,
+                "message": data.get("message"),
+                "latency_s": done - start,
+                "ttft_s": (deltas[0] if deltas else done) - start,
+            })
+    finally:
+        await client.disconnect()
+    ended = permission_answers >= 2 and event == "bot_response" and not pending
+    return turns, ended, timings
+
+
+def read_rss_mb(pid):
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return float("nan")
+
+
+async def sample_peak_rss(pid, peak, interval_s=0.05):
+    while True:
+        peak[0] = max(peak[0], read_rss_mb(pid))
+        await asyncio.sleep(interval_s)
+
+
+def scrape_llm_calls(url):
+    """{"primary": n, "extractor": n}: model calls the server has recorded so far."""
+    with urllib.request.urlopen(f"{url}/metrics", timeout=10) as response:
+        body = response.read().decode()
+    calls = {}
+    for family in text_string_to_metric_families(body):
+        for sample in family.samples:
+            if sample.name == "chat_span_seconds_count" and sample.labels.get("kind") == "llm":
+                calls[sample.labels["name"]] = calls.get(sample.labels["name"], 0) + sample.value
+    return calls
+
+
+async def run_level(url, pid, sessions, args, stub):
+    rng = random.Random(f"{args.seed}-{sessions}")
+    scripts = [customer_script(index, rng, args.zips) for index in range(sessions)]
+    calls_before = scrape_llm_calls(url)
+    leads_before = stub.faults.counts["lead"]
+    base_rss = read_rss_mb(pid)
+    peak = [base_rss]
+    sampler = asyncio.ensure_future(sample_peak_rss(pid, peak))
+
+    start = time.perf_counter()
+    results = await asyncio.gather(
+        *(run_customer(url, index, script, args.timeout, args.think_ms / 1000, args.resume_after) for index, script in enumerate(scripts)),
+        return_exceptions=True,
+    )
+    elapsed = time.perf_counter() - start
+    sampler.cancel()
+    # Give the server a moment to run the disconnect handlers
+    await asyncio.sleep(0.5)
+    after_rss = read_rss_mb(pid)
+
+    errors = [r for r in results if isinstance(r, BaseException)]
+    if errors:
+        print(f"  first failure: {errors[0]!r}")
+    ok = [r for r in results if not isinstance(r, BaseException)]
+    turns = [turn for customer_turns, _, _ in ok for turn in customer_turns]
+    resumes = [timings["resume_s"] for _, _, timings in ok if timings["resume_s"] is not None]
+    latencies = [turn["latency_s"] for turn in turns]
+    calls_after = scrape_llm_calls(url)
+    calls = {name: calls_after.get(name, 0) - calls_before.get(name, 0) for name in ("primary", "extractor")}
+    leads = stub.faults.counts["lead"] - leads_before
+    return {
+        "sessions": sessions,
+        "ended": sum(ended for _, ended, _ in ok),
+        "failed": len(errors),
+        "elapsed_s": elapsed,
+        "leads_per_s": leads / elapsed,
+        "turns_per_s": len(turns) / elapsed,
+        "turn_p50_s": percentile(latencies, 50),
+        "turn_p95_s": percentile(latencies, 95),
+        "turn_p99_s": percentile(latencies, 99),
+        "ttft_p50_s": percentile([turn["ttft_s"] for turn in turns], 50),
+        "connect_p50_s": percentile([timings["connect_s"] for _, _, timings in ok], 50),
+        "resume_p50_s": percentile(resumes, 50),
+        "peak_mb_per_session": (peak[0] - base_rss) / sessions,
+        "held_mb_per_session": (after_rss - base_rss) / sessions,
+        "leads": leads,
+        "llm_calls": calls,
+        "llm_calls_per_lead": (calls["primary"] + calls["extractor"]) / leads if leads else float("nan"),
+        "turns": turns,
+    }
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(args, api_base_url):
+    port = free_port()
+    env = {**os.environ, "CARBON_API_BASE_URL": api_base_url, "LOG_LEVEL": os.getenv("LOG_LEVEL", "WARNING")}
+    for item in args.server_env:
+        key, _, value = item.partition("=")
+        env[key] = value
+    command = [
+        sys.executable, "-m", "benchmarks.fake_server", "--server", args.server, "--port", str(port),
+        "--llm-latency-ms", str(args.llm_latency_ms), "--llm-token-ms", str(args.llm_token_ms), "--reply-tokens", str(args.reply_tokens),
+    ]
+    process = subprocess.Popen(command, cwd=REPO_ROOT, env=env)
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + args.startup_timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"fake_server exited with {process.returncode}")
+        try:
+            scrape_llm_calls(url)
+            return process, url
+        except OSError:
+            time.sleep(0.25)
+    process.kill()
+    raise RuntimeError(f"fake_server did not answer on {url} within {args.startup_timeout:.0f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--server", choices=["asgi", "eventlet"], default="asgi")
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 10, 50])
+    parser.add_argument("--llm-latency-ms", type=float, default=400.0)
+    parser.add_argument("--llm-token-ms", type=float, default=15.0)
+    parser.add_argument("--reply-tokens", type=int, default=40)
+    parser.add_argument("--api-latency-ms", type=float, default=150.0)
+    parser.add_argument("--resume-after", type=int, default=3, help="turns before each customer reconnects with its resume token (0: never)")
+    parser.add_argument("--think-ms", type=float, default=300.0, help="customer pause before each message")
+    parser.add_argument("--zips", nargs="+", default=ZIPS)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--server-env", nargs="*", default=[], metavar="KEY=VALUE")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--startup-timeout", type=float, default=120.0)
+    parser.add_argument("--output", default=None, help="write every turn as a JSON line")
+    args = parser.parse_args()
+
+    stub = start_stub_server(faults=Faults(latency_ms=args.api_latency_ms, jitter_ms=args.api_latency_ms / 4, seed=args.seed))
+    process, url = start_server(args, f"http://127.0.0.1:{stub.server_port}")
+    output = open(args.output, "w") if args.output else None
+    try:
+        print(f"{args.server} server, model {args.llm_latency_ms:.0f} ms + {args.llm_token_ms:.0f} ms/token, API {args.api_latency_ms:.0f} ms")
+        print(f"{'sessions':>8} {'ended':>5} {'failed':>6} {'leads/s':>8} {'turns/s':>8} {'p50':>6} {'p95':>6} {'p99':>6} {'ttft p50':>8} "
+              f"{'conn p50':>8} {'resume p50':>10} {'peak MB/s':>9} {'held MB/s':>9} {'leads':>5} {'LLM/lead':>8}")
+        for sessions in args.sessions:
+            r = asyncio.run(run_level(url, process.pid, sessions, args, stub))
+            print(
+                f"{r['sessions']:>8} {r['ended']:>5} {r['failed']:>6} {r['leads_per_s']:>8.2f} {r['turns_per_s']:>8.1f} "
+                f"{r['turn_p50_s']:>6.2f} {r['turn_p95_s']:>6.2f} {r['turn_p99_s']:>6.2f} {r['ttft_p50_s']:>8.2f} "
+                f"{r['connect_p50_s'] * 1000:>6.1f}ms {r['resume_p50_s'] * 1000:>8.1f}ms "
+                f"{r['peak_mb_per_session']:>9.2f} {r['held_mb_per_session']:>9.2f} {r['leads']:>5} {r['llm_calls_per_lead']:>8.1f}"
+            )
+            if output:
+                for turn in r["turns"]:
+                    output.write(json.dumps({"sessions": sessions, **turn}) + "\n")
+    finally:
+        if output:
+            output.close()
+        process.terminate()
+        process.wait(timeout=10)
+        stub.shutdown()
+
+
+if __name__ == "__main__":
+    main()
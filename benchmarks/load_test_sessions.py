@@ -0,0 +1,102 @@
+"""Concurrent Socket.IO sessions against one server worker.
+
+Opens N sessions at once; each waits for the greeting, sends a few messages and
+waits for a reply to each. Run it against the eventlet server (python app.py)
+and the ASGI server (python asgi_app.py) to compare how many sessions a single
+worker keeps responsive.
+
+Usage: python -m benchmarks.load_test_sessions --url http://localhost:8080 --sessions 1 10 50
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import socketio
+
+MESSAGES = ["Hi, I'm Alex", "I have about $20,000 in credit card debt", "Yes, I'd like to learn more"]
+
+
+def percentile(values, pct):
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+
+async def run_session(url, messages, timeout):
+    client = socketio.AsyncClient(reconnection=False)
+    replies: asyncio.Queue = asyncio.Queue()
+    client.on("bot_response", lambda data: replies.put_nowait(data))
+    client.on("user_input_required", lambda data: replies.put_nowait(data))
+    deltas = []
+    client.on("bot_response_delta", lambda data: deltas.append(time.perf_counter()))
+
+    latencies = []
+    ttfts = []
+    start = time.perf_counter()
+    await client.connect(url, transports=["websocket"])
+    await asyncio.wait_for(replies.get(), timeout)
+    connect_latency = time.perf_counter() - start
+    try:
+        for message in messages:
+            deltas.clear()
+            sent = time.perf_counter()
+            await client.emit("user_message", message)
+            await asyncio.wait_for(replies.get(), timeout)
+            done = time.perf_counter()
+            latencies.append(done - sent)
+            # Without token streaming the first visible text is the whole message
+            ttfts.append((deltas[0] if deltas else done) - sent)
+            # drain any follow-up emits for the same turn
+            await asyncio.sleep(0.05)
+            while not replies.empty():
+                replies.get_nowait()
+    finally:
+        await client.disconnect()
+    return connect_latency, latencies, ttfts
+
+
+async def run(url, sessions, messages, timeout):
+    start = time.perf_counter()
+    results = await asyncio.gather(*(run_session(url, messages, timeout) for _ in range(sessions)), return_exceptions=True)
+    elapsed = time.perf_counter() - start
+    ok = [r for r in results if not isinstance(r, BaseException)]
+    errors = [r for r in results if isinstance(r, BaseException)]
+    if errors:
+        print(f"  first failure: {errors[0]!r}")
+    connects = [r[0] for r in ok]
+    turns = [latency for r in ok for latency in r[1]]
+    ttfts = [latency for r in ok for latency in r[2]]
+    return {
+        "sessions": sessions,
+        "completed": len(ok),
+        "failed": sessions - len(ok),
+        "elapsed_s": elapsed,
+        "sessions_per_s": len(ok) / elapsed if elapsed else 0.0,
+        "connect_p50_s": statistics.median(connects) if connects else float("nan"),
+        "turn_p50_s": statistics.median(turns) if turns else float("nan"),
+        "turn_p95_s": percentile(turns, 95),
+        "ttft_p50_s": statistics.median(ttfts) if ttfts else float("nan"),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="http://localhost:8080")
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 10, 50])
+    parser.add_argument("--messages", type=int, default=len(MESSAGES))
+    parser.add_argument("--timeout", type=float, default=120.0)
+    args = parser.parse_args()
+
+    print(f"{'sessions':>8} {'ok':>5} {'failed':>6} {'sess/s':>8} {'connect p50':>12} {'ttft p50':>9} {'turn p50':>9} {'turn p95':>9}")
+    for sessions in args.sessions:
+        r = asyncio.run(run(args.url, sessions, MESSAGES[: args.messages], args.timeout))
+        print(
+            f"{r['sessions']:>8} {r['completed']:>5} {r['failed']:>6} {r['sessions_per_s']:>8.2f} "
+            f"{r['connect_p50_s']:>12.3f} {r['ttft_p50_s']:>9.3f} {r['turn_p50_s']:>9.3f} {r['turn_p95_s']:>9.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""Move a conversation between two workers in the middle of the conversation.
+
+Each worker has its own compiled graph, checkpointer and printed-id set, like
+two gunicorn workers or two nodes; the only thing they share is the session
+store. Turns 1-2 run on worker A, turn 3 on worker B, turn 4 back on A. Every
+turn must see the whole history and the fields collected so far, whichever
+worker handled the previous one.
+
+The chat model is replaced by a scripted one so the check runs offline. By
+default the Redis store talks to an in-process fakeredis server; pass
+--redis-url to use a real one. --store memory shows the handoff failing with
+the per-process store.
+
+Usage: python -m benchmarks.session_handoff [--store redis|memory] [--redis-url redis://localhost:6379/0]
+"""
+import argparse
+import uuid
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.runnables import RunnableLambda
+
+import src.config as config
+from src.state import ConvoState, RequiredInformation
+
+
+class ScriptedChatModel(BaseChatModel):
+    """Replies with the number of user messages it was shown; extracts FirstName=Alex once mentioned."""
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        seen = sum(isinstance(m, HumanMessage) for m in messages)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=f"seen {seen} user messages"))])
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def with_structured_output(self, schema, **kwargs):
+        def extract(inputs):
+            mentioned = any("Alex" in str(m.content) for m in inputs.to_messages())
+            return schema(FirstName="Alex" if mentioned else None)
+
+        return RunnableLambda(extract)
+
+
+# Must happen before the graph module binds the model into its chains
+config.llm = ScriptedChatModel()
+
+from src.graph.builder import create_graph  # noqa: E402
+from src.utils.session_store import InMemorySessionStore, RedisSessionStore  # noqa: E402
+from src.utils.turn_events import TurnProcessor  # noqa: E402
+
+
+class Worker:
+    """The connect/user_message path of app.py against a given session store."""
+
+    def __init__(self, name, session_store):
+        self.name = name
+        self.graph = create_graph()
+        self.session_store = session_store
+        self.printed = set()
+
+    def connect(self, session_id):
+        initial_state = ConvoState(
+            user_input="",
+            messages=[AIMessage(content="Hi, I'm Claire. May I have your first name?")],
+            required_information=RequiredInformation(),
+            contact_permission=None,
+            credit_pull_permission=None,
+            credit_pull_complete=None,
+            lead_create_complete=None,
+            savings_estimate=None,
+            reason_for_decline=None
+        )
+        self.session_store.create(session_id, initial_state, {"configurable": {"thread_id": str(uuid.uuid4())}})
+
+    def user_message(self, session_id, message):
+        session = self.session_store.load(session_id)
+        if session is None:
+            return None, ["Session expired. Please refresh the page."]
+        state, graph_config = session
+        state['user_input'] = message
+        state['messages'].append(HumanMessage(content=message))
+        turn = TurnProcessor(state, self.printed)
+        replies = []
+        for event in self.graph.stream(state, graph_config, stream_mode="values"):
+            replies += [payload['message'] for name, payload in turn.feed(event)]
+            if turn.done:
+                break
+        state = turn.finish()
+        self.session_store.save(session_id, state)
+        return state, replies
+
+
+def make_stores(store, redis_url):
+    if store == "memory":
+        # One dict per process: what two workers get without a shared backend
+        return InMemorySessionStore(), InMemorySessionStore()
+    if redis_url:
+        return RedisSessionStore.from_url(redis_url, ttl=60), RedisSessionStore.from_url(redis_url, ttl=60)
+    import fakeredis
+
+    server = fakeredis.FakeServer()
+    return (
+        RedisSessionStore(fakeredis.FakeRedis(server=server), ttl=60),
+        RedisSessionStore(fakeredis.FakeRedis(server=server), ttl=60),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--store", choices=["redis", "memory"], default="redis")
+    parser.add_argument("--redis-url", default=None)
+    args = parser.parse_args()
+
+    store_a, store_b = make_stores(args.store, args.redis_url)
+    worker_a, worker_b = Worker("A", store_a), Worker("B", store_b)
+    session_id = str(uuid.uuid4())
+    worker_a.connect(session_id)
+
+    script = [
+        (worker_a, "Hi, I'm Alex"),
+        (worker_a, "I have about $20,000 in credit card debt"),
+        (worker_b, "My zip is 10001"),
+        (worker_a, "Thanks"),
+    ]
+    failures = []
+    for number, (worker, message) in enumerate(script, start=1):
+        state, replies = worker.user_message(session_id, message)
+        print(f"turn {number} on worker {worker.name}: {message!r} -> {replies}")
+        expected = f"seen {number} user messages"
+        if state is None or expected not in replies:
+            failures.append(f"turn {number}: expected {expected!r}, got {replies}")
+            continue
+        if state['required_information'].FirstName != "Alex":
+            failures.append(f"turn {number}: FirstName lost ({state['required_information'].FirstName!r})")
+
+    store_a.delete(session_id)
+    if session_id in store_b:
+        failures.append("session still visible to worker B after delete on worker A")
+
+    if failures:
+        print("HANDOFF FAILED")
+        for failure in failures:
+            print(f"  {failure}")
+        raise SystemExit(1)
+    print("handoff OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""A sqlite-backed stand-in for MSSQLSaver so checkpoint benchmarks can run without SQL Server.
+
+Only the SQL dialect and the connection factory differ; pooling, locking,
+batching and serialization are the production MSSQLSaver code paths.
+"""
+import os
+import sqlite3
+import tempfile
+
+from src.utils.mssql_saver import MSSQLSaver
+
+
+def sqlite_connect(path: str):
+    conn = sqlite3.connect(path, check_same_thread=False, timeout=60)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+class SQLiteStandInSaver(MSSQLSaver):
+    SETUP_STATEMENTS = (
+        """
+            CREATE TABLE IF NOT EXISTS checkpoints_data (
+                thread_id TEXT NOT NULL,
+                thread_ts TEXT NOT NULL,
+                parent_ts TEXT,
+                checkpoint_blob BLOB,
+                metadata BLOB,
+                parsed_ts TEXT,
+                created_ts TEXT DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (thread_id, thread_ts)
+            )
+        """,
+        """
+            CREATE TABLE IF NOT EXISTS writes_data (
+                thread_id TEXT NOT NULL,
+                thread_ts TEXT NOT NULL,
+                task_id TEXT NOT NULL,
+                idx INTEGER NOT NULL,
+                channel TEXT NOT NULL,
+                value BLOB,
+                PRIMARY KEY (thread_id, thread_ts, task_id, idx)
+            )
+        """,
+        """
+            CREATE TABLE IF NOT EXISTS channel_blobs_data (
+                thread_id TEXT NOT NULL,
+                channel TEXT NOT NULL,
+                version TEXT NOT NULL,
+                value BLOB,
+                PRIMARY KEY (thread_id, channel, version)
+            )
+        """,
+        """
+            CREATE TABLE IF NOT EXISTS messages_data (
+                thread_id TEXT NOT NULL,
+                idx INTEGER NOT NULL,
+                message_id TEXT,
+                message_blob BLOB,
+                PRIMARY KEY (thread_id, idx)
+            )
+        """,
+    )
+    SELECT_LATEST_CHECKPOINT = "SELECT thread_id, thread_ts, parent_ts, checkpoint_blob, metadata FROM checkpoints_data WHERE thread_id = ? ORDER BY thread_ts DESC LIMIT 1"
+    UPSERT_CHECKPOINT = (
+        "INSERT INTO checkpoints_data (thread_id, thread_ts, parent_ts, checkpoint_blob, metadata) VALUES (?, ?, ?, ?, ?) "
+        "ON CONFLICT (thread_id, thread_ts) DO UPDATE SET parent_ts = excluded.parent_ts, "
+        "checkpoint_blob = excluded.checkpoint_blob, metadata = excluded.metadata"
+    )
+    UPSERT_WRITE = (
+        "INSERT INTO writes_data (thread_id, thread_ts, task_id, idx, channel, value) VALUES (?, ?, ?, ?, ?, ?) "
+        "ON CONFLICT (thread_id, thread_ts, task_id, idx) DO UPDATE SET channel = excluded.channel, value = excluded.value"
+    )
+    UPSERT_CHANNEL_BLOB = "INSERT OR IGNORE INTO channel_blobs_data (thread_id, channel, version, value) VALUES (?, ?, ?, ?)"
+
+    def __init__(self, path: str = None, **kwargs):
+        self.path = path or os.path.join(tempfile.mkdtemp(prefix="checkpoints-"), "checkpoints.sqlite")
+        kwargs.setdefault("connect", lambda: sqlite_connect(self.path))
+        super().__init__("", **kwargs)
+
+    def limit_query(self, query: str, limit: int) -> str:
+        return f"{query} LIMIT {int(limit)}"
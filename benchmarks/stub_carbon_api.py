@@ -0,0 +1,167 @@
+"""Local stand-in for the ClearOne (carbon) lead and credit-pull API, with fault injection.
+
+Answers POST /api/affiliate/creditpull and POST /api/lead/create with
+responses shaped like the real API. Per request it can add latency, answer 503
+(error-rate) or 500 (fail-rate), or hang for --hang-s seconds (hang-rate), so
+timeouts, retries and the circuit breaker in src/utils/http_client.py can be
+exercised. Faults(credit_pull_declines=N, track_duplicates=True) also
+answers unsuccessful credit pulls and duplicate leads, like the real API. Point the tools at it with CARBON_API_BASE_URL=http://127.0.0.1:<port>.
+
+Usage: python -m benchmarks.stub_carbon_api --port 8099 --latency-ms 80 --error-rate 0.05 --hang-rate 0.01
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class Faults:
+    def __init__(self, latency_ms=50.0, jitter_ms=20.0, error_rate=0.0, fail_rate=0.0, hang_rate=0.0, hang_s=30.0, seed=None,
+                 credit_pull_declines=0, track_duplicates=False):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.fail_rate = fail_rate
+        self.hang_rate = hang_rate
+        self.hang_s = hang_s
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        # Faults drawn, and the credit pulls and leads answered successfully
+        self.counts = {"requests": 0, "503": 0, "500": 0, "hang": 0, "credit_pull": 0, "lead": 0}
+        # Business-level answers rather than faults: the next N credit pulls come back
+        # unsuccessful, and a second lead for the same email is reported as a duplicate
+        self.credit_pull_declines = credit_pull_declines
+        self.track_duplicates = track_duplicates
+        self.leads = set()
+
+    def decline_credit_pull(self):
+        with self.lock:
+            if self.credit_pull_declines > 0:
+                self.credit_pull_declines -= 1
+                return True
+            return False
+
+    def is_duplicate(self, payload):
+        if not self.track_duplicates:
+            return False
+        with self.lock:
+            key = payload.get("Email")
+            duplicate = key in self.leads
+            self.leads.add(key)
+            return duplicate
+
+    def count(self, key):
+        with self.lock:
+            self.counts[key] += 1
+
+    def draw(self):
+        with self.lock:
+            self.counts["requests"] += 1
+            roll = self.random.random()
+            latency = max(0.0, self.random.gauss(self.latency_ms, self.jitter_ms)) / 1000
+        if roll < self.hang_rate:
+            outcome = "hang"
+        elif roll < self.hang_rate + self.error_rate:
+            outcome = "503"
+        elif roll < self.hang_rate + self.error_rate + self.fail_rate:
+            outcome = "500"
+        else:
+            return latency, None
+        with self.lock:
+            self.counts[outcome] += 1
+        return latency, outcome
+
+
+def make_handler(faults: Faults):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # Headers and body go out as separate writes; without this, keep-alive
+        # clients pay a delayed-ACK round trip (~40 ms) a real server would not add
+        disable_nagle_algorithm = True
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send(self, status, body):
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            payload = json.loads(self.rfile.read(length) or b"{}")
+            latency, outcome = faults.draw()
+            if outcome == "hang":
+                time.sleep(faults.hang_s)
+            time.sleep(latency)
+            if outcome == "503":
+                return self._send(503, {"Success": False, "Message": "Service Unavailable"})
+            if outcome == "500":
+                return self._send(500, {"Success": False, "Message": "Internal Server Error"})
+
+            if self.path.startswith("/api/affiliate/creditpull"):
+                if faults.decline_credit_pull():
+                    return self._send(200, {"Success": False, "Message": "Unable to pull credit with the provided details.", "Data": {"TotalEligibleDebt": 0}})
+                faults.count("credit_pull")
+                return self._send(200, {
+                    "Success": True,
+                    "Message": "Credit pull complete.",
+                    "Data": {"TotalEligibleDebt": float(payload.get("Debt") or 23000)},
+                })
+            if self.path.startswith("/api/lead/create"):
+                if faults.is_duplicate(payload):
+                    return self._send(200, {"Success": False, "Message": "A lead with these details already exists.", "Data": {"IsDuplicate": True}})
+                faults.count("lead")
+                return self._send(200, {
+                    "Success": True,
+                    "Message": "Lead created.",
+                    "Data": {"IsDuplicate": False, "LeadId": random.randint(100000, 999999)},
+                })
+            self._send(404, {"Success": False, "Message": f"Unknown path {self.path}"})
+
+    return Handler
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # The default backlog of 5 drops SYNs under a burst of new connections
+    request_queue_size = 256
+
+
+def start_stub_server(port: int = 0, faults: Faults = None):
+    """Serve from a daemon thread; returns the server (server.server_port is the bound port)."""
+    faults = faults or Faults()
+    server = StubServer(("127.0.0.1", port), make_handler(faults))
+    server.faults = faults
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--jitter-ms", type=float, default=20.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of 503 responses")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="share of 500 responses")
+    parser.add_argument("--hang-rate", type=float, default=0.0, help="share of requests that hang for --hang-s")
+    parser.add_argument("--hang-s", type=float, default=30.0)
+    args = parser.parse_args()
+
+    faults = Faults(args.latency_ms, args.jitter_ms, args.error_rate, args.fail_rate, args.hang_rate, args.hang_s)
+    server = start_stub_server(args.port, faults)
+    print(f"Stub carbon API on http://127.0.0.1:{server.server_port}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,32 @@
+import gc
+import os
+
+# Read by gunicorn from the working directory (Procfile and Dockerfile commands).
+#
+# GUNICORN_PRELOAD=1 (the default) imports the app once in the master: the
+# provider SDK, the compiled graph, tool schemas, the zip index and the
+# tokenizer. Workers are forked already warm instead of each paying the
+# multi-second import. Threads and connections are started per worker in post_fork.
+preload_app = os.getenv("GUNICORN_PRELOAD", "1") == "1"
+# app.py reads this to leave its background threads to post_fork
+os.environ["GUNICORN_PRELOAD"] = "1" if preload_app else "0"
+
+
+def when_ready(server):
+    if preload_app:
+        # Keep the preloaded objects out of the collector, so the workers'
+        # GC passes do not touch (and copy) the pages they share with the master
+        gc.freeze()
+
+
+def post_fork(server, worker):
+    if preload_app:
+        import app
+        app.start_worker_tasks()
+
+
+def child_exit(server, worker):
+    # Drop the live gauges of a dead worker from the multiprocess metrics
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
@@ -1,56 +1,142 @@
+import asyncio
+import contextvars
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
 from langchain_core.runnables import Runnable, RunnableConfig
 from src.state import ConvoState, RequiredInformation
-from src.utils.info_collector import collect_info, combine_required_info
-from typing import Any, Dict
+from src.utils.info_collector import collect_info, acollect_info, combine_required_info
+from src.utils.history import compact_history
+from src.utils.retry_policy import RetryPolicy
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Shared pool for running the info extraction alongside the primary LLM call.
+_extraction_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="collect_info")
+
+# Set by track_timings(); None outside a turn
+_turn_timings: contextvars.ContextVar[Optional[Dict[str, float]]] = contextvars.ContextVar("assistant_turn_timings", default=None)
+
+
+def track_timings() -> Dict[str, float]:
+    """Collects the assistant's stage timings for the turn running in this context.
+
+    Nodes run in copies of this context, which share the returned dict; stages
+    are summed over the assistant calls of the turn.
+    """
+    timings: Dict[str, float] = {}
+    _turn_timings.set(timings)
+    return timings
+
+def tool_call_args(state: ConvoState) -> Dict[str, Any]:
+    """Tool arguments taken from the conversation state rather than from the model."""
+    args = {k: v for k, v in state.items() if k not in ["messages", "user_input"]}
+    args["required_information"] = {**state["required_information"].dict(), "LeadId": 999}
+    return args
 
 class Assistant:
-    def __init__(self, runnable: Runnable):
+    def __init__(self, runnable: Runnable, retry_policy: Optional[RetryPolicy] = None):
         self.runnable = runnable
+        # Bounds the re-asking on empty responses, see src/utils/retry_policy.py
+        self.retry_policy = retry_policy or RetryPolicy.from_env()
 
     def __call__(self, state: ConvoState, config: RunnableConfig):
-        while True:
-            result = self.runnable.invoke(state)
-            # print(result.tool_calls)
-            if not result.tool_calls and (
-                not result.content
-                or isinstance(result.content, list)
-                and not result.content[0].get("text")
-            ):
-                messages = state["messages"] + [("user", "Respond with a real output.")]
-                state = {**state, "messages": messages}
-            else:
-                break
+        turn_start = time.perf_counter()
+        # collect_info appends SystemMessages to the history it is given, so it
+        # works on its own copy of the list while the primary chain reads state.
+        history = state["messages"]
+        extraction_state = {**state, "messages": list(history)}
+        # In the node's context, so the extractor call reports to this run's callbacks
+        extraction_future = _extraction_executor.submit(contextvars.copy_context().run, self._timed_collect_info, extraction_state)
+
+        primary_start = time.perf_counter()
+        # The prompt only sees the recent turns plus a summary; state keeps the full history
+        prompt_state = {**state, "messages": compact_history(state).messages}
+        result = self.retry_policy.run(self.runnable.invoke, prompt_state)
+        primary_end = time.perf_counter()
+
         # Collect and update required information
-        collected_info = collect_info(state)
+        collected_info, extract_start, extract_end = extraction_future.result()
+        timings = (turn_start, primary_start, primary_end, extract_start, extract_end)
+        return self._merge(state, history, result, collected_info, timings)
+
+    async def acall(self, state: ConvoState, config: RunnableConfig):
+        """Async variant of __call__ used by the ASGI server's graph.astream."""
+        turn_start = time.perf_counter()
+        history = state["messages"]
+        extraction_state = {**state, "messages": list(history)}
+        extraction_task = asyncio.ensure_future(self._atimed_collect_info(extraction_state))
+
+        primary_start = time.perf_counter()
+        # The prompt only sees the recent turns plus a summary; state keeps the full history
+        prompt_state = {**state, "messages": compact_history(state).messages}
+        result = await self.retry_policy.arun(self.runnable.ainvoke, prompt_state)
+        primary_end = time.perf_counter()
+
+        collected_info, extract_start, extract_end = await extraction_task
+        timings = (turn_start, primary_start, primary_end, extract_start, extract_end)
+        return self._merge(state, history, result, collected_info, timings)
+
+    def _merge(self, state: ConvoState, history, result, collected_info, timings):
+        turn_start, primary_start, primary_end, extract_start, extract_end = timings
+        turn_end = time.perf_counter()
+
+        # Carry over the inferred city/state notes, as if collect_info had run in place.
+        history.extend(collected_info["messages"][len(history):])
+
         updated_required_info = combine_required_info([state.get("required_information", RequiredInformation()), collected_info["required_information"]])
         state = {**state, "required_information": updated_required_info}
         # print(updated_required_info.dict())
         if result.tool_calls:
             result = self.process_tool_calls(result, state)
-        
+
+        # Per call, not on self: the graph's one Assistant serves every session
+        stage_timings = {
+            "primary": primary_end - primary_start,
+            "extraction": extract_end - extract_start,
+            "overlap": max(0.0, min(primary_end, extract_end) - max(primary_start, extract_start)),
+            "total": turn_end - turn_start,
+        }
+        turn_timings = _turn_timings.get()
+        if turn_timings is not None:
+            for stage, seconds in stage_timings.items():
+                turn_timings[stage] = turn_timings.get(stage, 0.0) + seconds
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Assistant timings (s): %s", {k: round(v, 3) for k, v in stage_timings.items()})
+
         return {
             "messages": result,
             "required_information": updated_required_info
         }
-    
+
+    def _timed_collect_info(self, state: ConvoState):
+        start = time.perf_counter()
+        collected_info = collect_info(state)
+        return collected_info, start, time.perf_counter()
+
+    async def _atimed_collect_info(self, state: ConvoState):
+        start = time.perf_counter()
+        collected_info = await acollect_info(state)
+        return collected_info, start, time.perf_counter()
+
     def process_tool_calls(self, result, state):
         # required_info = state.get("required_information", RequiredInformation())
         # all_info_filled = all(getattr(required_info, field) is not None for field in required_info.__fields__)
-        
+
         # print("Result before:", result)
 
         new_tool_calls = []
         for tool_call in result.tool_calls:
             # tool_name = tool_call["name"]
 
-            modify_with = {k: v for k, v in state.items() if k not in ["messages", "user_input"]}
-            modify_with["required_information"] = {**state["required_information"].dict(), "LeadId": 999}
-            
+            modify_with = tool_call_args(state)
+
             new_tool_calls.append(self.modify_tool_args(tool_call, modify_with = modify_with))
-        
+
         result.tool_calls = new_tool_calls
-        
-        print("Modify with:", modify_with)
+
+        logger.debug("Modify with: %s", modify_with)
         # print("Result after:", result)
 
         return result
@@ -63,4 +149,4 @@ class Assistant:
                 tool_call["args"] = modify_with
         else:
             tool_call["args"] = modify_with
-        return tool_call
\ No newline at end of file
+        return tool_call
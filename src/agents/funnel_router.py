@@ -0,0 +1,61 @@
+import logging
+import os
+import uuid
+from langchain_core.messages import AIMessage
+from src.state import ConvoState
+from src.agents.assistant import tool_call_args
+from src.utils.handle_convo import SPECULATIVE_LEAD_TOOL
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# Once contact permission is granted the rest of the funnel runs in a fixed order:
+# AskCreditPullPermissionTool -> credit_pull_api_tool -> lead_create_api_tool -> savings_estimate_tool.
+# The router issues these tool calls itself instead of asking the primary model to
+# pick each one; the model is called again only to phrase the result for the user.
+# Asking for contact permission stays with the model, since it follows the
+# conversational confirmation of the collected details.
+
+# FUNNEL_SPECULATIVE_LEAD=1 posts the lead in the same step as the credit pull, so the
+# two API calls overlap. The lead only counts once the pull succeeds (settle_speculative_lead).
+# It is created with the debt the user stated, not the TotalEligibleDebt the pull
+# returns, which is why it is off by default.
+SPECULATIVE_LEAD_CREATE = os.getenv("FUNNEL_SPECULATIVE_LEAD", "0") == "1"
+
+def next_funnel_step(state: ConvoState) -> Optional[str]:
+    """Name of the tool the funnel calls next, or None to hand the turn to the Assistant."""
+    if not state.get("contact_permission"):
+        return None
+    if not state["required_information"].all_fields_not_none():
+        return None
+
+    if state.get("credit_pull_permission") is None:
+        step = "AskCreditPullPermissionTool"
+    elif state.get("credit_pull_permission") and state.get("credit_pull_complete") is None:
+        step = "credit_pull_api_tool"
+    # Same precondition as lead_create_api_tool: a declined or failed credit pull goes back to the model
+    elif state.get("credit_pull_complete") and state.get("lead_create_complete") is None:
+        step = "lead_create_api_tool"
+    elif state.get("lead_create_complete") and state.get("savings_estimate") is None:
+        step = "savings_estimate_tool"
+    else:
+        return None
+
+    # Each step is issued at most once. If it did not move the state forward (an API
+    # failure, an ignored permission question), retrying is left to the model.
+    if step in _called_tools(state["messages"]):
+        return None
+    return step
+
+def _called_tools(messages) -> set:
+    return {tool_call["name"] for message in messages if isinstance(message, AIMessage) for tool_call in message.tool_calls}
+
+def funnel_router(state: ConvoState):
+    step = next_funnel_step(state)
+    steps = [step]
+    if step == "credit_pull_api_tool" and SPECULATIVE_LEAD_CREATE and state.get("lead_create_complete") is None \
+            and not {"lead_create_api_tool", SPECULATIVE_LEAD_TOOL} & _called_tools(state["messages"]):
+        steps.append(SPECULATIVE_LEAD_TOOL)
+    tool_calls = [{"name": name, "args": tool_call_args(state), "id": f"call_{uuid.uuid4().hex[:24]}"} for name in steps]
+    logger.debug("Funnel step: %s", ", ".join(steps))
+    return {"messages": AIMessage(content="", tool_calls=tool_calls, id=str(uuid.uuid4()))}
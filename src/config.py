@@ -1,9 +1,6 @@
 import os
 from dotenv import load_dotenv
 from pathlib import Path
-from langchain_openai import ChatOpenAI
-from langchain_anthropic import ChatAnthropic
-from src.utils.custom_chat_anthropic import CustomChatAnthropic
 
 dotenv_path = Path('../.env')
 load_dotenv(dotenv_path=dotenv_path)
@@ -12,6 +9,23 @@ CLEARONE_LEADS_API_KEY = os.getenv("CLEARONE_LEADS_API_KEY")
 ANTHROPIC_API_KEY = os.getenv("ANTHROPIC_API_KEY")
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
-llm = ChatOpenAI(model="gpt-4o-mini-2024-07-18", temperature = 0, max_tokens = 1000)#, api_key = OPENAI_API_KEY)
-# llm = ChatOpenAI(model="gpt-3.5-turbo-0125", temperature = 0, max_tokens = 1000)#, api_key = OPENAI_API_KEY)
-# llm = CustomChatAnthropic(model = "claude-3-haiku-20240307", temperature = 0, max_tokens = 1000, api_key = ANTHROPIC_API_KEY)
\ No newline at end of file
+# LLM_PROVIDER=openai|anthropic. Only the chosen provider's SDK is imported;
+# each one adds about half a second to every worker's start.
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "openai").lower()
+
+
+def create_llm(model=None):
+    if LLM_PROVIDER == "anthropic":
+        from src.utils.custom_chat_anthropic import CustomChatAnthropic
+        return CustomChatAnthropic(model = model or "claude-3-haiku-20240307", temperature = 0, max_tokens = 1000, api_key = ANTHROPIC_API_KEY, prompt_caching = True)
+    from langchain_openai import ChatOpenAI
+    # stream_usage: streamed replies report usage_metadata too (token metrics)
+    return ChatOpenAI(model = model or "gpt-4o-mini-2024-07-18", temperature = 0, max_tokens = 1000, stream_usage = True)#, api_key = OPENAI_API_KEY)
+    # return ChatOpenAI(model="gpt-3.5-turbo-0125", temperature = 0, max_tokens = 1000)#, api_key = OPENAI_API_KEY)
+
+
+llm = create_llm()
+
+# Tried once when the primary model keeps answering empty (src/utils/retry_policy.py)
+EMPTY_RESPONSE_FALLBACK_MODEL = os.getenv("EMPTY_RESPONSE_FALLBACK_MODEL")
+fallback_llm = create_llm(EMPTY_RESPONSE_FALLBACK_MODEL) if EMPTY_RESPONSE_FALLBACK_MODEL else None
@@ -1,19 +1,21 @@
+from langchain_core.runnables import RunnableLambda
 from langgraph.graph import StateGraph
-from langgraph.checkpoint.memory import MemorySaver
 from src.state import ConvoState
 from src.agents.assistant import Assistant
-from src.tools.api_tools import credit_pull_api_tool, lead_create_api_tool
+from src.agents.funnel_router import funnel_router
+from src.graph.conditions import route_funnel, funnel_tools_condition
+from src.tools.api_tools import credit_pull_api_tool, lead_create_api_tool, speculative_lead_create_api_tool
 from src.tools.permission_tools import ask_contact_permission_tool, ask_credit_pull_permission_tool
 from src.tools.savings_estimate_tool import savings_estimate_tool
 from src.utils.handle_convo import update_convo_state
-from src.utils.misc import create_tool_node_with_fallback
+from src.utils.misc import create_tool_node_with_fallback, tool_schemas
 from src.prompts import primary_assistant_prompt
 from langgraph.graph import END, StateGraph
 from langgraph.prebuilt import tools_condition
 # from langchain_openai import ChatOpenAI
-from src.utils.mssql_saver import MSSQLSaver
-from src.config import llm
-import pyodbc
+from src.utils.memory_saver import BoundedMemorySaver
+from src.config import llm, fallback_llm
+from src.utils.retry_policy import RetryPolicy
 import os
 from dotenv import load_dotenv
 load_dotenv()
@@ -30,16 +32,27 @@ api_tools = [lead_create_api_tool, credit_pull_api_tool]#, math_tool]
 api_tool_node = create_tool_node_with_fallback(api_tools)
 
 all_tools = savings_estimate_tools + api_tools + permission_tools 
-primary_assistant_chain = primary_assistant_prompt | llm.bind_tools(all_tools)# + savings_estimate_tool)
+primary_assistant_chain = primary_assistant_prompt | llm.bind_tools(tool_schemas(all_tools))# + savings_estimate_tool)
+fallback_assistant_chain = primary_assistant_prompt | fallback_llm.bind_tools(tool_schemas(all_tools)) if fallback_llm is not None else None
 
 def create_graph():
 
     builder = StateGraph(ConvoState)
 
-    builder.add_node("assistant", Assistant(primary_assistant_chain))
-    builder.set_entry_point("assistant")
+    assistant = Assistant(primary_assistant_chain, RetryPolicy.from_env(fallback=fallback_assistant_chain))
+    # Sync for graph.stream (eventlet server), async for graph.astream (ASGI server)
+    builder.add_node("assistant", RunnableLambda(assistant, afunc=assistant.acall, name="assistant"))
+    # FUNNEL_FAST_PATH=0 leaves every funnel step to the model, as before
+    fast_path = os.getenv("FUNNEL_FAST_PATH", "1") != "0"
+    if fast_path:
+        builder.add_node("funnel", funnel_router)
+        builder.set_conditional_entry_point(route_funnel, {"funnel": "funnel", "assistant": "assistant"})
+        builder.add_conditional_edges("funnel", funnel_tools_condition, {"tools": "tools", "__end__": END})
+    else:
+        builder.set_entry_point("assistant")
 
-    builder.add_node("tools", create_tool_node_with_fallback(all_tools))
+    # The funnel router's speculative lead create is run here but never offered to the model
+    builder.add_node("tools", create_tool_node_with_fallback(all_tools + [speculative_lead_create_api_tool]))
     # builder.add_node("permission_tools", permission_tool_node)
     # builder.add_node("savings_estimate_tools", savings_estimate_tool_node)
     builder.add_node("update_convo_state", update_convo_state)
@@ -53,20 +66,35 @@ def create_graph():
         }
     )
     builder.add_edge("tools", "update_convo_state")
-    builder.add_edge("update_convo_state", "assistant")
+    if fast_path:
+        builder.add_conditional_edges("update_convo_state", route_funnel, {"funnel": "funnel", "assistant": "assistant"})
+    else:
+        builder.add_edge("update_convo_state", "assistant")
 
-    conn_string = (
-        "DRIVER={ODBC Driver 17 for SQL Server};"
-        f"SERVER={os.getenv("SQL_SERVER")};"
-        f"DATABASE={os.getenv("SQL_DATABASE")};"
-        f"UID={os.getenv("SQL_USERNAME")};"
-        f"PWD={os.getenv("SQL_PWD")};"
-    )
-    # memory = MSSQLSaver(conn_string)
-    memory = MemorySaver()
+    memory = create_checkpointer()
 
     return builder.compile(checkpointer=memory,)# interrupt_after=["api_tools"]    )
 
+def create_checkpointer():
+    # The memory checkpointer only lives in this worker and keeps a bounded number
+    # of threads (src/utils/memory_saver.py); use CHECKPOINTER=mssql when several
+    # workers or nodes serve the same conversations.
+    backend = os.getenv("CHECKPOINTER", "memory").lower()
+    if backend == "mssql":
+        # Only this backend needs pyodbc (imported when the saver first connects)
+        from src.utils.mssql_saver import MSSQLSaver
+        conn_string = (
+            "DRIVER={ODBC Driver 17 for SQL Server};"
+            f"SERVER={os.getenv("SQL_SERVER")};"
+            f"DATABASE={os.getenv("SQL_DATABASE")};"
+            f"UID={os.getenv("SQL_USERNAME")};"
+            f"PWD={os.getenv("SQL_PWD")};"
+        )
+        return MSSQLSaver(conn_string)
+    if backend == "memory":
+        return BoundedMemorySaver.from_env()
+    raise ValueError(f"Unknown CHECKPOINTER: {backend!r} (expected 'memory' or 'mssql')")
+
 if __name__ == "__main__":
     part_1_graph = create_graph()
     # from IPython.display import Image, display
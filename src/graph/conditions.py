@@ -1 +1,11 @@
-pass
\ No newline at end of file
+from typing import Literal
+from src.agents.funnel_router import next_funnel_step
+from src.utils.handle_convo import PERMISSION_TOOLS
+
+def route_funnel(state) -> Literal["funnel", "assistant"]:
+    return "funnel" if next_funnel_step(state) else "assistant"
+
+def funnel_tools_condition(state) -> Literal["tools", "__end__"]:
+    # Permission questions wait for the user's answer (user_input_response)
+    tool_call = state["messages"][-1].tool_calls[0]
+    return "__end__" if tool_call["name"] in PERMISSION_TOOLS else "tools"
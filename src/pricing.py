@@ -0,0 +1,108 @@
+import json
+import os
+from bisect import bisect_right
+from functools import lru_cache
+from typing import Any, Dict, NamedTuple, Sequence, Tuple
+
+# Savings estimate pricing, shared by savings_estimate_tool and offline scoring.
+#
+# The rules live in a table of tiers ordered by min_debt; a debt is priced by the
+# last tier whose min_debt it reaches. The default table is the single set of
+# rules the tool always used. PRICING_TABLE_PATH points at a JSON list of tiers
+# (same field names) to replace it.
+
+class PricingTier(NamedTuple):
+    min_debt: float = 0.0
+    savings_rate: float = 0.23
+    term_months: int = 48
+    min_payment: int = 250
+    settlement_rate: float = 0.5
+    # With a completed credit pull, debts at or below this are not eligible
+    min_eligible_debt: float = 7500.0
+
+PricingTable = Tuple[PricingTier, ...]
+
+DEFAULT_TABLE: PricingTable = (PricingTier(),)
+
+class SavingsEstimate(NamedTuple):
+    debt: float
+    savings: int
+    payment: int
+    settlement: int
+    program_length: float
+
+    def as_tool_response(self) -> Dict[str, str]:
+        return {
+            "debt": "$" + str(self.debt),
+            "savings": "$" + str(self.savings),
+            "payment": "$" + str(self.payment),
+            "settlement": "$" + str(self.settlement),
+            "program_length": str(self.program_length) + " years"
+        }
+
+def load_table(path: str) -> PricingTable:
+    with open(path) as f:
+        tiers = tuple(PricingTier(**tier) for tier in json.load(f))
+    if not tiers or sorted(tiers, key=lambda tier: tier.min_debt) != list(tiers):
+        raise ValueError(f"{path}: expected a non-empty list of tiers ordered by min_debt")
+    return tiers
+
+PRICING_TABLE: PricingTable = load_table(os.environ["PRICING_TABLE_PATH"]) if os.getenv("PRICING_TABLE_PATH") else DEFAULT_TABLE
+
+def tier_for(debt: float, table: PricingTable = PRICING_TABLE) -> PricingTier:
+    index = bisect_right([tier.min_debt for tier in table], debt) - 1
+    return table[max(index, 0)]
+
+def is_eligible(debt: float, table: PricingTable = PRICING_TABLE) -> bool:
+    return debt > tier_for(debt, table).min_eligible_debt
+
+# typed: 23000 and 23000.0 print differently in the tool response
+@lru_cache(maxsize=4096, typed=True)
+def estimate(debt: float, table: PricingTable = PRICING_TABLE) -> SavingsEstimate:
+    """Savings estimate for one debt; the scalar reference for estimate_batch."""
+    tier = tier_for(debt, table)
+    savings = round(debt * tier.savings_rate)
+    payment = max(tier.min_payment, round((debt - savings) / tier.term_months))
+    settlement = round(debt * tier.settlement_rate)
+    program_length = round(((debt - savings) / payment) / 12, 1)
+    return SavingsEstimate(debt, savings, payment, settlement, program_length)
+
+def estimate_batch(debts: Sequence[float], table: PricingTable = PRICING_TABLE) -> Dict[str, Any]:
+    """estimate() over many debts at once, as NumPy arrays keyed like SavingsEstimate, plus "eligible".
+
+    For campaign sizing and what-if tables. NumPy is imported here so the chat
+    servers, which only price one debt at a time, never load it.
+    """
+    import numpy as np
+
+    debts = np.asarray(debts, dtype=np.float64)
+    # Per-debt rule parameters, gathered from the tier each debt falls in
+    index = np.maximum(np.searchsorted([tier.min_debt for tier in table], debts, side="right") - 1, 0)
+    params = {field: np.array([getattr(tier, field) for tier in table], dtype=np.float64)[index] for field in PricingTier._fields}
+
+    # np.rint rounds half to even, like round()
+    savings = np.rint(debts * params["savings_rate"])
+    payment = np.maximum(params["min_payment"], np.rint((debts - savings) / params["term_months"]))
+    settlement = np.rint(debts * params["settlement_rate"])
+    years = ((debts - savings) / payment) / 12
+    program_length = np.round(years, 1)
+    # np.round scales by 10 before rounding and can land on the other side of a
+    # tie than round(), which rounds the exact value; redo the near-ties with round()
+    near_tie = np.flatnonzero(np.abs(years * 10 % 1 - 0.5) < 1e-6)
+    program_length[near_tie] = [round(value, 1) for value in years[near_tie].tolist()]
+    return {
+        "debt": debts,
+        "savings": savings.astype(np.int64),
+        "payment": payment.astype(np.int64),
+        "settlement": settlement.astype(np.int64),
+        "program_length": program_length,
+        "eligible": debts > params["min_eligible_debt"],
+    }
+
+def what_if_table(debts: Sequence[float], table: PricingTable = PRICING_TABLE) -> str:
+    """Markdown table of the estimate at several debt amounts, for showing in chat."""
+    rows = ["| Debt | Savings | Monthly payment | Program length |", "| --- | --- | --- | --- |"]
+    for debt in debts:
+        result = estimate(float(debt), table)
+        rows.append(f"| ${result.debt:,.0f} | ${result.savings:,} | ${result.payment:,} | {result.program_length} years |")
+    return "\n".join(rows)
@@ -79,9 +79,11 @@ Additional Guidelines:
 - Handling Distractions: Briefly address off-topic comments and steer the conversation back towards the program.
 - Transparency and Caution: Avoid bold claims about the program.
 
-Begin based on the latest user input: {user_input}.
-
 """
+# The per-turn line goes after the history, so everything before it is a stable
+# prefix the provider can cache (see CustomChatAnthropic.prompt_caching)
+latest_input_template = "Begin based on the latest user input: {user_input}."
+
 primary_assistant_prompt = ChatPromptTemplate.from_messages(
     [
         (
@@ -91,6 +93,9 @@ primary_assistant_prompt = ChatPromptTemplate.from_messages(
         (
             "placeholder", "{messages}"
         ),
+        (
+            "system", latest_input_template
+        ),
     ]
 ).partial(time=datetime.now())
 
@@ -110,8 +115,6 @@ class RequiredInformation(BaseModel):
     Address: Optional[str] = Field(description="the provided address of the user")
     DateOfBirth: Optional[str] = Field(description="the provided date of birth of the user; formatted YYYY-MM-DD")
 
-Begin based on the latest user input: {user_input}.
-
 """
 
 
@@ -125,6 +128,9 @@ info_collector_prompt = ChatPromptTemplate.from_messages(
         ),
         (
             "placeholder", "{messages}"
-        ),    
+        ),
+        (
+            "system", latest_input_template
+        ),
     ]
 )
\ No newline at end of file
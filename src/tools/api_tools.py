@@ -1,62 +1,102 @@
-from langchain_core.tools import BaseTool,tool
+from langchain_core.tools import BaseTool, StructuredTool, tool
 from typing import Dict, Any, List, Union
-import requests
+from src.utils.http_client import get_http_client, HttpClientError
+import logging
 import os
 
+logger = logging.getLogger(__name__)
 
-@tool
-def credit_pull_api_tool(required_information, contact_permission, credit_pull_permission, credit_pull_complete, lead_create_complete, savings_estimate, reason_for_decline) -> Dict[str, Any]:
-    """Once all the required customer info is collected, this makes a POST request to the ClearOne Advantage API to pull the customer's credit report."""
+# CARBON_API_BASE_URL points the tools at a stand-in server (benchmarks/stub_carbon_api.py)
+CARBON_API_BASE_URL = os.getenv("CARBON_API_BASE_URL", "https://carbon.clearoneadvantage.com").rstrip("/")
+CREDIT_PULL_URL = f"{CARBON_API_BASE_URL}/api/affiliate/creditpull"
+LEAD_CREATE_URL = f"{CARBON_API_BASE_URL}/api/lead/create?detailedResponse=true"
 
-    if not credit_pull_permission:
-        return {"message": "Please obtain credit pull permission first."}
 
-    request_data = required_information
-    # Make the POST request
-    response = requests.post(
-        "https://carbon.clearoneadvantage.com/api/affiliate/creditpull",
-        json=request_data,
-        headers={"APIKEY": F"{os.getenv("CLEARONE_LEADS_API_KEY")}"}
-    )
-    
+def _api_headers():
+    return {"APIKEY": F"{os.getenv("CLEARONE_LEADS_API_KEY")}"}
+
+def _unavailable(err):
+    # Same shape as an API failure, so update_convo_state leaves the flags untouched
+    logger.warning('Carbon API call failed: %s', err)
+    return {"Success": False, "Message": "The ClearOne service is temporarily unavailable. Please try again in a moment."}
+
+def _post(url, request_data):
     try:
-        response.raise_for_status()
-    except requests.exceptions.HTTPError as err:
-        print(f'HTTP error occurred: {err}')  
-    except Exception as err:
-        print(f'Other error occurred: {err}')   
-        
-    return response.json()
+        return get_http_client().post_json(url, request_data, headers=_api_headers())
+    except HttpClientError as err:
+        return _unavailable(err)
 
-@tool
-def lead_create_api_tool(required_information, contact_permission, credit_pull_permission, credit_pull_complete, lead_create_complete, savings_estimate, reason_for_decline) -> Dict[str, Any]:
-    """Once all the required customer info is collected, this makes a POST request to the ClearOne Advantage API to create a new lead in Salesforce."""
+async def _apost(url, request_data):
+    try:
+        return await get_http_client().apost_json(url, request_data, headers=_api_headers())
+    except HttpClientError as err:
+        return _unavailable(err)
 
+def _credit_pull_precondition(credit_pull_permission):
+    if not credit_pull_permission:
+        return {"message": "Please obtain credit pull permission first."}
+    return None
+
+def _speculative_lead_create_precondition(contact_permission, credit_pull_permission):
     if not contact_permission:
         return {"message": "Obtain contact permission first."}
-    
+    if not credit_pull_permission:
+        return {"message": "Speculative lead creation needs credit pull permission."}
+    return None
+
+def _lead_create_precondition(contact_permission, credit_pull_complete):
+    if not contact_permission:
+        return {"message": "Obtain contact permission first."}
+
     # if credit_pull_complete is None:
     if not credit_pull_complete:
         return {"message": "Ask for credit pull permission first."}
+    return None
 
-    request_data = required_information
-    # Make the POST request
-    response = requests.post(
-        "https://carbon.clearoneadvantage.com/api/lead/create?detailedResponse=true",
-        json=request_data,
-        headers={"APIKEY": F"{os.getenv("CLEARONE_LEADS_API_KEY")}"}
-    )
 
-    try:
-        response.raise_for_status()
-    except requests.exceptions.HTTPError as err:
-        print(f'HTTP error occurred: {err}')
-    except Exception as err:
-        print(f'Other error occurred: {err}')   
+def credit_pull_api(required_information, contact_permission, credit_pull_permission, credit_pull_complete, lead_create_complete, savings_estimate, reason_for_decline) -> Dict[str, Any]:
+    """Once all the required customer info is collected, this makes a POST request to the ClearOne Advantage API to pull the customer's credit report."""
+    return _credit_pull_precondition(credit_pull_permission) or _post(CREDIT_PULL_URL, required_information)
+
+async def acredit_pull_api(required_information, contact_permission, credit_pull_permission, credit_pull_complete, lead_create_complete, savings_estimate, reason_for_decline) -> Dict[str, Any]:
+    return _credit_pull_precondition(credit_pull_permission) or await _apost(CREDIT_PULL_URL, required_information)
+
+def lead_create_api(required_information, contact_permission, credit_pull_permission, credit_pull_complete, lead_create_complete, savings_estimate, reason_for_decline) -> Dict[str, Any]:
+    """Once all the required customer info is collected, this makes a POST request to the ClearOne Advantage API to create a new lead in Salesforce."""
+    return _lead_create_precondition(contact_permission, credit_pull_complete) or _post(LEAD_CREATE_URL, required_information)
+
+async def alead_create_api(required_information, contact_permission, credit_pull_permission, credit_pull_complete, lead_create_complete, savings_estimate, reason_for_decline) -> Dict[str, Any]:
+    return _lead_create_precondition(contact_permission, credit_pull_complete) or await _apost(LEAD_CREATE_URL, required_information)
+
+# Posted together with the credit pull by the funnel router (FUNNEL_SPECULATIVE_LEAD=1).
+# update_convo_state only keeps the result once the pull has succeeded.
+def speculative_lead_create_api(required_information, contact_permission, credit_pull_permission, credit_pull_complete, lead_create_complete, savings_estimate, reason_for_decline) -> Dict[str, Any]:
+    """Creates the lead while the credit pull is still running. Called by the funnel router only."""
+    return _speculative_lead_create_precondition(contact_permission, credit_pull_permission) or _post(LEAD_CREATE_URL, required_information)
+
+async def aspeculative_lead_create_api(required_information, contact_permission, credit_pull_permission, credit_pull_complete, lead_create_complete, savings_estimate, reason_for_decline) -> Dict[str, Any]:
+    return _speculative_lead_create_precondition(contact_permission, credit_pull_permission) or await _apost(LEAD_CREATE_URL, required_information)
+
+
+# Sync and async implementations behind one tool, so both graph.stream and graph.astream avoid blocking
+credit_pull_api_tool = StructuredTool.from_function(
+    func=credit_pull_api,
+    coroutine=acredit_pull_api,
+    name="credit_pull_api_tool",
+)
 
-    result = response.json()
+lead_create_api_tool = StructuredTool.from_function(
+    func=lead_create_api,
+    coroutine=alead_create_api,
+    name="lead_create_api_tool",
+)
 
-    return result
+# Not bound to the model, only run by the tools node
+speculative_lead_create_api_tool = StructuredTool.from_function(
+    func=speculative_lead_create_api,
+    coroutine=aspeculative_lead_create_api,
+    name="speculative_lead_create_api_tool",
+)
 
 # class CreditPullAPITool(BaseTool):
 #     name: str = "CreditPullAPI"
@@ -20,6 +20,9 @@ class AskContactPermissionTool(Tool):
     def invoke(*args, **kwargs):
         return {"message": "Move to the next tool."}
 
+    async def ainvoke(*args, **kwargs):
+        return {"message": "Move to the next tool."}
+
 class AskCreditPullPermissionTool(Tool):
     name: str = "AskCreditPullPermissionTool"
     description: str = "Ask the user for permission to pull their credit and process their response."
@@ -28,6 +31,9 @@ class AskCreditPullPermissionTool(Tool):
     def invoke(*args, **kwargs):
         return {"message": "Move to the next tool."}
 
+    async def ainvoke(*args, **kwargs):
+        return {"message": "Move to the next tool."}
+
 # Create instances of the tools
 ask_contact_permission_tool = AskContactPermissionTool(
     name="AskContactPermissionTool",
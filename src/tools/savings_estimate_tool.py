@@ -1,6 +1,10 @@
+import logging
 from typing import Dict, Any
 from langchain_core.tools import Tool, tool
 from src.state import RequiredInformation
+from src.pricing import estimate, is_eligible
+
+logger = logging.getLogger(__name__)
 
 @tool
 def savings_estimate_tool(required_information, contact_permission, credit_pull_permission, credit_pull_complete, lead_create_complete, savings_estimate, reason_for_decline) -> Dict[str, Any]:
@@ -21,22 +25,11 @@ def savings_estimate_tool(required_information, contact_permission, credit_pull_
 
     if credit_pull_complete is not None and savings_estimate is None:
         debt = required_information["Debt"]
-        print("Program Eligible Debt:", debt)
-        if credit_pull_complete and debt <= 7500:
+        logger.debug("Program Eligible Debt: %s", debt)
+        if credit_pull_complete and not is_eligible(debt):
             return {"message": "The customer is not eligible for the program."}
 
-        savings = round(debt * 0.23)
-        payment = max(250, round((debt - savings) / 48))
-        settlement = round(debt * 0.5)
-        program_length = round(((debt - savings) / payment) / 12, 1)
-
-        return {
-            "debt": "$" + str(debt),
-            "savings": "$" + str(savings),
-            "payment": "$" + str(payment),
-            "settlement": "$" + str(settlement),
-            "program_length": str(program_length) + " years"
-        }
+        return estimate(debt).as_tool_response()
     else:
         return {"message": "Provide the required information and complete the credit pull and lead creation tools first."}
 
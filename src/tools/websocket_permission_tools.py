@@ -1,9 +1,12 @@
+import logging
 from langchain_core.tools import tool
 from typing import Dict, Any, Callable
 from langchain_core.messages import AIMessage, ToolMessage
 from src.utils.handle_convo import handle_contact_permission, handle_credit_pull_permission
 from src.utils.info_collector import check_all_required_info, is_dict_populated
 
+logger = logging.getLogger(__name__)
+
 def create_websocket_permission_tools(socket_emit: Callable):
     @tool
     def ask_contact_permission_tool(required_information, contact_permission, credit_pull_permission, credit_pull_complete, lead_create_complete, savings_estimate, reason_for_decline, session_id, tool_call) -> Dict[str, Any]:
@@ -17,7 +20,7 @@ def create_websocket_permission_tools(socket_emit: Callable):
                 "technology. Your consent to such contact is not required as a condition to use a network service "
                 "provider. You can unsubscribe at any time.** "
             )
-            print("tool_call_print:", tool_call)
+            logger.debug("tool_call: %s", tool_call)
 
             latest_tool_call = {
                 'tool_name': tool_call['name'],
@@ -64,8 +67,6 @@ def handle_contact_permission_response(conversation_state, response: str) -> Dic
         return {"message": "Invalid input. * Do you give permission for us to contact you through email or phone number provided? (Please type: yes or no)"}
 
 def handle_credit_pull_permission_response(conversation_state, response: str) -> Dict[str, bool]:
-
-    print("check_all_required_info(conversation_state):", check_all_required_info(conversation_state))
     if not check_all_required_info(conversation_state):
         return {"message": "Collect the list of required information first."}
     
@@ -0,0 +1,94 @@
+import os
+import threading
+from typing import Any, Iterable, Optional
+
+import msgpack
+from langchain_core.messages import AIMessage, ChatMessage, FunctionMessage, HumanMessage, SystemMessage, ToolMessage
+from langgraph.checkpoint.sqlite import JsonPlusSerializerCompat
+from langgraph.serde.base import SerializerProtocol
+from src.state import RequiredInformation
+
+# Binary checkpoint serde for MSSQLSaver.
+#
+# Blobs start with 0xc1, a byte msgpack never emits and that cannot start a JSON
+# or pickle blob, followed by a format byte. Anything without that header was
+# written by JsonPlusSerializerCompat and is handed back to it, so existing rows
+# stay readable and old and new rows can sit side by side.
+MAGIC = b"\xc1"
+PLAIN = b"m"
+ZSTD = b"z"
+
+# Registered pydantic models travel as [class name, field values] and are rebuilt
+# without validation; every other type msgpack does not know goes through JsonPlus.
+EXT_MODEL = 1
+EXT_JSONPLUS = 2
+
+DEFAULT_MODELS = (HumanMessage, AIMessage, ToolMessage, SystemMessage, FunctionMessage, ChatMessage, RequiredInformation)
+
+
+class MsgpackSerializer(SerializerProtocol):
+    """msgpack with a model registry, plus zstd for blobs of at least `compress_min_bytes` (0: never)."""
+
+    def __init__(self, models: Iterable[type] = DEFAULT_MODELS, *, compress_min_bytes: int = 0, compress_level: int = 3):
+        self.models = {cls.__name__: cls for cls in models}
+        self.compress_min_bytes = compress_min_bytes
+        self.compress_level = compress_level
+        self.fallback = JsonPlusSerializerCompat()
+        # zstd (de)compressor objects must not be shared between threads
+        self._local = threading.local()
+
+    def register(self, cls: type) -> None:
+        self.models[cls.__name__] = cls
+
+    def dumps(self, obj: Any) -> bytes:
+        data = msgpack.packb(obj, default=self._default, use_bin_type=True)
+        if self.compress_min_bytes and len(data) >= self.compress_min_bytes:
+            return MAGIC + ZSTD + self._zstd().compress(data)
+        return MAGIC + PLAIN + data
+
+    def loads(self, data: bytes) -> Any:
+        if data[:1] != MAGIC:
+            return self.fallback.loads(data)
+        body = memoryview(data)[2:]
+        if data[1:2] == ZSTD:
+            body = self._zstd_decompressor().decompress(body)
+        return msgpack.unpackb(body, ext_hook=self._ext_hook, raw=False, strict_map_key=False)
+
+    def _default(self, obj: Any) -> msgpack.ExtType:
+        cls = type(obj)
+        if self.models.get(cls.__name__) is cls:
+            return msgpack.ExtType(EXT_MODEL, msgpack.packb([cls.__name__, obj.__dict__], default=self._default, use_bin_type=True))
+        return msgpack.ExtType(EXT_JSONPLUS, self.fallback.dumps(obj))
+
+    def _ext_hook(self, code: int, data: bytes) -> Any:
+        if code == EXT_MODEL:
+            name, fields = msgpack.unpackb(data, ext_hook=self._ext_hook, raw=False, strict_map_key=False)
+            # The fields were complete and valid when written
+            return self.models[name].construct(**fields)
+        if code == EXT_JSONPLUS:
+            return self.fallback.loads(data)
+        return msgpack.ExtType(code, data)
+
+    def _zstd(self):
+        compressor = getattr(self._local, "compressor", None)
+        if compressor is None:
+            import zstandard
+            compressor = self._local.compressor = zstandard.ZstdCompressor(level=self.compress_level)
+        return compressor
+
+    def _zstd_decompressor(self):
+        decompressor = getattr(self._local, "decompressor", None)
+        if decompressor is None:
+            import zstandard
+            decompressor = self._local.decompressor = zstandard.ZstdDecompressor()
+        return decompressor
+
+
+def create_checkpoint_serde(kind: Optional[str] = None) -> SerializerProtocol:
+    """CHECKPOINT_SERDE=msgpack (default) | json; CHECKPOINT_ZSTD_MIN_BYTES > 0 turns on zstd (needs zstandard)."""
+    kind = (kind or os.getenv("CHECKPOINT_SERDE", "msgpack")).lower()
+    if kind == "msgpack":
+        return MsgpackSerializer(compress_min_bytes=int(os.getenv("CHECKPOINT_ZSTD_MIN_BYTES", "0")))
+    if kind == "json":
+        return JsonPlusSerializerCompat()
+    raise ValueError(f"Unknown CHECKPOINT_SERDE: {kind!r} (expected 'msgpack' or 'json')")
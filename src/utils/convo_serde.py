@@ -0,0 +1,83 @@
+import json
+import msgpack
+from langchain_core.messages import HumanMessage, AIMessage, ToolMessage, SystemMessage
+from src.state import ConvoState, RequiredInformation
+
+def serialize_message(msg):
+    serialized = {
+        'type': msg.__class__.__name__,
+    }
+    for key, value in msg.__dict__.items():
+        if isinstance(value, (str, int, float, bool, list, dict, type(None))):
+            serialized[key] = value
+    return serialized
+
+def deserialize_message(msg_dict):
+    msg_type = msg_dict.pop('type')
+    message_classes = {
+        'human': HumanMessage,
+        'ai': AIMessage,
+        'tool': ToolMessage,
+        'system': SystemMessage
+    }
+    
+    if msg_type not in message_classes:
+        raise ValueError(f"Unknown message type: {msg_type}")
+    
+    # Create the message object with all the attributes in msg_dict
+    return message_classes[msg_type](**msg_dict)
+
+
+def serialize_convo_state(state):
+    return json.dumps({
+        'user_input': state['user_input'],
+        'messages': [serialize_message(msg) for msg in state['messages']],
+        'required_information': state['required_information'].__dict__,
+        'contact_permission': state['contact_permission'],
+        'credit_pull_permission': state['credit_pull_permission'],
+        'credit_pull_complete': state['credit_pull_complete'],
+        'lead_create_complete': state['lead_create_complete'],
+        'savings_estimate': state['savings_estimate'],
+        'reason_for_decline': state['reason_for_decline']
+    })
+
+def deserialize_convo_state(state_json):
+    state_dict = json.loads(state_json)
+    return ConvoState(
+        user_input=state_dict['user_input'],
+        messages=[deserialize_message(msg) for msg in state_dict['messages']],
+        required_information=RequiredInformation(**state_dict['required_information']),
+        contact_permission=state_dict['contact_permission'],
+        credit_pull_permission=state_dict['credit_pull_permission'],
+        credit_pull_complete=state_dict['credit_pull_complete'],
+        lead_create_complete=state_dict['lead_create_complete'],
+        savings_estimate=state_dict['savings_estimate'],
+        reason_for_decline=state_dict['reason_for_decline']
+    )
+
+
+# Compact binary encoding for the session message log: each message is packed
+# once, when it is appended, instead of re-encoding the whole history per turn.
+STATE_FIELDS = ['user_input', 'contact_permission', 'credit_pull_permission', 'credit_pull_complete', 'lead_create_complete', 'savings_estimate', 'reason_for_decline']
+
+def pack_message(msg) -> bytes:
+    return msgpack.packb(serialize_message(msg), default=str)
+
+def unpack_message(data: bytes):
+    return deserialize_message(msgpack.unpackb(data))
+
+def pack_state_fields(state) -> bytes:
+    """Everything in the ConvoState except the messages."""
+    fields = {key: state.get(key) for key in STATE_FIELDS}
+    required_information = state.get('required_information')
+    fields['required_information'] = required_information.__dict__ if required_information is not None else None
+    return msgpack.packb(fields, default=str)
+
+def unpack_state_fields(data: bytes, messages) -> ConvoState:
+    fields = msgpack.unpackb(data)
+    required_information = fields.pop('required_information')
+    return ConvoState(
+        messages=messages,
+        required_information=RequiredInformation(**required_information) if required_information is not None else RequiredInformation(),
+        **fields
+    )
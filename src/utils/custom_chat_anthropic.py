@@ -1,6 +1,9 @@
+import copy
 import os
 import re
+import threading
 import warnings
+from collections import OrderedDict
 from operator import itemgetter
 from typing import (
     Any,
@@ -102,139 +105,233 @@ def _format_image(image_url: str) -> Dict:
     }
 
 
-def _merge_messages(
+def _split_system_messages(
     messages: Sequence[BaseMessage],
-) -> List[Union[SystemMessage, AIMessage, HumanMessage]]:
-    """Merge runs of human/tool messages into single human messages with content blocks."""  # noqa: E501
-    merged: list = []
-    for curr in messages:
-        curr = curr.copy(deep=True)
-        if isinstance(curr, ToolMessage):
-            if isinstance(curr.content, list) and all(
-                isinstance(block, dict) and block.get("type") == "tool_result"
-                for block in curr.content
-            ):
-                curr = HumanMessage(curr.content)  # type: ignore[misc]
-            else:
-                curr = HumanMessage(  # type: ignore[misc]
-                    [
-                        {
-                            "type": "tool_result",
-                            "content": curr.content,
-                            "tool_use_id": curr.tool_call_id,
-                        }
+) -> Tuple[List[str], List[BaseMessage], int]:
+    """Leading system messages become the system prompt. Later ones (zip notes,
+    the per-turn input line) are sent in place as user text, since Anthropic
+    takes a single system prompt ahead of the conversation. Also returns how
+    many of those notes trail the conversation."""
+    leading = 0
+    while leading < len(messages) and messages[leading].type == "system":
+        leading += 1
+    system = []
+    for message in messages[:leading]:
+        if not isinstance(message.content, str):
+            raise ValueError(
+                "System message must be a string, "
+                f"instead was: {type(message.content)}"
+            )
+        if message.content.strip():
+            system.append(message.content)
+
+    body: List[BaseMessage] = []
+    trailing = 0
+    for message in messages[leading:]:
+        if message.type == "system":
+            if not message.content.strip():
+                continue
+            body.append(message)
+            trailing += 1
+        else:
+            body.append(message)
+            trailing = 0
+    return system, body, trailing
+
+
+def _format_content_blocks(message: BaseMessage, items: List) -> List[Dict]:
+    """Anthropic content blocks for a list-content message. Blocks that need no
+    conversion are passed through, not copied, so the result must not be mutated."""
+    content: List[Dict] = []
+    for item in items:
+        if isinstance(item, str):
+            content.append({"type": "text", "text": item})
+        elif isinstance(item, dict):
+            if "type" not in item:
+                raise ValueError("Dict content item must have a type key")
+            elif item["type"] == "image_url":
+                # convert format
+                source = _format_image(item["image_url"]["url"])
+                content.append({"type": "image", "source": source})
+            elif item["type"] == "tool_use":
+                # If a tool_call with the same id as a tool_use content block
+                # exists, the tool_call is preferred.
+                if isinstance(message, AIMessage) and item["id"] in [
+                    tc["id"] for tc in message.tool_calls
+                ]:
+                    overlapping = [
+                        tc
+                        for tc in message.tool_calls
+                        if tc["id"] == item["id"]
                     ]
-                )
-        last = merged[-1] if merged else None
-        if isinstance(last, HumanMessage) and isinstance(curr, HumanMessage):
-            if isinstance(last.content, str):
-                new_content: List = [{"type": "text", "text": last.content}]
-            else:
-                new_content = last.content
-            if isinstance(curr.content, str):
-                new_content.append({"type": "text", "text": curr.content})
+                    content.extend(
+                        _lc_tool_calls_to_anthropic_tool_use_blocks(overlapping)
+                    )
+                else:
+                    content.append({k: v for k, v in item.items() if k != "text"})
+            elif item["type"] == "text":
+                text = item.get("text", "")
+                # Only add non-empty strings for now as empty ones are not
+                # accepted.
+                # https://github.com/anthropics/anthropic-sdk-python/issues/461
+                if text.strip():
+                    content.append({"type": "text", "text": text})
             else:
-                new_content.extend(curr.content)
-            last.content = new_content
+                content.append(item)
         else:
-            merged.append(curr)
-    return merged
-
-
-def _format_messages_2(messages: List[BaseMessage]) -> Tuple[Optional[str], List[Dict]]:
-    """Format messages for anthropic."""
-
-    """
-    [
-                {
-                    "role": _message_type_lookups[m.type],
-                    "content": [_AnthropicMessageContent(text=m.content).model_dump()],
-                }
-                for m in messages
-            ]
+            raise ValueError(
+                f"Content items must be str or dict, instead was: {type(item)}"
+            )
+    return content
+
+
+def _format_message(message: BaseMessage) -> Tuple[str, Union[str, List[Dict]]]:
+    """Role and content of one message. Runs of user-role messages (human, tool
+    results) are merged afterwards, in _format_messages_2."""
+    if isinstance(message, ToolMessage):
+        if isinstance(message.content, list) and all(
+            isinstance(block, dict) and block.get("type") == "tool_result"
+            for block in message.content
+        ):
+            return "user", _format_content_blocks(message, message.content)
+        return "user", [
+            {
+                "type": "tool_result",
+                "content": message.content,
+                "tool_use_id": message.tool_call_id,
+            }
+        ]
+
+    if message.type == "system":
+        # A note within the conversation, see _split_system_messages
+        return "user", [{"type": "text", "text": message.content}]
+
+    role = _message_type_lookups[message.type]
+    if not isinstance(message.content, str):
+        # parse as dict
+        assert isinstance(
+            message.content, list
+        ), "Anthropic message content must be str or list of dicts"
+        return role, _format_content_blocks(message, message.content)
+    if isinstance(message, AIMessage) and message.tool_calls:
+        content = (
+            []
+            if not message.content
+            else [{"type": "text", "text": message.content}]
+        )
+        # Note: Anthropic can't have invalid tool calls as presently defined,
+        # since the model already returns dicts args not JSON strings, and invalid
+        # tool calls are those with invalid JSON for args.
+        return role, content + _lc_tool_calls_to_anthropic_tool_use_blocks(message.tool_calls)
+    return role, message.content
+
+
+# Formatted messages by id. A thread re-sends its whole (windowed) history on
+# every turn, so only the new tail needs formatting. Entries are checked against
+# the message's content and tool calls, since checkpoint loads hand back new
+# objects with the same ids.
+MAX_FORMATTED_MESSAGES = 20000
+_formatted_cache: "OrderedDict[str, Tuple[Any, Any, Tuple[str, Union[str, List[Dict]]]]]" = OrderedDict()
+_formatted_cache_lock = threading.Lock()
+
+
+def _format_message_cached(message: BaseMessage) -> Tuple[str, Union[str, List[Dict]]]:
+    if message.id is None:
+        return _format_message(message)
+    tool_calls = message.tool_calls if isinstance(message, AIMessage) else None
+    entry = _formatted_cache.get(message.id)
+    if entry is not None and entry[0] == message.content and entry[1] == tool_calls:
+        return entry[2]
+    formatted = _format_message(message)
+    with _formatted_cache_lock:
+        # Snapshots, so a message edited in place is not matched against itself
+        _formatted_cache[message.id] = (copy.deepcopy(message.content), copy.deepcopy(tool_calls), formatted)
+        while len(_formatted_cache) > MAX_FORMATTED_MESSAGES:
+            _formatted_cache.popitem(last=False)
+    return formatted
+
+
+def _as_blocks(content: Union[str, List[Dict]]) -> List[Dict]:
+    if isinstance(content, list):
+        return content
+    return [{"type": "text", "text": content}] if content.strip() else []
+
+
+def _format_messages_2(messages: List[BaseMessage]) -> Tuple[List[str], List[Dict], int]:
+    """Format messages for anthropic: system prompt parts, messages, and the
+    number of trailing note blocks (see _split_system_messages).
+
+    The messages are read, never copied or modified; the returned dicts may
+    share blocks with them and with earlier requests, so treat them as read-only.
     """
-    system: Optional[str] = None
+    system, messages, trailing = _split_system_messages(messages)
     formatted_messages: List[Dict] = []
-
-    merged_messages = _merge_messages(messages)
-    for i, message in enumerate(merged_messages):
-        if message.type == "system":
-            # if i != 0:
-            #     raise ValueError("System message must be at beginning of message list.")
-            if not isinstance(message.content, str):
-                raise ValueError(
-                    "System message must be a string, "
-                    f"instead was: {type(message.content)}"
-                )
-            system = message.content
-            continue
-
-        role = _message_type_lookups[message.type]
-        content: Union[str, List]
-
-        if not isinstance(message.content, str):
-            # parse as dict
-            assert isinstance(
-                message.content, list
-            ), "Anthropic message content must be str or list of dicts"
-
-            # populate content
-            content = []
-            for item in message.content:
-                if isinstance(item, str):
-                    content.append({"type": "text", "text": item})
-                elif isinstance(item, dict):
-                    if "type" not in item:
-                        raise ValueError("Dict content item must have a type key")
-                    elif item["type"] == "image_url":
-                        # convert format
-                        source = _format_image(item["image_url"]["url"])
-                        content.append({"type": "image", "source": source})
-                    elif item["type"] == "tool_use":
-                        # If a tool_call with the same id as a tool_use content block
-                        # exists, the tool_call is preferred.
-                        if isinstance(message, AIMessage) and item["id"] in [
-                            tc["id"] for tc in message.tool_calls
-                        ]:
-                            overlapping = [
-                                tc
-                                for tc in message.tool_calls
-                                if tc["id"] == item["id"]
-                            ]
-                            content.extend(
-                                _lc_tool_calls_to_anthropic_tool_use_blocks(overlapping)
-                            )
-                        else:
-                            item.pop("text", None)
-                            content.append(item)
-                    elif item["type"] == "text":
-                        text = item.get("text", "")
-                        # Only add non-empty strings for now as empty ones are not
-                        # accepted.
-                        # https://github.com/anthropics/anthropic-sdk-python/issues/461
-                        if text.strip():
-                            content.append({"type": "text", "text": text})
-                    else:
-                        content.append(item)
-                else:
-                    raise ValueError(
-                        f"Content items must be str or dict, instead was: {type(item)}"
-                    )
-        elif isinstance(message, AIMessage) and message.tool_calls:
-            content = (
-                []
-                if not message.content
-                else [{"type": "text", "text": message.content}]
-            )
-            # Note: Anthropic can't have invalid tool calls as presently defined,
-            # since the model already returns dicts args not JSON strings, and invalid
-            # tool calls are those with invalid JSON for args.
-            content += _lc_tool_calls_to_anthropic_tool_use_blocks(message.tool_calls)
+    for message in messages:
+        role, content = _format_message_cached(message)
+        last = formatted_messages[-1] if formatted_messages else None
+        if role == "user" and last is not None and last["role"] == "user":
+            # New list and dict: the previous entry may come from the cache
+            formatted_messages[-1] = {"role": "user", "content": _as_blocks(last["content"]) + _as_blocks(content)}
         else:
-            content = message.content
-
-        formatted_messages.append({"role": role, "content": content})
-    return system, formatted_messages
+            formatted_messages.append({"role": role, "content": content})
+    return system, formatted_messages, trailing
+
+
+CACHE_CONTROL = {"type": "ephemeral"}
+
+
+def _add_cache_breakpoints(
+    payload: Dict, system: List[str], trailing: int
+) -> None:
+    """Mark the cacheable prefix of a request: the tool definitions, the first
+    system part (the static prompt) and the conversation up to the trailing
+    per-turn notes. Anthropic caches tools -> system -> messages in that order,
+    so each breakpoint covers everything before it as well."""
+    if payload.get("tools"):
+        tools = list(payload["tools"])
+        tools[-1] = {**tools[-1], "cache_control": CACHE_CONTROL}
+        payload["tools"] = tools
+    if system:
+        payload["system"] = [
+            {"type": "text", "text": text, **({"cache_control": CACHE_CONTROL} if i == 0 else {})}
+            for i, text in enumerate(system)
+        ]
+
+    # Last block of the conversation history, skipping the trailing notes. The
+    # formatted messages are shared (see _format_messages_2), so copy on write.
+    messages = payload["messages"] = list(payload["messages"])
+    skip = trailing
+    for i in range(len(messages) - 1, -1, -1):
+        content = messages[i]["content"]
+        if isinstance(content, str):
+            content = [{"type": "text", "text": content}]
+        if skip >= len(content):
+            skip -= len(content)
+            continue
+        index = len(content) - 1 - skip
+        content = list(content)
+        content[index] = {**content[index], "cache_control": CACHE_CONTROL}
+        messages[i] = {**messages[i], "content": content}
+        return
+
+
+def _usage_metadata(usage: Any, output_tokens: int) -> UsageMetadata:
+    """Token usage with prompt-cache reads and writes counted as input tokens,
+    and broken out under input_token_details."""
+    cache_read = getattr(usage, "cache_read_input_tokens", None) or 0
+    cache_creation = getattr(usage, "cache_creation_input_tokens", None) or 0
+    input_tokens = usage.input_tokens + cache_read + cache_creation
+    usage_metadata = UsageMetadata(
+        input_tokens=input_tokens,
+        output_tokens=output_tokens,
+        total_tokens=input_tokens + output_tokens,
+    )
+    if cache_read or cache_creation:
+        usage_metadata["input_token_details"] = {  # type: ignore[typeddict-unknown-key]
+            "cache_read": cache_read,
+            "cache_creation": cache_creation,
+        }
+    return usage_metadata
 
 
 class AnthropicTool(TypedDict):
@@ -306,14 +403,9 @@ def _make_message_chunk_from_anthropic_event(
     message_chunk: Optional[AIMessageChunk] = None
     # See https://github.com/anthropics/anthropic-sdk-python/blob/main/src/anthropic/lib/streaming/_messages.py  # noqa: E501
     if event.type == "message_start" and stream_usage:
-        input_tokens = event.message.usage.input_tokens
         message_chunk = AIMessageChunk(
             content="" if coerce_content_to_string else [],
-            usage_metadata=UsageMetadata(
-                input_tokens=input_tokens,
-                output_tokens=0,
-                total_tokens=input_tokens,
-            ),
+            usage_metadata=_usage_metadata(event.message.usage, 0),
         )
     elif (
         event.type == "content_block_start"
@@ -379,7 +471,11 @@ def _make_message_chunk_from_anthropic_event(
 
 
 class CustomChatAnthropic(ChatAnthropic):
-    
+
+    prompt_caching: bool = False
+    """Send prompt-cache breakpoints (see _add_cache_breakpoints). Cache reads and
+    writes are reported in usage_metadata["input_token_details"]."""
+
     def _get_request_payload(
         self,
         input_: LanguageModelInput,
@@ -388,7 +484,7 @@ class CustomChatAnthropic(ChatAnthropic):
         **kwargs: Dict,
     ) -> Dict:
         messages = self._convert_input(input_).to_messages()
-        system, formatted_messages = _format_messages_2(messages)
+        system, formatted_messages, trailing = _format_messages_2(messages)
         payload = {
             "model": self.model,
             "max_tokens": self.max_tokens,
@@ -397,8 +493,73 @@ class CustomChatAnthropic(ChatAnthropic):
             "top_k": self.top_k,
             "top_p": self.top_p,
             "stop_sequences": stop or self.stop_sequences,
-            "system": system,
+            "system": "\n\n".join(system) or None,
             **self.model_kwargs,
             **kwargs,
         }
-        return {k: v for k, v in payload.items() if v is not None}
\ No newline at end of file
+        if self.prompt_caching:
+            _add_cache_breakpoints(payload, system, trailing)
+        return {k: v for k, v in payload.items() if v is not None}
+
+    def _format_output(self, data: Any, **kwargs: Any) -> ChatResult:
+        result = super()._format_output(data, **kwargs)
+        result.generations[0].message.usage_metadata = _usage_metadata(
+            data.usage, data.usage.output_tokens
+        )
+        return result
+
+    # As in ChatAnthropic, but with this module's event conversion, which keeps
+    # the cache token counts of message_start
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        *,
+        stream_usage: Optional[bool] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        if stream_usage is None:
+            stream_usage = self.stream_usage
+        kwargs["stream"] = True
+        payload = self._get_request_payload(messages, stop=stop, **kwargs)
+        stream = self._client.messages.create(**payload)
+        coerce_content_to_string = not _tools_in_params(payload)
+        for event in stream:
+            msg = _make_message_chunk_from_anthropic_event(
+                event,
+                stream_usage=stream_usage,
+                coerce_content_to_string=coerce_content_to_string,
+            )
+            if msg is not None:
+                chunk = ChatGenerationChunk(message=msg)
+                if run_manager and isinstance(msg.content, str):
+                    run_manager.on_llm_new_token(msg.content, chunk=chunk)
+                yield chunk
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        *,
+        stream_usage: Optional[bool] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        if stream_usage is None:
+            stream_usage = self.stream_usage
+        kwargs["stream"] = True
+        payload = self._get_request_payload(messages, stop=stop, **kwargs)
+        stream = await self._async_client.messages.create(**payload)
+        coerce_content_to_string = not _tools_in_params(payload)
+        async for event in stream:
+            msg = _make_message_chunk_from_anthropic_event(
+                event,
+                stream_usage=stream_usage,
+                coerce_content_to_string=coerce_content_to_string,
+            )
+            if msg is not None:
+                chunk = ChatGenerationChunk(message=msg)
+                if run_manager and isinstance(msg.content, str):
+                    await run_manager.on_llm_new_token(msg.content, chunk=chunk)
+                yield chunk
\ No newline at end of file
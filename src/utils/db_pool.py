@@ -0,0 +1,154 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Deque, Optional, Tuple
+
+
+class PoolTimeoutError(TimeoutError):
+    pass
+
+
+class ConnectionPool:
+    """A bounded pool of DB-API connections with health checks on checkout.
+
+    Connections that sat idle longer than `health_check_after` seconds are
+    probed with `health_check_query` before being handed out; broken ones are
+    closed and replaced. A connection whose block raised is rolled back and
+    discarded if the rollback itself fails.
+    """
+
+    def __init__(
+        self,
+        connect: Callable[[], Any],
+        *,
+        max_size: int = 10,
+        timeout: float = 30.0,
+        health_check_query: str = "SELECT 1",
+        health_check_after: float = 30.0,
+        max_lifetime: Optional[float] = 3600.0,
+    ) -> None:
+        self._connect = connect
+        self.max_size = max_size
+        self.timeout = timeout
+        self.health_check_query = health_check_query
+        self.health_check_after = health_check_after
+        self.max_lifetime = max_lifetime
+        # (connection, created_at, last_used_at)
+        self._idle: Deque[Tuple[Any, float, float]] = deque()
+        self._created_at = {}
+        self._size = 0
+        self._cond = threading.Condition()
+        self._closed = False
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    @property
+    def idle(self) -> int:
+        return len(self._idle)
+
+    def _new_connection(self):
+        conn = self._connect()
+        self._created_at[id(conn)] = time.monotonic()
+        return conn
+
+    def _close(self, conn) -> None:
+        self._created_at.pop(id(conn), None)
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _discard(self, conn) -> None:
+        self._close(conn)
+        with self._cond:
+            self._size -= 1
+            self._cond.notify()
+
+    def _is_healthy(self, conn, created_at: float, last_used_at: float) -> bool:
+        now = time.monotonic()
+        if self.max_lifetime is not None and now - created_at > self.max_lifetime:
+            return False
+        if now - last_used_at < self.health_check_after:
+            return True
+        try:
+            cursor = conn.cursor()
+            cursor.execute(self.health_check_query)
+            cursor.fetchall()
+            return True
+        except Exception:
+            return False
+
+    def acquire(self):
+        deadline = time.monotonic() + self.timeout
+        while True:
+            with self._cond:
+                if self._closed:
+                    raise RuntimeError("Connection pool is closed.")
+                if self._idle:
+                    conn, created_at, last_used_at = self._idle.pop()
+                elif self._size < self.max_size:
+                    self._size += 1
+                    conn = None
+                else:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise PoolTimeoutError(f"No connection available after {self.timeout}s (max_size={self.max_size}).")
+                    self._cond.wait(remaining)
+                    continue
+
+            if conn is None:
+                try:
+                    return self._new_connection()
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    raise
+            if self._is_healthy(conn, created_at, last_used_at):
+                return conn
+            # The replacement takes over the broken connection's slot; giving the
+            # slot back and reserving it again could let another caller take it
+            # in between and push the pool past max_size
+            self._close(conn)
+            try:
+                return self._new_connection()
+            except Exception:
+                with self._cond:
+                    self._size -= 1
+                    self._cond.notify()
+                raise
+
+    def release(self, conn, *, broken: bool = False) -> None:
+        if broken or self._closed:
+            self._discard(conn)
+            return
+        created_at = self._created_at.get(id(conn), time.monotonic())
+        with self._cond:
+            self._idle.append((conn, created_at, time.monotonic()))
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        broken = False
+        try:
+            yield conn
+        except Exception:
+            try:
+                conn.rollback()
+            except Exception:
+                broken = True
+            raise
+        finally:
+            self.release(conn, broken=broken)
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+        for conn, _, _ in idle:
+            self._discard(conn)
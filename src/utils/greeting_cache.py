@@ -0,0 +1,180 @@
+import hashlib
+import json
+import logging
+import os
+import random
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Callable, List, Optional
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+logger = logging.getLogger(__name__)
+
+# Pool of pre-generated greetings, so a connect costs a random.choice instead of a
+# graph run (primary LLM + collect_info on the input "."). The pool is keyed by a
+# fingerprint of the primary prompt and model; it is persisted to disk so workers
+# and restarts reuse it, and regenerated in the background when either changes.
+#
+# GREETING_CACHE_PATH sets the file; by default it lives in the user's cache
+# directory ($XDG_CACHE_HOME, else ~/.cache), outside the source tree.
+
+DEFAULT_GREETING = "Hello! I'm Claire, a debt resolution specialist at ClearOne Advantage. How can I assist you today? May I have your first name to get started?"
+DEFAULT_CACHE_PATH = Path(os.getenv("XDG_CACHE_HOME") or Path.home() / ".cache") / "clearone-chat" / "greetings.json"
+
+
+class GreetingCache:
+    def __init__(
+        self,
+        generate: Callable[[], str],
+        fingerprint: Callable[[], str],
+        *,
+        pool_size: int = 4,
+        path: Optional[Path] = DEFAULT_CACHE_PATH,
+        check_interval: float = 300.0,
+    ):
+        self.generate = generate
+        self.fingerprint = fingerprint
+        self.pool_size = pool_size
+        self.path = Path(path) if path else None
+        self.check_interval = check_interval
+        self.variants: List[str] = []
+        self.current_fingerprint: Optional[str] = None
+        self._refresh_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._load()
+
+    def get(self) -> str:
+        """A greeting from the pool, or DEFAULT_GREETING until the first refresh finished."""
+        variants = self.variants
+        if not variants:
+            return DEFAULT_GREETING
+        return random.choice(variants)
+
+    def is_stale(self) -> bool:
+        return not self.variants or self.current_fingerprint != self.fingerprint()
+
+    def refresh(self) -> bool:
+        """Regenerate the pool if the prompt or model changed. Returns True if it did."""
+        with self._refresh_lock:
+            fingerprint = self.fingerprint()
+            if self.variants and fingerprint == self.current_fingerprint:
+                return False
+            variants = []
+            for _ in range(self.pool_size):
+                try:
+                    greeting = self.generate().strip()
+                except Exception as e:
+                    logger.warning("Greeting generation failed: %s", e)
+                    continue
+                if greeting and greeting not in variants:
+                    variants.append(greeting)
+            if not variants:
+                return False
+            # Swap the whole list, readers never see a partial pool
+            self.variants = variants
+            self.current_fingerprint = fingerprint
+            self._save()
+            logger.info("Greeting cache refreshed: %d variants (%s)", len(variants), fingerprint[:12])
+            return True
+
+    def start(self) -> None:
+        """Fill the pool and keep it fresh from a daemon thread."""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="greeting_cache", daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            try:
+                if self.is_stale():
+                    self.refresh()
+            except Exception as e:
+                logger.warning("Greeting cache refresh failed: %s", e)
+            time.sleep(self.check_interval if self.variants else min(self.check_interval, 30.0))
+
+    def _load(self) -> None:
+        if self.path is None or not self.path.exists():
+            return
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning("Ignoring greeting cache %s: %s", self.path, e)
+            return
+        if data.get("fingerprint") == self.fingerprint() and data.get("variants"):
+            self.variants = list(data["variants"])
+            self.current_fingerprint = data["fingerprint"]
+
+    def _save(self) -> None:
+        if self.path is None:
+            return
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_suffix(f".{os.getpid()}.tmp")
+            with open(tmp_path, "w") as f:
+                json.dump({"fingerprint": self.current_fingerprint, "variants": self.variants}, f, indent=2)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning("Could not persist greeting cache to %s: %s", self.path, e)
+
+
+def prompt_fingerprint(prompt, llm, **extra) -> str:
+    # The message templates, not the partials: the prompt's `time` partial is fixed
+    # at import and differs between processes.
+    payload = {
+        "messages": repr(prompt.messages),
+        "llm": type(llm).__name__,
+        "llm_params": repr(sorted(llm._identifying_params.items())),
+        **extra,
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+
+def greeting_message(content: str) -> AIMessage:
+    # A fixed id, so the session state and the seeded checkpoint hold the same message
+    return AIMessage(content=content, id=str(uuid.uuid4()))
+
+
+def seed_checkpoint(graph, config, initial_state) -> None:
+    """Write the greeting turn to the thread's checkpoint, as if the graph had produced it."""
+    graph.update_state(config, dict(initial_state), as_node="assistant")
+
+
+async def aseed_checkpoint(graph, config, initial_state) -> None:
+    await graph.aupdate_state(config, dict(initial_state), as_node="assistant")
+
+
+_greeting_cache: Optional[GreetingCache] = None
+_greeting_cache_lock = threading.Lock()
+
+
+def get_greeting_cache() -> GreetingCache:
+    """Process-wide cache over the primary prompt and the configured model.
+
+    Env: GREETING_CACHE_PATH, GREETING_POOL_SIZE, GREETING_TEMPERATURE.
+    """
+    global _greeting_cache
+    if _greeting_cache is None:
+        with _greeting_cache_lock:
+            if _greeting_cache is None:
+                from src.config import llm
+                from src.prompts import primary_assistant_prompt
+
+                temperature = float(os.getenv("GREETING_TEMPERATURE", "0.7"))
+                chain = primary_assistant_prompt | llm.bind(temperature=temperature)
+
+                def generate() -> str:
+                    result = chain.invoke({"messages": [HumanMessage(content=".")], "user_input": "."})
+                    return result.content if isinstance(result.content, str) else ""
+
+                _greeting_cache = GreetingCache(
+                    generate,
+                    lambda: prompt_fingerprint(primary_assistant_prompt, llm, temperature=temperature),
+                    pool_size=int(os.getenv("GREETING_POOL_SIZE", "4")),
+                    path=Path(os.getenv("GREETING_CACHE_PATH", DEFAULT_CACHE_PATH)),
+                )
+    return _greeting_cache
@@ -1,43 +1,40 @@
 import json
+import logging
 from langchain_core.messages import ToolMessage
 from langchain_core.runnables import RunnableLambda
 from src.utils.info_collector import check_all_required_info
 from typing import Dict
 
+logger = logging.getLogger(__name__)
+
+PERMISSION_TOOLS = ["AskContactPermissionTool", "AskCreditPullPermissionTool"]
+
+SPECULATIVE_LEAD_TOOL = "speculative_lead_create_api_tool"
+
 def update_convo_state(state: dict):
     messages = state.get("messages", [])
+    # The tools node runs all calls of one step concurrently, so a step can end in
+    # several ToolMessages (a credit pull and a speculative lead create); apply each
+    speculative_lead = None
+    applied = False
     for message in reversed(messages):
-        if isinstance(message, ToolMessage):
-            # print("Check this:", message)
-            try:
-                tool_response = json.loads(message.content)
-                # Credit Pull API response
-                if "Data" in tool_response and "TotalEligibleDebt" in tool_response["Data"]:
-                    if tool_response["Success"]:
-                        state["required_information"].Debt = float(tool_response["Data"]["TotalEligibleDebt"])
-                        print(f"Updated Debt in required_information: {state['required_information'].Debt}")
-                    state["credit_pull_complete"] = tool_response["Success"]
-                # Lead Create API response
-                if "Data" in tool_response and "IsDuplicate" in tool_response["Data"]:
-                    state["lead_create_complete"] = tool_response["Success"]
-                    if tool_response["Data"]["IsDuplicate"]:
-                        state["reason_for_decline"] = tool_response["Message"]
-                if "contact_permission" in tool_response:
-                    state["contact_permission"] = tool_response["contact_permission"]
-                    print(f"Updated contact_permission: {state['contact_permission']}")
-                    if not state["contact_permission"]:
-                        state["reason_for_decline"] = "User did not give contact permission."
-                if "credit_pull_permission" in tool_response:
-                    if not tool_response["credit_pull_permission"]:
-                        state["credit_pull_complete"] = False
-                    state["credit_pull_permission"] = tool_response["credit_pull_permission"]
-                    print(f"Updated credit_pull_permission: {state['credit_pull_permission']}")
-                if "saving_estimate" in tool_response:
-                    state["savings_estimate"] = tool_response
-                    print(f"Updated savings_estimate: {state['savings_estimate']}")
+        if not isinstance(message, ToolMessage):
+            if applied:
                 break
-            except json.JSONDecodeError:
-                continue
+            continue
+        # print("Check this:", message)
+        try:
+            tool_response = json.loads(message.content)
+        except json.JSONDecodeError:
+            continue
+        if message.name == SPECULATIVE_LEAD_TOOL:
+            speculative_lead = tool_response
+        else:
+            apply_tool_response(state, tool_response)
+        applied = True
+
+    if speculative_lead is not None:
+        settle_speculative_lead(state, speculative_lead)
 
     # print("Updated state: \n")
     # print("Required Information:", state.get("required_information").dict())
@@ -49,6 +46,62 @@ def update_convo_state(state: dict):
     # print("Reason for Decline:", state.get("reason_for_decline"))
     return state
 
+def apply_tool_response(state: dict, tool_response: dict):
+    # Credit Pull API response
+    if "Data" in tool_response and "TotalEligibleDebt" in tool_response["Data"]:
+        if tool_response["Success"]:
+            state["required_information"].Debt = float(tool_response["Data"]["TotalEligibleDebt"])
+            logger.debug("Updated Debt in required_information: %s", state['required_information'].Debt)
+        state["credit_pull_complete"] = tool_response["Success"]
+    # Lead Create API response
+    if "Data" in tool_response and "IsDuplicate" in tool_response["Data"]:
+        if tool_response["Data"]["IsDuplicate"] and speculative_lead_created(state["messages"]):
+            # The duplicate is our own lead, created alongside a credit pull that failed then
+            logger.info("Lead already created speculatively")
+            state["lead_create_complete"] = True
+        else:
+            state["lead_create_complete"] = tool_response["Success"]
+            if tool_response["Data"]["IsDuplicate"]:
+                state["reason_for_decline"] = tool_response["Message"]
+    if "contact_permission" in tool_response:
+        state["contact_permission"] = tool_response["contact_permission"]
+        logger.debug("Updated contact_permission: %s", state['contact_permission'])
+        if not state["contact_permission"]:
+            state["reason_for_decline"] = "User did not give contact permission."
+    if "credit_pull_permission" in tool_response:
+        if not tool_response["credit_pull_permission"]:
+            state["credit_pull_complete"] = False
+        state["credit_pull_permission"] = tool_response["credit_pull_permission"]
+        logger.debug("Updated credit_pull_permission: %s", state['credit_pull_permission'])
+    # savings_estimate_tool answers with "savings", never "saving_estimate"
+    if "saving_estimate" in tool_response or "savings" in tool_response:
+        state["savings_estimate"] = tool_response
+        logger.debug("Updated savings_estimate: %s", state['savings_estimate'])
+
+def settle_speculative_lead(state: dict, lead_response: dict):
+    """Compensation for a lead created alongside the credit pull.
+
+    lead_create_api_tool requires a successful pull, so the lead only counts once
+    the pull has succeeded. After a failed pull the result is held back and the
+    funnel carries on as if it never ran; the lead itself stays in the CRM, and a
+    later lead create that reports it as a duplicate is accepted
+    (see apply_tool_response).
+    """
+    if state.get("credit_pull_complete"):
+        apply_tool_response(state, lead_response)
+    else:
+        logger.info("Credit pull did not succeed; holding back the speculative lead: %s", lead_response)
+
+def speculative_lead_created(messages) -> bool:
+    for message in messages:
+        if isinstance(message, ToolMessage) and message.name == SPECULATIVE_LEAD_TOOL:
+            try:
+                if json.loads(message.content).get("Success"):
+                    return True
+            except json.JSONDecodeError:
+                continue
+    return False
+
 
 def handle_contact_permission(conversation_state, response: str) -> Dict[str, bool]:
     if not check_all_required_info(conversation_state):
@@ -66,8 +119,6 @@ def handle_contact_permission(conversation_state, response: str) -> Dict[str, bo
                 "invalid_input": True}
 
 def handle_credit_pull_permission(conversation_state, response: str) -> Dict[str, bool]:
-
-    print("check_all_required_info(conversation_state):", check_all_required_info(conversation_state))
     if not check_all_required_info(conversation_state):
         return {"message": "Collect the list of required information first."}
     
@@ -85,3 +136,19 @@ def handle_credit_pull_permission(conversation_state, response: str) -> Dict[str
         return {"message": "Invalid input. Do you give permission for us to obtain your credit profile? This will NOT affect your credit score. (Please type: yes or no) † ",
                 "invalid_input": True}
     
+
+def handle_permission(conversation_state, tool_name, user_response):
+    if tool_name == "AskContactPermissionTool":
+        return handle_contact_permission(conversation_state, user_response)
+    elif tool_name == "AskCreditPullPermissionTool":
+        return handle_credit_pull_permission(conversation_state, user_response)
+    else:
+        return {"message": "Unknown permission tool.", "invalid_input": True}
+
+def get_permission_question(tool_name):
+    if tool_name == "AskContactPermissionTool":
+        return "Do you give permission for us to contact you through email or phone number provided?* (Please type: yes or no) \n * **You understand that by typing 'yes', you are providing your consent for a ClearOne Advantage representative or one of our marketing partners or network providers to contact you by email, text and phone, which may include pre-recorded messages and use automated technology. Your consent to such contact is not required as a condition to use a network service provider. You can unsubscribe at any time.** "
+    elif tool_name == "AskCreditPullPermissionTool":
+        return "Do you give permission for us to obtain your credit profile? This will NOT affect your credit score.† (Please type: yes or no) \n † **You understand that by typing 'yes', you are providing written instructions to ClearOne Advantage, LLC (ClearOne) under the Fair Credit Reporting Act authorizing ClearOne Advantage to obtain information from your personal credit report or other information from a credit bureau solely for debt settlement. This will not impact your credit.** "
+    else:
+        raise ValueError(f"Unknown tool name: {tool_name}")
@@ -0,0 +1,160 @@
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence
+
+import tiktoken
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage, ToolMessage
+
+logger = logging.getLogger(__name__)
+
+# History windowing for the prompts. The conversation keeps growing in the
+# session state (and the checkpoint); what goes into {messages} is only the last
+# few turns, plus a summary of what the earlier turns established, which
+# `required_information` and the permission flags already record.
+
+HISTORY_KEEP_TURNS = int(os.getenv("HISTORY_KEEP_TURNS", "6"))
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "3000"))
+# The extractor also gets `provided_so_far`, so it needs less history
+EXTRACTOR_KEEP_TURNS = int(os.getenv("EXTRACTOR_KEEP_TURNS", "3"))
+
+# Per-message overhead of the chat format (role, separators), as in OpenAI's cookbook
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+class CompactionResult(NamedTuple):
+    messages: List[BaseMessage]
+    tokens_before: int
+    tokens_after: int
+    dropped: int
+
+
+_encoding = None
+_encoding_failed = False
+_token_cache: "OrderedDict[str, int]" = OrderedDict()
+_token_cache_lock = threading.Lock()
+MAX_CACHED_TOKEN_COUNTS = 50000
+
+
+def _get_encoding():
+    global _encoding, _encoding_failed
+    if _encoding is None and not _encoding_failed:
+        try:
+            _encoding = tiktoken.get_encoding("o200k_base")
+        except Exception as e:
+            # The BPE file is downloaded on first use; without it, estimate instead of failing the turn
+            _encoding_failed = True
+            logger.warning("tiktoken encoding unavailable, estimating tokens as chars/4: %r", e)
+    return _encoding
+
+
+def warm_tokenizer() -> None:
+    """Load the encoding at startup rather than on the first turn. Set
+    TIKTOKEN_CACHE_DIR to a baked-in directory to avoid the download."""
+    _get_encoding()
+
+
+def _encoded_len(text: str) -> int:
+    encoding = _get_encoding()
+    if encoding is None:
+        return (len(text) + 3) // 4
+    return len(encoding.encode(text))
+
+
+def count_message_tokens(message: BaseMessage) -> int:
+    """Approximate prompt tokens of one message; cached by message id."""
+    if message.id is not None:
+        cached = _token_cache.get(message.id)
+        if cached is not None:
+            return cached
+    content = message.content if isinstance(message.content, str) else json.dumps(message.content)
+    tokens = MESSAGE_OVERHEAD_TOKENS + _encoded_len(content)
+    if isinstance(message, AIMessage) and message.tool_calls:
+        tokens += _encoded_len(json.dumps([{"name": tc["name"], "args": tc["args"]} for tc in message.tool_calls], default=str))
+    if message.id is not None:
+        with _token_cache_lock:
+            _token_cache[message.id] = tokens
+            while len(_token_cache) > MAX_CACHED_TOKEN_COUNTS:
+                _token_cache.popitem(last=False)
+    return tokens
+
+
+def count_tokens(messages: Sequence[BaseMessage]) -> int:
+    return sum(count_message_tokens(m) for m in messages)
+
+
+def _turn_starts(messages: Sequence[BaseMessage]) -> List[int]:
+    return [i for i, m in enumerate(messages) if isinstance(m, HumanMessage)]
+
+
+def _keep_tool_pairs(messages: Sequence[BaseMessage], cut: int) -> int:
+    """Move `cut` back so no kept ToolMessage loses the AIMessage that called it."""
+    call_index = {}
+    for i, m in enumerate(messages[:cut]):
+        if isinstance(m, AIMessage):
+            for tool_call in m.tool_calls:
+                call_index[tool_call["id"]] = i
+    for m in messages[cut:]:
+        if isinstance(m, ToolMessage) and m.tool_call_id in call_index:
+            cut = min(cut, call_index[m.tool_call_id])
+    return cut
+
+
+def _fmt_flag(value: Optional[bool], yes: str, no: str, unknown: str) -> str:
+    if value is None:
+        return unknown
+    return yes if value else no
+
+
+def summarize_state(state: Dict[str, Any], dropped: int) -> SystemMessage:
+    """What the omitted turns established, from the state fields rather than another LLM call."""
+    lines = [f"Summary of the {dropped} earlier messages of this conversation (omitted):"]
+    required_information = state.get("required_information")
+    if required_information is not None:
+        info = required_information.dict()
+        collected = {k: v for k, v in info.items() if v is not None}
+        missing = [k for k, v in info.items() if v is None]
+        lines.append("- Collected: " + (", ".join(f"{k}={v}" for k, v in collected.items()) or "nothing yet"))
+        lines.append("- Still missing: " + (", ".join(missing) or "nothing"))
+    lines.append("- Contact permission: " + _fmt_flag(state.get("contact_permission"), "granted", "declined", "not asked yet"))
+    lines.append("- Credit pull permission: " + _fmt_flag(state.get("credit_pull_permission"), "granted", "declined", "not asked yet"))
+    lines.append("- Credit pull: " + _fmt_flag(state.get("credit_pull_complete"), "complete", "failed or declined", "not done"))
+    lines.append("- Lead: " + _fmt_flag(state.get("lead_create_complete"), "created", "not created", "not created yet"))
+    if state.get("savings_estimate"):
+        lines.append(f"- Savings estimate given: {json.dumps(state['savings_estimate'], default=str)}")
+    if state.get("reason_for_decline"):
+        lines.append(f"- Reason for decline: {state['reason_for_decline']}")
+    return SystemMessage(content="\n".join(lines))
+
+
+def compact_history(
+    state: Dict[str, Any],
+    *,
+    keep_turns: int = HISTORY_KEEP_TURNS,
+    token_budget: Optional[int] = HISTORY_TOKEN_BUDGET,
+    label: str = "History",
+) -> CompactionResult:
+    """The last `keep_turns` turns of state["messages"] (fewer if over `token_budget`),
+    with earlier messages replaced by a summary of the state. A turn starts at a
+    HumanMessage; tool calls are never separated from their results."""
+    messages = state["messages"]
+    tokens_before = count_tokens(messages)
+    starts = _turn_starts(messages)
+
+    turns = min(keep_turns, len(starts))
+    cut = starts[-turns] if turns else 0
+    cut = _keep_tool_pairs(messages, cut)
+    # Shrink the window to the budget, but always keep the latest turn
+    while token_budget and turns > 1 and count_tokens(messages[cut:]) > token_budget:
+        turns -= 1
+        cut = _keep_tool_pairs(messages, starts[-turns])
+
+    if cut == 0:
+        result = CompactionResult(list(messages), tokens_before, tokens_before, 0)
+    else:
+        kept = [summarize_state(state, cut)] + list(messages[cut:])
+        result = CompactionResult(kept, tokens_before, count_tokens(kept), cut)
+    logger.debug("%s tokens: %d -> %d (%d of %d messages summarized)", label, result.tokens_before, result.tokens_after, result.dropped, len(messages))
+    return result
@@ -0,0 +1,328 @@
+import asyncio
+import json
+import logging
+import os
+import random
+import threading
+import time
+import weakref
+from typing import Any, Dict, Optional
+
+import httpx
+import requests
+import urllib3
+from requests.adapters import HTTPAdapter
+from src.utils.telemetry import span
+
+logger = logging.getLogger(__name__)
+
+# Shared keep-alive HTTP layer for the ClearOne (carbon) API tools.
+#
+# Every call has connect/read timeouts and an overall deadline that bounds the
+# retries and the response body: the sync client checks it between reads of a
+# streamed body, the async one cancels the request when it runs out. Retries use jittered exponential backoff and only cover failures
+# that are safe to repeat: the request never reached the server (connect
+# error/timeout), or the server said it did not process it (429, 503). For
+# requests flagged idempotent, read timeouts and 500/502/504 are retried too.
+# A per-host circuit breaker fails fast while the upstream is down; a call that
+# ends in anything but a response (including cancellation) counts as a failure.
+# Each attempt is an "http" span named by the URL path (src/utils/telemetry.py).
+
+RETRY_ALWAYS_STATUSES = {429, 503}
+RETRY_IDEMPOTENT_STATUSES = {500, 502, 504}
+READ_CHUNK_SIZE = 64 * 1024
+
+
+class HttpClientError(Exception):
+    """The upstream call failed after retries, timed out, or the circuit is open."""
+
+
+class CircuitOpenError(HttpClientError):
+    pass
+
+
+class UpstreamStatusError(HttpClientError):
+    def __init__(self, status_code: int, message: str):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class CircuitBreaker:
+    """Opens after `failure_threshold` consecutive failures; after `reset_timeout`
+    seconds lets one trial call through (half-open) and closes again if it succeeds."""
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at < self.reset_timeout or self._trial_in_flight:
+                return False
+            self._trial_in_flight = True
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self._trial_in_flight or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+            self._trial_in_flight = False
+
+
+class HttpClient:
+    def __init__(
+        self,
+        *,
+        connect_timeout: float = 3.0,
+        read_timeout: float = 15.0,
+        deadline: float = 30.0,
+        max_attempts: int = 3,
+        backoff_base: float = 0.25,
+        backoff_max: float = 2.0,
+        pool_size: int = 20,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+    ):
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.deadline = deadline
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.pool_size = pool_size
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.stats = {"calls": 0, "attempts": 0, "retries": 0, "failures": 0, "circuit_rejections": 0}
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        # httpx.AsyncClient is bound to the event loop it was first used on
+        self._async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "HttpClient":
+        """Timeouts and retry settings from CARBON_CONNECT_TIMEOUT, CARBON_READ_TIMEOUT,
+        CARBON_DEADLINE and CARBON_MAX_ATTEMPTS."""
+        return cls(
+            connect_timeout=float(os.getenv("CARBON_CONNECT_TIMEOUT", "3")),
+            read_timeout=float(os.getenv("CARBON_READ_TIMEOUT", "15")),
+            deadline=float(os.getenv("CARBON_DEADLINE", "30")),
+            max_attempts=int(os.getenv("CARBON_MAX_ATTEMPTS", "3")),
+        )
+
+    def breaker(self, url: str) -> CircuitBreaker:
+        host = httpx.URL(url).host
+        with self._lock:
+            breaker = self._breakers.get(host)
+            if breaker is None:
+                breaker = self._breakers[host] = CircuitBreaker(self.failure_threshold, self.reset_timeout)
+            return breaker
+
+    def _count(self, key: str, n: int = 1) -> None:
+        with self._lock:
+            self.stats[key] += n
+
+    def _backoff(self, attempt: int, remaining: float) -> Optional[float]:
+        # Full jitter; None when the wait would not fit in the deadline
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** (attempt - 1)))
+        return delay if delay < remaining else None
+
+    def _timeouts(self, remaining: float):
+        return min(self.connect_timeout, remaining), min(self.read_timeout, remaining)
+
+    def _open_circuit_error(self, url: str) -> CircuitOpenError:
+        self._count("circuit_rejections")
+        return CircuitOpenError(f"Circuit open for {httpx.URL(url).host}, not calling {url}")
+
+    def _handle_response(self, url: str, status_code: int, json_body, idempotent: bool, breaker: CircuitBreaker):
+        """Decoded body to return, or the exception of a retryable status."""
+        if status_code in RETRY_ALWAYS_STATUSES or (idempotent and status_code in RETRY_IDEMPOTENT_STATUSES):
+            return UpstreamStatusError(status_code, f"HTTP {status_code} from {url}")
+        if status_code >= 500:
+            raise self._fail(breaker, UpstreamStatusError(status_code, f"HTTP {status_code} from {url}"))
+        try:
+            body = json_body()
+        except ValueError as e:
+            raise self._fail(breaker, HttpClientError(f"Invalid JSON from {url} (HTTP {status_code})")) from e
+        # A 4xx still means the upstream is up; the API explains itself in the body
+        breaker.record_success()
+        if status_code >= 400:
+            logger.warning("HTTP error occurred: %s from %s", status_code, url)
+        return body
+
+    def _read_body(self, response: requests.Response, started: float) -> bytes:
+        # The read timeout bounds each socket read, not the whole body
+        chunks = []
+        try:
+            while True:
+                try:
+                    chunk = response.raw.read1(READ_CHUNK_SIZE, decode_content=True)
+                except urllib3.exceptions.ReadTimeoutError as e:
+                    raise requests.exceptions.ReadTimeout(e) from e
+                except urllib3.exceptions.DecodeError as e:
+                    raise requests.exceptions.ContentDecodingError(e) from e
+                except urllib3.exceptions.ProtocolError as e:
+                    raise requests.exceptions.ChunkedEncodingError(e) from e
+                if not chunk:
+                    break
+                chunks.append(chunk)
+                if time.monotonic() - started > self.deadline:
+                    raise requests.exceptions.ReadTimeout(f"Response body not read within the {self.deadline}s deadline")
+        except BaseException:
+            response.close()
+            raise
+        response.raw.release_conn()
+        return b"".join(chunks)
+
+    def _fail(self, breaker: CircuitBreaker, error: Exception) -> HttpClientError:
+        breaker.record_failure()
+        self._count("failures")
+        if isinstance(error, HttpClientError):
+            return error
+        return HttpClientError(str(error))
+
+    def _next_delay(self, url: str, attempt: int, started: float, error: Exception, breaker: CircuitBreaker) -> float:
+        remaining = self.deadline - (time.monotonic() - started)
+        delay = self._backoff(attempt, remaining) if attempt < self.max_attempts else None
+        if delay is None:
+            raise self._fail(breaker, HttpClientError(f"{url} failed after {attempt} attempt(s): {error!r}")) from error
+        logger.warning("Retrying %s in %.2fs (attempt %d failed: %r)", url, delay, attempt, error)
+        self._count("retries")
+        return delay
+
+    def post_json(self, url: str, payload: Any, *, headers: Optional[Dict[str, str]] = None, idempotent: bool = False) -> Any:
+        """POST `payload` as JSON and return the decoded JSON body.
+
+        4xx responses other than 429 are returned as-is; anything else that keeps
+        failing, or runs past the deadline, raises HttpClientError.
+        """
+        breaker = self.breaker(url)
+        if not breaker.allow():
+            raise self._open_circuit_error(url)
+        self._count("calls")
+        started = time.monotonic()
+        attempt = 0
+        try:
+            while True:
+                attempt += 1
+                self._count("attempts")
+                remaining = self.deadline - (time.monotonic() - started)
+                try:
+                    with span("http", httpx.URL(url).path):
+                        response = self.session.post(url, json=payload, headers=headers, timeout=self._timeouts(remaining), stream=True)
+                        body = self._read_body(response, started)
+                except requests.exceptions.RequestException as e:
+                    if not (idempotent or _request_not_sent(e)):
+                        raise self._fail(breaker, HttpClientError(f"{url} failed: {e!r}")) from e
+                    error: Exception = e
+                else:
+                    result = self._handle_response(url, response.status_code, lambda: json.loads(body), idempotent, breaker)
+                    if not isinstance(result, UpstreamStatusError):
+                        return result
+                    error = result
+                time.sleep(self._next_delay(url, attempt, started, error, breaker))
+        except HttpClientError:
+            raise  # already recorded by _fail
+        except BaseException:
+            # Anything else (a payload that does not serialize, a worker being
+            # killed) must still release a half-open trial
+            breaker.record_failure()
+            self._count("failures")
+            raise
+
+    def _async_client(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None:
+            limits = httpx.Limits(max_connections=self.pool_size, max_keepalive_connections=self.pool_size)
+            client = self._async_clients[loop] = httpx.AsyncClient(limits=limits)
+        return client
+
+    async def apost_json(self, url: str, payload: Any, *, headers: Optional[Dict[str, str]] = None, idempotent: bool = False) -> Any:
+        """Async variant of post_json on a shared httpx.AsyncClient."""
+        breaker = self.breaker(url)
+        if not breaker.allow():
+            raise self._open_circuit_error(url)
+        self._count("calls")
+        client = self._async_client()
+        started = time.monotonic()
+        attempt = 0
+        try:
+            while True:
+                attempt += 1
+                self._count("attempts")
+                remaining = self.deadline - (time.monotonic() - started)
+                connect_timeout, read_timeout = self._timeouts(remaining)
+                try:
+                    with span("http", httpx.URL(url).path):
+                        response = await asyncio.wait_for(
+                            client.post(url, json=payload, headers=headers, timeout=httpx.Timeout(read_timeout, connect=connect_timeout)),
+                            remaining,
+                        )
+                except (httpx.TransportError, asyncio.TimeoutError) as e:
+                    if not (idempotent or isinstance(e, (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout))):
+                        raise self._fail(breaker, HttpClientError(f"{url} failed: {e!r}")) from e
+                    error: Exception = e
+                else:
+                    result = self._handle_response(url, response.status_code, response.json, idempotent, breaker)
+                    if not isinstance(result, UpstreamStatusError):
+                        return result
+                    error = result
+                await asyncio.sleep(self._next_delay(url, attempt, started, error, breaker))
+        except HttpClientError:
+            raise  # already recorded by _fail
+        except BaseException:
+            # Includes asyncio.CancelledError: a cancelled trial must not keep
+            # the circuit half-open for good
+            breaker.record_failure()
+            self._count("failures")
+            raise
+
+    def close(self) -> None:
+        self.session.close()
+
+
+def _request_not_sent(e: requests.exceptions.RequestException) -> bool:
+    # Safe to repeat even for non-idempotent calls: the connection was never established
+    if isinstance(e, requests.exceptions.ConnectTimeout):
+        return True
+    reason = getattr(e.args[0], "reason", None) if e.args else None
+    return isinstance(reason, urllib3.exceptions.NewConnectionError)
+
+
+_http_client: Optional[HttpClient] = None
+_http_client_lock = threading.Lock()
+
+
+def get_http_client() -> HttpClient:
+    global _http_client
+    if _http_client is None:
+        with _http_client_lock:
+            if _http_client is None:
+                _http_client = HttpClient.from_env()
+    return _http_client
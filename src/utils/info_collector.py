@@ -1,31 +1,56 @@
 from langchain_core.messages import ToolMessage, SystemMessage
-import pgeocode
-import pandas as pd
 from typing import List
 from src.state import RequiredInformation, ConvoState
 from src.prompts import info_collector_prompt
+from src.utils.info_prefilter import prefilter_user_turn
+from src.utils.zip_index import lookup_zip
+from src.utils.history import compact_history, EXTRACTOR_KEEP_TURNS
 # from langchain_openai import ChatOpenAI
 from src.config import llm
 
 # llm = ChatOpenAI(model="gpt-3.5-turbo-0125", temperature = 0, max_tokens = 1000)
 
+# Tag on the extractor's LLM runs, so token streaming can tell them from the assistant's reply
+EXTRACTOR_TAG = "extractor"
+
+# Built once: with_structured_output converts RequiredInformation to a tool schema
+collect_info_chain = (info_collector_prompt | llm.with_structured_output(RequiredInformation)).with_config(tags=[EXTRACTOR_TAG])
+
 def get_city_state(zip_code):
-    nomi = pgeocode.Nominatim('us')  # Use 'us' for United States, change as needed
-    location = nomi.query_postal_code(zip_code)
-    
-    if pd.notnull(location.place_name) and pd.notnull(location.state_code):
-        return location.place_name, location.state_code
-    else:
-        return None, None
+    # Preloaded offline index, see src/utils/zip_index.py
+    return lookup_zip(zip_code)
 
-def collect_info(state: ConvoState):
-    collect_info_chain = info_collector_prompt | llm.with_structured_output(RequiredInformation)
-    result = collect_info_chain.invoke({
-            "messages": state["messages"],
+def _skipped_collect_info(state: ConvoState):
+    return {
+        "required_information": state.get("required_information") or RequiredInformation(),
+        "messages": state["messages"]
+    }
+
+def _collect_info_inputs(state: ConvoState):
+    return {
+            "messages": compact_history(state, keep_turns=EXTRACTOR_KEEP_TURNS, label="Extractor history").messages,
             "provided_so_far": state["required_information"],
             "user_input": state["user_input"],
-    })
-    
+    }
+
+def collect_info(state: ConvoState):
+    # Skip the extractor when the latest turn cannot add a field (tool steps, "ok", "yes", ...)
+    prefilter = prefilter_user_turn(state)
+    if not prefilter.call_extractor:
+        return _skipped_collect_info(state)
+
+    result = collect_info_chain.invoke(_collect_info_inputs(state))
+    return _apply_collected_info(state, result)
+
+async def acollect_info(state: ConvoState):
+    prefilter = prefilter_user_turn(state)
+    if not prefilter.call_extractor:
+        return _skipped_collect_info(state)
+
+    result = await collect_info_chain.ainvoke(_collect_info_inputs(state))
+    return _apply_collected_info(state, result)
+
+def _apply_collected_info(state: ConvoState, result: RequiredInformation):
     # If Zip is provided but City or State is missing, try to infer them
     if result.Zip and (not result.City or not result.State):
         try: 
@@ -78,7 +103,6 @@ def combine_required_info(info_list: List[RequiredInformation]) -> RequiredInfor
 
 def check_all_required_info(state) -> bool:
 
-    print("state check_all_required_info:", state)
     required_info = state["required_information"]
     # print("Checking required information: ", required_info)
     return required_info.all_fields_not_none()
@@ -0,0 +1,155 @@
+import re
+import threading
+from typing import Dict, List, NamedTuple, Optional
+from langchain_core.messages import AIMessage, HumanMessage
+
+# Cheap local checks that run before the structured-output extractor in
+# collect_info. The extractor is only called when a turn may carry new
+# RequiredInformation fields.
+
+EMAIL_RE = re.compile(r"[\w.+-]+@[\w-]+(\.[\w-]+)+")
+PHONE_RE = re.compile(r"(\+?1[\s.-]?)?\(?\d{3}\)?[\s.-]?\d{3}[\s.-]?\d{4}\b")
+ZIP_RE = re.compile(r"\b\d{5}(-\d{4})?\b")
+DOB_RE = re.compile(
+    r"\b\d{1,4}[/.-]\d{1,2}[/.-]\d{1,4}\b"
+    r"|\b(jan|feb|mar|apr|may|jun|jul|aug|sep|sept|oct|nov|dec)[a-z]*\.?\s+\d{1,2}(st|nd|rd|th)?,?\s+\d{2,4}\b"
+    r"|\b\d{1,2}(st|nd|rd|th)?\s+(of\s+)?(jan|feb|mar|apr|may|jun|jul|aug|sep|sept|oct|nov|dec)[a-z]*,?\s+\d{2,4}\b",
+    re.IGNORECASE,
+)
+AMOUNT_RE = re.compile(
+    r"\$\s?\d[\d,]*(\.\d+)?|\b\d[\d,]*(\.\d+)?\s?(k|grand|thousand|dollars?|bucks)\b|\b\d{1,3}(,\d{3})+\b"
+    r"|\b(hundred|thousand|grand)\b",
+    re.IGNORECASE,
+)
+NAME_CUE_RE = re.compile(r"\b(my name is|my name's|i am|i'm|im|this is|call me|name)\b", re.IGNORECASE)
+ADDRESS_CUE_RE = re.compile(
+    r"\b\d+\s+\w+.*\b(st|street|ave|avenue|rd|road|blvd|boulevard|dr|drive|ln|lane|ct|court|way|pl|place|apt|suite)\b"
+    r"|\b(live in|living in|located in|address|moved)\b",
+    re.IGNORECASE,
+)
+CORRECTION_CUE_RE = re.compile(r"\b(actually|wrong|mistake|typo|change|update|correct|instead|not)\b", re.IGNORECASE)
+
+# Replies that cannot carry a RequiredInformation field on their own.
+FILLER_WORDS = {
+    "ok", "okay", "k", "yes", "y", "yeah", "yep", "yup", "sure", "no", "n", "nope", "nah",
+    "thanks", "thank", "you", "thx", "ty", "hi", "hello", "hey", "good", "great", "fine",
+    "cool", "alright", "right", "please", "go", "ahead", "proceed", "continue", "sounds",
+    "that", "thats", "that's", "perfect", "awesome", "nice", "got", "it", "i", "am", "ready",
+    "lets", "let's", "do", "interested", "correct", "agreed", "agree", "of", "course", "absolutely",
+    "definitely", "hmm", "um", "uh", "maybe", "not", "now", "sorry", ".",
+}
+
+# What the assistant may have just asked for, keyed by the words that give it away.
+QUESTION_FIELDS = {
+    "name": re.compile(r"\bname\b", re.IGNORECASE),
+    "zip": re.compile(r"\bzip\b|postal", re.IGNORECASE),
+    "email": re.compile(r"e-?mail", re.IGNORECASE),
+    "phone": re.compile(r"\bphone\b|\bnumber\b|\bcell\b", re.IGNORECASE),
+    "address": re.compile(r"\baddress\b|\bstreet\b|\bcity\b|\bstate\b", re.IGNORECASE),
+    "dob": re.compile(r"\bbirth|\bdob\b|\bborn\b", re.IGNORECASE),
+    "debt": re.compile(r"\bdebt\b|\bowe\b|\bbalance\b|\bcredit card", re.IGNORECASE),
+    "confirm": re.compile(r"\bconfirm\b|\bcorrect\b|\bedits?\b|\bchanges?\b", re.IGNORECASE),
+}
+
+_WORD_RE = re.compile(r"[\w'.]+")
+
+
+class PrefilterResult(NamedTuple):
+    call_extractor: bool
+    reason: str
+    candidates: List[str]
+
+
+_stats_lock = threading.Lock()
+_stats: Dict[str, int] = {"turns": 0, "extractor_calls": 0, "extractor_skipped": 0}
+_reasons: Dict[str, int] = {}
+
+
+def _record(result: PrefilterResult) -> PrefilterResult:
+    with _stats_lock:
+        _stats["turns"] += 1
+        _stats["extractor_calls" if result.call_extractor else "extractor_skipped"] += 1
+        _reasons[result.reason] = _reasons.get(result.reason, 0) + 1
+    return result
+
+
+def get_prefilter_stats() -> Dict[str, object]:
+    """Counters for how many extractor calls the pre-filter has saved."""
+    with _stats_lock:
+        stats = dict(_stats)
+        stats["reasons"] = dict(_reasons)
+    stats["skip_rate"] = stats["extractor_skipped"] / stats["turns"] if stats["turns"] else 0.0
+    return stats
+
+
+def reset_prefilter_stats() -> None:
+    with _stats_lock:
+        for key in _stats:
+            _stats[key] = 0
+        _reasons.clear()
+
+
+def last_assistant_question(messages) -> Optional[str]:
+    for message in reversed(messages):
+        if isinstance(message, AIMessage) and isinstance(message.content, str) and message.content.strip():
+            return message.content
+    return None
+
+
+def find_candidates(text: str) -> List[str]:
+    candidates = []
+    if EMAIL_RE.search(text):
+        candidates.append("email")
+    if PHONE_RE.search(text):
+        candidates.append("phone")
+    if ZIP_RE.search(text):
+        candidates.append("zip")
+    if DOB_RE.search(text):
+        candidates.append("dob")
+    if AMOUNT_RE.search(text):
+        candidates.append("amount")
+    if NAME_CUE_RE.search(text):
+        candidates.append("name")
+    if ADDRESS_CUE_RE.search(text):
+        candidates.append("address")
+    return candidates
+
+
+def prefilter_user_turn(state) -> PrefilterResult:
+    """Decide whether the latest user turn could add or change a required field."""
+    messages = state.get("messages") or []
+    if not messages or not isinstance(messages[-1], HumanMessage):
+        return _record(PrefilterResult(False, "no_new_user_turn", []))
+
+    text = state.get("user_input") or messages[-1].content
+    if not isinstance(text, str):
+        return _record(PrefilterResult(True, "non_text_input", []))
+    text = text.strip()
+    if not text or text == ".":
+        return _record(PrefilterResult(False, "empty_input", []))
+
+    candidates = find_candidates(text)
+    if candidates:
+        return _record(PrefilterResult(True, "candidate_data", candidates))
+
+    words = [w.lower().strip(".,!?") for w in _WORD_RE.findall(text)]
+    if any(char.isdigit() for char in text):
+        return _record(PrefilterResult(True, "unsure_digits", []))
+
+    question = last_assistant_question(messages[:-1]) or ""
+    asked = [field for field, pattern in QUESTION_FIELDS.items() if pattern.search(question)]
+
+    if words and all(w in FILLER_WORDS for w in words):
+        return _record(PrefilterResult(False, "filler_reply", []))
+
+    # Short replies to a question about a field are most likely the answer itself
+    # (e.g. "Nick" after "May I have your name?").
+    if asked:
+        if "name" in asked and 1 <= len(words) <= 4:
+            return _record(PrefilterResult(True, "name_reply", ["name"]))
+        return _record(PrefilterResult(True, "unsure_answer_to_question", asked))
+
+    if CORRECTION_CUE_RE.search(text) and state.get("required_information") is not None:
+        return _record(PrefilterResult(True, "unsure_correction", []))
+
+    return _record(PrefilterResult(False, "no_candidate_data", []))
@@ -0,0 +1,181 @@
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+from typing import Any, Callable, Optional
+
+# Non-blocking logging for the servers.
+#
+# Records go onto a bounded queue and a listener thread formats and writes them,
+# so a request thread never waits on stdout or renders a message it hands off.
+# A full queue drops the record (counted in `dropped`) rather than blocking.
+#
+#   LOG_LEVEL          INFO by default; DEBUG adds the per-event message dumps,
+#                      timings and state updates the servers used to print.
+#   LOG_DEBUG_SAMPLE   fraction of turns whose DEBUG records are kept (default
+#                      1.0); records outside a turn are sampled one by one.
+#   LOG_FORMAT         text (default) | json, one object per line with the
+#                      record's `extra` fields.
+#   LOG_QUEUE_SIZE     records buffered before dropping (default 10000).
+#
+# Below LOG_LEVEL a call costs one cached level check. Above it, the request
+# thread still builds the LogRecord (also for records sampling drops), but
+# expensive values passed as %-args or wrapped in `lazy(...)` are only rendered,
+# on the listener thread, if the record is kept. Args must not be mutated after
+# the call.
+
+_STANDARD_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+# Set by sample_turn(); None outside a turn
+_turn_sampled: contextvars.ContextVar[Optional[bool]] = contextvars.ContextVar("log_turn_sampled", default=None)
+
+
+class lazy:
+    """A log argument computed only if the record is written: `lazy(message.pretty_repr)`."""
+
+    __slots__ = ("fn", "args")
+
+    def __init__(self, fn: Callable[..., Any], *args: Any):
+        self.fn = fn
+        self.args = args
+
+    def __str__(self) -> str:
+        return str(self.fn(*self.args))
+
+
+class SampleFilter(logging.Filter):
+    """Keeps a `rate` fraction of records below `max_level`; everything above passes.
+
+    Within a turn the decision made by sample_turn() applies to all its records.
+    """
+
+    def __init__(self, rate: float, max_level: int = logging.DEBUG):
+        super().__init__()
+        self.rate = rate
+        self.max_level = max_level
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > self.max_level:
+            return True
+        sampled = _turn_sampled.get()
+        return sampled if sampled is not None else random.random() < self.rate
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _STANDARD_ATTRS:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that never blocks and leaves formatting to the listener.
+
+    queue.SimpleQueue is unbounded but several times cheaper to put to than
+    queue.Queue; `max_size` is checked against its size instead, which is
+    approximate under concurrent puts and good enough for shedding load.
+    """
+
+    def __init__(self, max_size: int):
+        super().__init__(queue.SimpleQueue())
+        self.max_size = max_size
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The stock prepare() formats the message here, on the caller's thread
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        if self.queue.qsize() >= self.max_size:
+            self.dropped += 1
+            return
+        self.queue.put_nowait(record)
+
+
+class LogPipeline:
+    def __init__(self, level: int, sample_rate: float, fmt: str, queue_size: int, stream=None):
+        self.handler = DroppingQueueHandler(queue_size)
+        self.sample_rate = sample_rate
+        if sample_rate < 1.0:
+            self.handler.addFilter(SampleFilter(sample_rate))
+        self.output = logging.StreamHandler(stream or sys.stderr)
+        if fmt == "json":
+            self.output.setFormatter(JsonFormatter())
+        else:
+            self.output.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+        self.level = level
+        self.listener: Optional[logging.handlers.QueueListener] = None
+
+    def start(self) -> None:
+        self.listener = logging.handlers.QueueListener(self.handler.queue, self.output, respect_handler_level=False)
+        self.listener.start()
+
+    def stop(self) -> None:
+        if self.listener is not None:
+            self.listener.stop()
+            self.listener = None
+
+    def _after_fork(self) -> None:
+        # The listener thread is gone in a forked worker (gunicorn --preload);
+        # start over with an empty queue, the parent writes its own records
+        self.handler.queue = queue.SimpleQueue()
+        self.start()
+
+
+_pipeline: Optional[LogPipeline] = None
+_pipeline_lock = threading.Lock()
+
+
+def configure_logging(stream=None) -> LogPipeline:
+    """Routes the root logger through the queue; idempotent. Called by the servers at import."""
+    global _pipeline
+    with _pipeline_lock:
+        if _pipeline is not None:
+            return _pipeline
+        level = logging.getLevelName(os.getenv("LOG_LEVEL", "INFO").upper())
+        pipeline = LogPipeline(
+            level=level if isinstance(level, int) else logging.INFO,
+            sample_rate=float(os.getenv("LOG_DEBUG_SAMPLE", "1")),
+            fmt=os.getenv("LOG_FORMAT", "text").lower(),
+            queue_size=int(os.getenv("LOG_QUEUE_SIZE", "10000")),
+            stream=stream,
+        )
+        # The formats use none of the caller, thread or process fields; skip
+        # collecting them per record (the logging HOWTO's "Optimization")
+        logging._srcfile = None
+        logging.logThreads = False
+        logging.logProcesses = False
+        logging.logMultiprocessing = False
+        root = logging.getLogger()
+        root.setLevel(pipeline.level)
+        for handler in root.handlers[:]:
+            root.removeHandler(handler)
+        root.addHandler(pipeline.handler)
+        # Third-party clients log every request at INFO
+        for name in ("httpx", "urllib3", "engineio", "socketio"):
+            logging.getLogger(name).setLevel(max(pipeline.level, logging.WARNING))
+        pipeline.start()
+        atexit.register(pipeline.stop)
+        os.register_at_fork(after_in_child=pipeline._after_fork)
+        _pipeline = pipeline
+        return pipeline
+
+
+def sample_turn() -> None:
+    """Draws the LOG_DEBUG_SAMPLE decision for the turn running in this context."""
+    if _pipeline is not None and _pipeline.sample_rate < 1.0:
+        _turn_sampled.set(random.random() < _pipeline.sample_rate)
@@ -0,0 +1,156 @@
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import Checkpoint, CheckpointMetadata, CheckpointTuple
+from langgraph.checkpoint.memory import MemorySaver
+from src.utils.checkpoint_serde import create_checkpoint_serde
+from src.utils.telemetry import MEMORY_BYTES, MEMORY_ENTRIES, MEMORY_EVICTIONS, TimedSerde
+
+logger = logging.getLogger(__name__)
+
+# MemorySaver with a memory budget, the default checkpointer (CHECKPOINTER=memory).
+#
+# The stock MemorySaver keeps every checkpoint of every thread, one per graph
+# step, for the life of the worker. This one keeps the latest `keep_per_thread`
+# checkpoints of a thread (the graph and get_state only read the latest) and
+# drops whole threads, least recently used first, beyond `max_threads` or
+# `max_bytes` of serialized checkpoints and writes. A dropped thread is gone,
+# so the session store pins the thread of every session it evicts (`pin`,
+# via checkpoint_restorer) and releases it once the session is back in memory
+# or gone. Pinned threads count against the limits and are only dropped, oldest
+# first, once no unpinned thread is left to drop; that session is then lost
+# (chat_memory_evictions{reason="pinned"}).
+#
+#   CHECKPOINT_KEEP_PER_THREAD  default 2
+#   CHECKPOINT_MAX_THREADS      default 10000
+#   CHECKPOINT_MAX_BYTES        default 512 MiB
+#
+# Checkpoints are stored with the msgpack serde of MSSQLSaver
+# (src/utils/checkpoint_serde.py) and timed as serde spans.
+
+
+class BoundedMemorySaver(MemorySaver):
+    def __init__(self, *, keep_per_thread: int = 2, max_threads: Optional[int] = None, max_bytes: Optional[int] = None, serde=None):
+        super().__init__(serde=serde or TimedSerde(create_checkpoint_serde(), "checkpoint"))
+        self.keep_per_thread = max(1, keep_per_thread)
+        self.max_threads = max_threads
+        self.max_bytes = max_bytes
+        # thread_id -> bytes held, least recently used first
+        self._threads: "OrderedDict[str, int]" = OrderedDict()
+        # thread_id -> bytes held, for threads dropped only as a last resort, oldest pin first
+        self._pinned: "OrderedDict[str, int]" = OrderedDict()
+        self.bytes = 0
+        self._lock = threading.RLock()
+
+    @classmethod
+    def from_env(cls) -> "BoundedMemorySaver":
+        return cls(
+            keep_per_thread=int(os.getenv("CHECKPOINT_KEEP_PER_THREAD", "2")),
+            max_threads=int(os.getenv("CHECKPOINT_MAX_THREADS", "10000")),
+            max_bytes=int(os.getenv("CHECKPOINT_MAX_BYTES", str(512 * 1024 * 1024))),
+        )
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        thread_id = config["configurable"]["thread_id"]
+        with self._lock:
+            # storage is a defaultdict; looking up an unknown thread would add it
+            if thread_id not in self.storage:
+                return None
+            if thread_id in self._threads:
+                self._threads.move_to_end(thread_id)
+            return super().get_tuple(config)
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        with self._lock:
+            if config and config["configurable"]["thread_id"] not in self.storage:
+                return iter(())
+            # Materialized under the lock, since puts change the dicts it walks
+            return iter(list(super().list(config, filter=filter, before=before, limit=limit)))
+
+    def put(self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata) -> RunnableConfig:
+        thread_id = config["configurable"]["thread_id"]
+        with self._lock:
+            saved = super().put(config, checkpoint, metadata)
+            checkpoints = self.storage[thread_id]
+            # Checkpoint ids sort by creation time, as get_tuple's max() relies on
+            for ts in sorted(checkpoints)[:-self.keep_per_thread]:
+                del checkpoints[ts]
+                self.writes.pop((thread_id, ts), None)
+            self._account(thread_id)
+            self._evict(thread_id)
+        return saved
+
+    def put_writes(self, config: RunnableConfig, writes: List[Tuple[str, Any]], task_id: str) -> RunnableConfig:
+        thread_id = config["configurable"]["thread_id"]
+        with self._lock:
+            if thread_id not in self.storage:
+                # Dropped while its run was still going
+                return config
+            saved = super().put_writes(config, writes, task_id)
+            self._account(thread_id)
+            self._evict(thread_id)
+        return saved
+
+    def pin(self, thread_id: str) -> bool:
+        """Keep the thread until `unpin`; False if it was already dropped."""
+        with self._lock:
+            if thread_id in self._threads:
+                self._pinned[thread_id] = self._threads.pop(thread_id)
+            return thread_id in self._pinned
+
+    def unpin(self, thread_id: str) -> None:
+        with self._lock:
+            size = self._pinned.pop(thread_id, None)
+            if size is not None:
+                self._threads[thread_id] = size
+                self._evict(thread_id)
+
+    def _account(self, thread_id: str) -> None:
+        checkpoints = self.storage[thread_id]
+        size = sum(len(checkpoint) + len(metadata) for checkpoint, metadata in checkpoints.values())
+        size += sum(len(value) for ts in checkpoints for _, _, value in self.writes.get((thread_id, ts), ()))
+        held = self._pinned if thread_id in self._pinned else self._threads
+        self.bytes += size - held.get(thread_id, 0)
+        held[thread_id] = size
+        if held is self._threads:
+            self._threads.move_to_end(thread_id)
+
+    def _evict(self, current: str) -> None:
+        while True:
+            if self.max_threads is not None and len(self._threads) + len(self._pinned) > self.max_threads:
+                reason = "count"
+            elif self.max_bytes is not None and self.bytes > self.max_bytes:
+                reason = "bytes"
+            else:
+                break
+            thread_id = next((t for t in self._threads if t != current), None)
+            if thread_id is None:
+                thread_id = next((t for t in self._pinned if t != current), None)
+                if thread_id is None:
+                    break
+                logger.warning("Dropping pinned checkpoint thread %s (%s limit); its evicted session is lost", thread_id, reason)
+                reason = "pinned"
+            self._drop(thread_id)
+            MEMORY_EVICTIONS.labels("checkpoints", reason).inc()
+        self._report()
+
+    def _drop(self, thread_id: str) -> None:
+        for ts in self.storage.pop(thread_id, {}):
+            self.writes.pop((thread_id, ts), None)
+        held = self._pinned if thread_id in self._pinned else self._threads
+        self.bytes -= held.pop(thread_id, 0)
+
+    def _report(self) -> None:
+        MEMORY_BYTES.labels("checkpoints").set(self.bytes)
+        MEMORY_ENTRIES.labels("checkpoints").set(len(self._threads) + len(self._pinned))
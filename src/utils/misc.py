@@ -1,8 +1,27 @@
+import logging
 from langchain_core.messages import ToolMessage, AIMessage
 from langchain_core.runnables import RunnableLambda
+from langchain_core.utils.function_calling import convert_to_openai_tool
 from langgraph.prebuilt import ToolNode as BaseToolNode
 from flask_socketio import SocketIO
 from typing import List, Union, Dict, Any
+from src.utils.log import lazy
+
+logger = logging.getLogger(__name__)
+
+# Tool name -> OpenAI tool schema. bind_tools takes these dicts as they are (the
+# Anthropic model converts them too), so every chain binding the same tools,
+# e.g. the primary and fallback assistants, shares one conversion.
+_tool_schemas: Dict[str, Dict[str, Any]] = {}
+
+def tool_schemas(tools: list) -> List[Dict[str, Any]]:
+    schemas = []
+    for tool in tools:
+        schema = _tool_schemas.get(tool.name)
+        if schema is None:
+            schema = _tool_schemas[tool.name] = convert_to_openai_tool(tool)
+        schemas.append(schema)
+    return schemas
 
 def create_tool_node_with_fallback(tools: list) -> dict:
     return BaseToolNode(tools).with_fallbacks(
@@ -11,7 +30,7 @@ def create_tool_node_with_fallback(tools: list) -> dict:
 
 def handle_tool_error(state) -> dict:
     error = state.get("error")
-    print(f"error: {error}")
+    logger.warning("Tool error: %r", error)
     tool_calls = state["messages"][-1].tool_calls
     return {
         "messages": [
@@ -25,20 +44,24 @@ def handle_tool_error(state) -> dict:
     }
 
 def _print_event(event: dict, _printed: set, max_length=1500):
+    # Marks the event's latest message as seen; logs it at DEBUG, rendered only if the record is written
     current_state = event.get("dialog_state")
     if current_state:
-        print("Currently in: ", current_state[-1])
+        logger.debug("Currently in: %s", current_state[-1])
     message = event.get("messages")
     if message:
         if isinstance(message, list):
             message = message[-1]
         if message.id not in _printed:
-            msg_repr = message.pretty_repr(html=True)
-            if len(msg_repr) > max_length:
-                msg_repr = msg_repr[:max_length] + " ... (truncated)"
-            print(msg_repr)
+            logger.debug("%s", lazy(_message_repr, message, max_length))
             _printed.add(message.id)
 
+def _message_repr(message, max_length: int) -> str:
+    msg_repr = message.pretty_repr(html=True)
+    if len(msg_repr) > max_length:
+        msg_repr = msg_repr[:max_length] + " ... (truncated)"
+    return msg_repr
+
 # def process_message(graph, state, config, _printed):
 #     global conversation_state
 #     events = part_1_graph.stream(state, config, stream_mode="values")
@@ -1,5 +1,6 @@
-import pyodbc
-from typing import Optional, Iterator, Dict, Any, Tuple, Sequence
+from typing import Optional, Iterator, Dict, Any, Tuple, Sequence, Callable
+from collections import OrderedDict
+import asyncio
 from contextlib import contextmanager
 from langgraph.checkpoint.base import BaseCheckpointSaver, CheckpointTuple, Checkpoint
 from langchain_core.runnables import RunnableConfig
@@ -7,6 +8,7 @@ from langgraph.checkpoint.sqlite import JsonPlusSerializerCompat
 import threading
 from hashlib import md5
 import json
+import logging
 import pickle
 import sqlite3
 import threading
@@ -19,6 +21,10 @@ from langchain_core.runnables import RunnableConfig
 from typing_extensions import Self
 from langgraph.errors import EmptyChannelError
 from langchain_core.messages import HumanMessage, AIMessage, ToolMessage
+from src.utils.db_pool import ConnectionPool
+from src.utils.checkpoint_serde import create_checkpoint_serde
+from src.utils.telemetry import TimedSerde
+import random
 
 from langgraph.channels.base import BaseChannel
 from langgraph.checkpoint.base import (
@@ -32,16 +38,115 @@ from dotenv import load_dotenv
 import os
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+# Per-thread write locks, shared by the thread_ids that hash to the same stripe
+THREAD_LOCK_STRIPES = 256
+
 class MSSQLSaver(BaseCheckpointSaver):
     """A checkpoint saver that stores checkpoints in a Microsoft SQL Server database."""
 
-    serde = JsonPlusSerializerCompat()
+    # msgpack by default (src/utils/checkpoint_serde.py); rows written by
+    # JsonPlusSerializerCompat are still read through it. Timed as "serde" spans.
+    serde = TimedSerde(create_checkpoint_serde(), "checkpoint")
+
+    # Statements are class attributes so a stand-in backend can swap the SQL dialect.
+    SETUP_STATEMENTS = (
+        """
+            IF NOT EXISTS (SELECT * FROM sys.tables WHERE name = 'checkpoints_data')
+            CREATE TABLE checkpoints_data (
+                thread_id NVARCHAR(255) NOT NULL,
+                thread_ts NVARCHAR(255) NOT NULL,
+                parent_ts NVARCHAR(255),
+                checkpoint_blob VARBINARY(MAX),
+                metadata VARBINARY(MAX),
+                parsed_ts DATETIME2,
+                created_ts DATETIME DEFAULT GETDATE(),
+                PRIMARY KEY (thread_id, thread_ts)
+            )
+        """,
+        """
+            IF NOT EXISTS (SELECT * FROM sys.tables WHERE name = 'writes_data')
+            CREATE TABLE writes_data (
+                thread_id NVARCHAR(255) NOT NULL,
+                thread_ts NVARCHAR(255) NOT NULL,
+                task_id NVARCHAR(255) NOT NULL,
+                idx INT NOT NULL,
+                channel NVARCHAR(255) NOT NULL,
+                value VARBINARY(MAX),
+                PRIMARY KEY (thread_id, thread_ts, task_id, idx)
+            )
+        """,
+        """
+            IF NOT EXISTS (SELECT * FROM sys.tables WHERE name = 'channel_blobs_data')
+            CREATE TABLE channel_blobs_data (
+                thread_id NVARCHAR(255) NOT NULL,
+                channel NVARCHAR(255) NOT NULL,
+                version NVARCHAR(255) NOT NULL,
+                value VARBINARY(MAX),
+                PRIMARY KEY (thread_id, channel, version)
+            )
+        """,
+        """
+            IF NOT EXISTS (SELECT * FROM sys.tables WHERE name = 'messages_data')
+            CREATE TABLE messages_data (
+                thread_id NVARCHAR(255) NOT NULL,
+                idx INT NOT NULL,
+                message_id NVARCHAR(255),
+                message_blob VARBINARY(MAX),
+                PRIMARY KEY (thread_id, idx)
+            )
+        """,
+    )
+    SELECT_CHECKPOINT = "SELECT thread_id, thread_ts, parent_ts, checkpoint_blob, metadata FROM checkpoints_data WHERE thread_id = ? AND thread_ts = ?"
+    SELECT_LATEST_CHECKPOINT = "SELECT TOP 1 thread_id, thread_ts, parent_ts, checkpoint_blob, metadata FROM checkpoints_data WHERE thread_id = ? ORDER BY thread_ts DESC"
+    UPSERT_CHECKPOINT = (
+        "MERGE INTO checkpoints_data AS target "
+        "USING (VALUES (?, ?, ?, ?, ?)) AS source (thread_id, thread_ts, parent_ts, checkpoint_blob, metadata) "
+        "ON target.thread_id = source.thread_id AND target.thread_ts = source.thread_ts "
+        "WHEN MATCHED THEN "
+        "    UPDATE SET parent_ts = source.parent_ts, checkpoint_blob = source.checkpoint_blob, metadata = source.metadata "
+        "WHEN NOT MATCHED THEN "
+        "    INSERT (thread_id, thread_ts, parent_ts, checkpoint_blob, metadata) "
+        "    VALUES (source.thread_id, source.thread_ts, source.parent_ts, source.checkpoint_blob, source.metadata);"
+    )
+    UPSERT_WRITE = (
+        "MERGE INTO writes_data AS target "
+        "USING (VALUES (?, ?, ?, ?, ?, ?)) AS source (thread_id, thread_ts, task_id, idx, channel, value) "
+        "ON target.thread_id = source.thread_id AND target.thread_ts = source.thread_ts AND target.task_id = source.task_id AND target.idx = source.idx "
+        "WHEN MATCHED THEN "
+        "    UPDATE SET channel = source.channel, value = source.value "
+        "WHEN NOT MATCHED THEN "
+        "    INSERT (thread_id, thread_ts, task_id, idx, channel, value) "
+        "    VALUES (source.thread_id, source.thread_ts, source.task_id, source.idx, source.channel, source.value);"
+    )
+    UPSERT_CHANNEL_BLOB = (
+        "MERGE INTO channel_blobs_data AS target "
+        "USING (VALUES (?, ?, ?, ?)) AS source (thread_id, channel, version, value) "
+        "ON target.thread_id = source.thread_id AND target.channel = source.channel AND target.version = source.version "
+        "WHEN NOT MATCHED THEN "
+        "    INSERT (thread_id, channel, version, value) "
+        "    VALUES (source.thread_id, source.channel, source.version, source.value);"
+    )
+    SELECT_CHANNEL_BLOBS = "SELECT channel, version, value FROM channel_blobs_data WHERE thread_id = ? AND ({})"
+    INSERT_MESSAGE = "INSERT INTO messages_data (thread_id, idx, message_id, message_blob) VALUES (?, ?, ?, ?)"
+    SELECT_MESSAGE_IDS = "SELECT message_id FROM messages_data WHERE thread_id = ? ORDER BY idx"
+    SELECT_MESSAGES = "SELECT message_blob FROM messages_data WHERE thread_id = ? AND idx >= ? AND idx < ? ORDER BY idx"
+
+    # Key under which a delta checkpoint records where each channel value lives:
+    # ("blob", version, None) -> channel_blobs_data, ("messages", version, count) -> first `count` rows of messages_data.
+    DELTA_KEY = "__delta__"
 
     def __init__(
         self,
         conn_string: str,
         *,
         serde: Optional[SerializerProtocol] = None,
+        pool_size: int = 10,
+        pool_timeout: float = 30.0,
+        connect: Optional[Callable[[], Any]] = None,
+        fast_executemany: bool = True,
+        delta_checkpoints: bool = True,
     ) -> None:
         super().__init__(serde=serde)
         self.conn_string = (
@@ -52,15 +157,40 @@ class MSSQLSaver(BaseCheckpointSaver):
             f"PWD={os.getenv("SQL_PWD")};"
         )
         self.is_setup = False
-        self.lock = threading.Lock()
+        self.fast_executemany = fast_executemany
+        # Store only changed channel values per checkpoint and keep messages in an
+        # append-only table, instead of re-serializing the whole state on every put.
+        self.delta_checkpoints = delta_checkpoints
+        # thread_id -> (thread_ts, delta refs) of the last checkpoint this process wrote
+        self._last_refs: "OrderedDict[str, Tuple[str, Dict[str, Any]]]" = OrderedDict()
+        # thread_id -> deserialized prefix of the message log; rows are never rewritten, so reads only fetch the tail
+        self._message_cache: "OrderedDict[str, List[Any]]" = OrderedDict()
+        self.max_cached_threads = 10000
+        self._cache_lock = threading.Lock()
+        self.pool = ConnectionPool(
+            connect or self._connect_pyodbc,
+            max_size=pool_size,
+            timeout=pool_timeout,
+        )
+        # Writers to the same conversation thread are serialized; different threads write concurrently.
+        # Striped by thread_id, so the locks do not grow with every conversation served.
+        self._thread_locks = [threading.Lock() for _ in range(THREAD_LOCK_STRIPES)]
+
+    def _connect_pyodbc(self):
+        import pyodbc
+
+        return pyodbc.connect(self.conn_string)
 
     @contextmanager
     def connection(self):
-        conn = pyodbc.connect(self.conn_string)
-        try:
+        with self.pool.connection() as conn:
             yield conn
-        finally:
-            conn.close()
+
+    def thread_lock(self, thread_id: str) -> threading.Lock:
+        return self._thread_locks[hash(thread_id) % THREAD_LOCK_STRIPES]
+
+    def limit_query(self, query: str, limit: int) -> str:
+        return f"SELECT TOP {limit} " + query.lstrip()[7:]
 
     def setup(self) -> None:
         if self.is_setup:
@@ -68,31 +198,8 @@ class MSSQLSaver(BaseCheckpointSaver):
 
         with self.connection() as conn:
             cursor = conn.cursor()
-            cursor.execute("""
-                IF NOT EXISTS (SELECT * FROM sys.tables WHERE name = 'checkpoints_data')
-                CREATE TABLE checkpoints_data (
-                    thread_id NVARCHAR(255) NOT NULL,
-                    thread_ts NVARCHAR(255) NOT NULL,
-                    parent_ts NVARCHAR(255),
-                    checkpoint_blob VARBINARY(MAX),
-                    metadata VARBINARY(MAX),
-                    parsed_ts DATETIME2,
-                    created_ts DATETIME DEFAULT GETDATE(),
-                    PRIMARY KEY (thread_id, thread_ts)
-                )
-            """)
-            cursor.execute("""
-                IF NOT EXISTS (SELECT * FROM sys.tables WHERE name = 'writes_data')
-                CREATE TABLE writes_data (
-                    thread_id NVARCHAR(255) NOT NULL,
-                    thread_ts NVARCHAR(255) NOT NULL,
-                    task_id NVARCHAR(255) NOT NULL,
-                    idx INT NOT NULL,
-                    channel NVARCHAR(255) NOT NULL,
-                    value VARBINARY(MAX),
-                    PRIMARY KEY (thread_id, thread_ts, task_id, idx)
-                )
-            """)
+            for statement in self.SETUP_STATEMENTS:
+                cursor.execute(statement)
             conn.commit()
 
         self.is_setup = True
@@ -103,12 +210,12 @@ class MSSQLSaver(BaseCheckpointSaver):
             cursor = conn.cursor()
             if config["configurable"].get("thread_ts"):
                 cursor.execute(
-                    "SELECT thread_id, thread_ts, parent_ts, checkpoint_blob, metadata FROM checkpoints_data WHERE thread_id = ? AND thread_ts = ?",
+                    self.SELECT_CHECKPOINT,
                     (str(config["configurable"]["thread_id"]), str(config["configurable"]["thread_ts"]))
                 )
             else:
                 cursor.execute(
-                    "SELECT TOP 1 thread_id, thread_ts, parent_ts, checkpoint_blob, metadata FROM checkpoints_data WHERE thread_id = ? ORDER BY thread_ts DESC",
+                    self.SELECT_LATEST_CHECKPOINT,
                     (str(config["configurable"]["thread_id"]),)
                 )
             
@@ -122,7 +229,7 @@ class MSSQLSaver(BaseCheckpointSaver):
                         }
                     }
                 
-                checkpoint: Dict[str, Any] = self.serde.loads(value[3])
+                checkpoint: Dict[str, Any] = self.load_checkpoint(cursor, value[0], value[3])
                 metadata: Dict[str, Any] = self.serde.loads(value[4]) if value[4] is not None else {}
                 
                 parent_config = None
@@ -169,15 +276,17 @@ class MSSQLSaver(BaseCheckpointSaver):
         query += " ORDER BY thread_ts DESC"
 
         if limit:
-            query = f"SELECT TOP {limit} " + query[7:]
+            query = self.limit_query(query, limit)
 
         with self.connection() as conn:
             cursor = conn.cursor()
             cursor.execute(query, params)
-            for thread_id, thread_ts, parent_ts, checkpoint_blob, metadata in cursor:
+            # Delta checkpoints need follow-up queries, so drain the result set first.
+            rows = cursor.fetchall()
+            for thread_id, thread_ts, parent_ts, checkpoint_blob, metadata in rows:
                 yield CheckpointTuple(
                     {"configurable": {"thread_id": thread_id, "thread_ts": thread_ts}},
-                    self.serde.loads(checkpoint_blob),
+                    self.load_checkpoint(cursor, thread_id, checkpoint_blob),
                     self.serde.loads(metadata) if metadata is not None else {},
                     (
                         {
@@ -198,26 +307,21 @@ class MSSQLSaver(BaseCheckpointSaver):
         metadata: Dict[str, Any],
     ) -> RunnableConfig:
         self.setup()
-        with self.lock, self.connection() as conn:
+        thread_id = str(config["configurable"]["thread_id"])
+        parent_ts = config["configurable"].get("thread_ts")
+        with self.thread_lock(thread_id), self.connection() as conn:
             cursor = conn.cursor()
+            if self.delta_checkpoints:
+                stored = self.put_channel_values(cursor, thread_id, parent_ts, checkpoint)
+            else:
+                stored = checkpoint
             cursor.execute(
-                "MERGE INTO checkpoints_data AS target "
-                "USING (VALUES (?, ?, ?, ?, ?)) AS source (thread_id, thread_ts, parent_ts, checkpoint_blob, metadata) "
-                "ON target.thread_id = source.thread_id AND target.thread_ts = source.thread_ts "
-                "WHEN MATCHED THEN "
-                "    UPDATE SET parent_ts = source.parent_ts, checkpoint_blob = source.checkpoint_blob, metadata = source.metadata "
-                "WHEN NOT MATCHED THEN "
-                "    INSERT (thread_id, thread_ts, parent_ts, checkpoint_blob, metadata) "
-                "    VALUES (source.thread_id, source.thread_ts, source.parent_ts, source.checkpoint_blob, source.metadata);",
-                (
-                    str(config["configurable"]["thread_id"]),
-                    checkpoint["id"],
-                    config["configurable"].get("thread_ts"),
-                    self.serde.dumps(checkpoint),
-                    self.serde.dumps(metadata),
-                )
+                self.UPSERT_CHECKPOINT,
+                (thread_id, checkpoint["id"], parent_ts, self.serde.dumps(stored), self.serde.dumps(metadata)),
             )
             conn.commit()
+            if self.delta_checkpoints:
+                self._remember_refs(thread_id, checkpoint["id"], stored[self.DELTA_KEY])
         return {
             "configurable": {
                 "thread_id": config["configurable"]["thread_id"],
@@ -231,43 +335,176 @@ class MSSQLSaver(BaseCheckpointSaver):
         writes: Sequence[Tuple[str, Any]],
         task_id: str,
     ) -> None:
+        if not writes:
+            return
         self.setup()
-        with self.lock, self.connection() as conn:
+        thread_id = str(config["configurable"]["thread_id"])
+        thread_ts = str(config["configurable"]["thread_ts"])
+        rows = [
+            (thread_id, thread_ts, task_id, idx, channel, self.serde.dumps(value))
+            for idx, (channel, value) in enumerate(writes)
+        ]
+        with self.thread_lock(thread_id), self.connection() as conn:
             cursor = conn.cursor()
-            for idx, (channel, value) in enumerate(writes):
-                cursor.execute(
-                    "MERGE INTO writes_data AS target "
-                    "USING (VALUES (?, ?, ?, ?, ?, ?)) AS source (thread_id, thread_ts, task_id, idx, channel, value) "
-                    "ON target.thread_id = source.thread_id AND target.thread_ts = source.thread_ts AND target.task_id = source.task_id AND target.idx = source.idx "
-                    "WHEN MATCHED THEN "
-                    "    UPDATE SET channel = source.channel, value = source.value "
-                    "WHEN NOT MATCHED THEN "
-                    "    INSERT (thread_id, thread_ts, task_id, idx, channel, value) "
-                    "    VALUES (source.thread_id, source.thread_ts, source.task_id, source.idx, source.channel, source.value);",
-                    (
-                        str(config["configurable"]["thread_id"]),
-                        str(config["configurable"]["thread_ts"]),
-                        task_id,
-                        idx,
-                        channel,
-                        self.serde.dumps(value),
-                    )
-                )
+            if self.fast_executemany and hasattr(cursor, "fast_executemany"):
+                cursor.fast_executemany = True
+            cursor.executemany(self.UPSERT_WRITE, rows)
             conn.commit()
 
+    # Async variants for graph.astream; pyodbc is blocking, so they run on worker threads.
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        tuples = await asyncio.to_thread(lambda: [*self.list(config, filter=filter, before=before, limit=limit)])
+        for checkpoint_tuple in tuples:
+            yield checkpoint_tuple
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: Dict[str, Any],
+    ) -> RunnableConfig:
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata)
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+    ) -> None:
+        await asyncio.to_thread(self.put_writes, config, writes, task_id)
+
+    def put_channel_values(self, cursor, thread_id: str, parent_ts: Optional[str], checkpoint: Checkpoint) -> Dict[str, Any]:
+        """Write the channel values that changed since the parent and return the checkpoint to store in their place."""
+        parent_refs = self._parent_refs(cursor, thread_id, parent_ts)
+        versions = checkpoint.get("channel_versions", {})
+        inline: Dict[str, Any] = {}
+        refs: Dict[str, Any] = {}
+        blob_rows = []
+
+        for channel, value in checkpoint["channel_values"].items():
+            version = versions.get(channel)
+            if version is None:
+                inline[channel] = value
+                continue
+            parent_ref = parent_refs.get(channel)
+            if parent_ref is not None and parent_ref[1] == version:
+                refs[channel] = parent_ref
+                continue
+            if channel == "messages":
+                count = self.append_messages(cursor, thread_id, value)
+                if count is not None:
+                    refs[channel] = ("messages", version, count)
+                    continue
+            refs[channel] = ("blob", version, None)
+            blob_rows.append((thread_id, channel, str(version), self.serde.dumps(value)))
+
+        if blob_rows:
+            cursor.executemany(self.UPSERT_CHANNEL_BLOB, blob_rows)
+
+        return {**checkpoint, "channel_values": inline, self.DELTA_KEY: refs}
+
+    def append_messages(self, cursor, thread_id: str, messages: Any) -> Optional[int]:
+        """Append the unseen tail of `messages` to the thread's message log.
+
+        Returns the number of log rows that make up `messages`, or None when the
+        list is not an extension of the log (e.g. a forked or rewritten history),
+        in which case the caller stores the channel as a regular blob.
+        """
+        if not isinstance(messages, list) or not all(getattr(m, "id", None) for m in messages):
+            return None
+        # The whole logged prefix must match: a history rewritten before its last
+        # row (RemoveMessage) can still end in the same id at the same index
+        cursor.execute(self.SELECT_MESSAGE_IDS, (thread_id,))
+        logged_ids = [row[0] for row in cursor.fetchall()]
+        start = len(logged_ids)
+        if len(messages) < start or [message.id for message in messages[:start]] != logged_ids:
+            return None
+        rows = [
+            (thread_id, idx, message.id, self.serde.dumps(message))
+            for idx, message in enumerate(messages[start:], start=start)
+        ]
+        if rows:
+            cursor.executemany(self.INSERT_MESSAGE, rows)
+        return len(messages)
+
+    def load_checkpoint(self, cursor, thread_id: str, checkpoint_blob: bytes) -> Dict[str, Any]:
+        """Deserialize a stored checkpoint, rebuilding channel values for delta rows."""
+        checkpoint: Dict[str, Any] = self.serde.loads(checkpoint_blob)
+        refs = checkpoint.pop(self.DELTA_KEY, None)
+        if not refs:
+            return checkpoint
+
+        channel_values = dict(checkpoint.get("channel_values") or {})
+        blob_refs = {channel: ref[1] for channel, ref in refs.items() if ref[0] == "blob"}
+        if blob_refs:
+            clause = " OR ".join("(channel = ? AND version = ?)" for _ in blob_refs)
+            params = [thread_id]
+            for channel, version in blob_refs.items():
+                params.extend((channel, str(version)))
+            cursor.execute(self.SELECT_CHANNEL_BLOBS.format(clause), params)
+            for channel, version, value in cursor.fetchall():
+                if str(blob_refs.get(channel)) == version:
+                    channel_values[channel] = self.serde.loads(value)
+        for channel, ref in refs.items():
+            if ref[0] == "messages":
+                channel_values[channel] = self.load_messages(cursor, thread_id, ref[2])
+        checkpoint["channel_values"] = channel_values
+        return checkpoint
+
+    def load_messages(self, cursor, thread_id: str, count: int) -> List[Any]:
+        with self._cache_lock:
+            cached = self._message_cache.get(thread_id, [])
+        if len(cached) < count:
+            cursor.execute(self.SELECT_MESSAGES, (thread_id, len(cached), count))
+            cached = cached + [self.serde.loads(row[0]) for row in cursor.fetchall()]
+        with self._cache_lock:
+            if len(cached) >= len(self._message_cache.get(thread_id, [])):
+                self._message_cache[thread_id] = cached
+                self._message_cache.move_to_end(thread_id)
+            while len(self._message_cache) > self.max_cached_threads:
+                self._message_cache.popitem(last=False)
+        return cached[:count]
+
+    def _parent_refs(self, cursor, thread_id: str, parent_ts: Optional[str]) -> Dict[str, Any]:
+        if not parent_ts:
+            return {}
+        cached = self._last_refs.get(thread_id)
+        if cached is not None and cached[0] == parent_ts:
+            return cached[1]
+        cursor.execute(self.SELECT_CHECKPOINT, (thread_id, str(parent_ts)))
+        row = cursor.fetchone()
+        if row is None:
+            return {}
+        return self.serde.loads(row[3]).get(self.DELTA_KEY) or {}
+
+    def _remember_refs(self, thread_id: str, thread_ts: str, refs: Dict[str, Any]) -> None:
+        with self._cache_lock:
+            self._last_refs[thread_id] = (thread_ts, refs)
+            self._last_refs.move_to_end(thread_id)
+            while len(self._last_refs) > self.max_cached_threads:
+                self._last_refs.popitem(last=False)
+
     def get_next_version(self, current: Optional[str], channel: Any) -> str:
         if current is None:
             current_v = 0
         else:
             current_v = int(current.split(".")[0])
         next_v = current_v + 1
-        try:
-            next_h = md5(self.serde.dumps(channel.checkpoint())).hexdigest()
-        except EmptyChannelError:
-            next_h = ""
-        except AttributeError:
-            next_h = ""
-        return f"{next_v:032}.{next_h}"
+        # Versions only have to increase and differ between forks; nothing reads the
+        # suffix back, so a random one replaces the md5 of a full re-serialization
+        # of the channel. Older versions (md5 or empty suffix) compare the same way.
+        next_h = random.random()
+        return f"{next_v:032}.{next_h:016}"
     
     def get_conversation_history(self, thread_id: str) -> List[Dict[str, Any]]:
         with self.connection() as conn:
@@ -283,7 +520,7 @@ class MSSQLSaver(BaseCheckpointSaver):
             
             if row and row[0]:
                 serialized_data = row[0]
-                deserialized_data = self.serde.loads(serialized_data)
+                deserialized_data = self.load_checkpoint(cursor, thread_id, serialized_data)
                 return deserialized_data
                 
                 # Assuming the conversation history is stored in a specific format
@@ -308,13 +545,13 @@ class MSSQLSaver(BaseCheckpointSaver):
             
             if row and row[0]:
                 try:
-                    deserialized_data = self.serde.loads(row[0])
+                    deserialized_data = self.load_checkpoint(cursor, thread_id, row[0])
                     if isinstance(deserialized_data, dict):
                         return deserialized_data
                     else:
                         return {"checkpoint_data": deserialized_data}
                 except Exception as e:
-                    print(f"Error deserializing checkpoint data: {e}")
+                    logger.error("Error deserializing checkpoint data: %s", e)
                     return {}
             else:
                 return {}
@@ -323,6 +560,8 @@ class MSSQLSaver(BaseCheckpointSaver):
         with self.connection() as conn:
             cursor = conn.cursor()
             cursor.execute("DROP TABLE IF EXISTS checkpoints_data")
+            cursor.execute("IF OBJECT_ID('channel_blobs_data') IS NOT NULL DELETE FROM channel_blobs_data")
+            cursor.execute("IF OBJECT_ID('messages_data') IS NOT NULL DELETE FROM messages_data")
             cursor.execute("""
                 CREATE TABLE checkpoints_data (
                     thread_id NVARCHAR(255) NOT NULL,
@@ -334,8 +573,13 @@ class MSSQLSaver(BaseCheckpointSaver):
                 )
             """)
             conn.commit()
+            # Both point at rows that were just deleted; a delta checkpoint built
+            # on them would reference messages and blobs that no longer exist
+            with self._cache_lock:
+                self._last_refs.clear()
+                self._message_cache.clear()
         self.is_setup = True
-        print("checkpoints_data table has been recreated.")
+        logger.info("checkpoints_data table has been recreated.")
 
 
     def parse_and_print_conversation_history(self, deserialized_data: Dict[str, Any]) -> None:
@@ -0,0 +1,72 @@
+import base64
+import hashlib
+import hmac
+import logging
+import os
+import secrets
+import threading
+import time
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# Signed resume tokens. A client that reconnects (network blip, worker restart)
+# presents its token to continue the conversation's thread from the checkpointer
+# instead of starting over with a new greeting.
+#
+#   <thread_id>.<issued_at>.<signature>
+#
+# The signature is an HMAC-SHA256 of thread_id and issued_at under
+# RESUME_TOKEN_SECRET, or SECRET_KEY when that is not set. With neither, a random
+# key is drawn per process and tokens only work on the worker that issued them.
+# Tokens are good for RESUME_TOKEN_TTL_SECONDS (default 24 h); every resume
+# issues a fresh one.
+
+DEFAULT_TOKEN_TTL = 24 * 60 * 60
+
+
+class ResumeTokens:
+    def __init__(self, secret: bytes, ttl: int = DEFAULT_TOKEN_TTL):
+        self.secret = secret
+        self.ttl = ttl
+
+    def issue(self, thread_id: str, now: Optional[float] = None) -> str:
+        payload = f"{thread_id}.{int(now if now is not None else time.time())}"
+        return f"{payload}.{self._sign(payload)}"
+
+    def verify(self, token) -> Optional[str]:
+        """The token's thread_id, or None if it is malformed, forged or expired."""
+        if not isinstance(token, str):
+            return None
+        payload, _, signature = token.rpartition(".")
+        thread_id, _, issued_at = payload.rpartition(".")
+        if not thread_id or not issued_at.isdigit():
+            return None
+        if not hmac.compare_digest(signature, self._sign(payload)):
+            return None
+        if time.time() - int(issued_at) > self.ttl:
+            return None
+        return thread_id
+
+    def _sign(self, payload: str) -> str:
+        digest = hmac.new(self.secret, payload.encode(), hashlib.sha256).digest()
+        return base64.urlsafe_b64encode(digest).rstrip(b"=").decode()
+
+
+_resume_tokens: Optional[ResumeTokens] = None
+_resume_tokens_lock = threading.Lock()
+
+
+def get_resume_tokens() -> ResumeTokens:
+    """Process-wide token signer. Env: RESUME_TOKEN_SECRET, SECRET_KEY, RESUME_TOKEN_TTL_SECONDS."""
+    global _resume_tokens
+    if _resume_tokens is None:
+        with _resume_tokens_lock:
+            if _resume_tokens is None:
+                secret = os.getenv("RESUME_TOKEN_SECRET") or os.getenv("SECRET_KEY")
+                if not secret:
+                    logger.warning("Neither RESUME_TOKEN_SECRET nor SECRET_KEY is set; resume tokens only work on this worker")
+                    secret = secrets.token_hex(32)
+                ttl = int(os.getenv("RESUME_TOKEN_TTL_SECONDS", DEFAULT_TOKEN_TTL))
+                _resume_tokens = ResumeTokens(secret.encode(), ttl)
+    return _resume_tokens
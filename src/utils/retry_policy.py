@@ -0,0 +1,174 @@
+import asyncio
+import contextvars
+import logging
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import Runnable
+from src.utils.telemetry import EMPTY_RESPONSE_EVENTS
+
+logger = logging.getLogger(__name__)
+
+# What the Assistant does when the primary chain answers with neither content
+# nor tool calls. It re-asks (with a nudge appended to the prompt) up to
+# `max_attempts` times within `deadline` seconds, then tries the fallback chain
+# once if there is one, and finally answers with a canned message, so a
+# degenerate model state costs a bounded number of calls and seconds.
+# The deadline only bounds the re-asking: the first call is never cut off, so
+# a slow but real reply is not swapped for the canned message.
+# `stats` is mirrored in chat_empty_response_events{event} (src/utils/telemetry.py).
+
+RETRY_NUDGE = ("user", "Respond with a real output.")
+DEFAULT_CANNED_RESPONSE = "Sorry, I didn't quite catch that. Could you say that again?"
+
+OUTCOMES = ("first_attempt", "retried", "fallback", "canned")
+
+# run() waits for the fallback here so it can give up after fallback_timeout;
+# a call that overruns keeps its worker until it returns and is discarded.
+_fallback_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="empty_response_fallback")
+
+
+def is_empty_response(result) -> bool:
+    return not result.tool_calls and (
+        not result.content
+        or isinstance(result.content, list)
+        and not result.content[0].get("text")
+    )
+
+
+class RetryPolicy:
+    def __init__(
+        self,
+        *,
+        max_attempts: int = 3,
+        deadline: float = 20.0,
+        backoff_base: float = 0.2,
+        backoff_max: float = 1.0,
+        fallback: Optional[Runnable] = None,
+        fallback_timeout: float = 10.0,
+        canned_response: str = DEFAULT_CANNED_RESPONSE,
+    ):
+        self.max_attempts = max_attempts
+        self.deadline = deadline
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.fallback = fallback
+        self.fallback_timeout = fallback_timeout
+        self.canned_response = canned_response
+        self.stats: Dict[str, int] = {**{outcome: 0 for outcome in OUTCOMES}, "empty_responses": 0, "deadline_exceeded": 0, "fallback_failures": 0}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, fallback: Optional[Runnable] = None) -> "RetryPolicy":
+        """Settings from EMPTY_RESPONSE_MAX_ATTEMPTS, EMPTY_RESPONSE_DEADLINE,
+        EMPTY_RESPONSE_FALLBACK_TIMEOUT and EMPTY_RESPONSE_MESSAGE."""
+        return cls(
+            max_attempts=int(os.getenv("EMPTY_RESPONSE_MAX_ATTEMPTS", "3")),
+            deadline=float(os.getenv("EMPTY_RESPONSE_DEADLINE", "20")),
+            fallback=fallback,
+            fallback_timeout=float(os.getenv("EMPTY_RESPONSE_FALLBACK_TIMEOUT", "10")),
+            canned_response=os.getenv("EMPTY_RESPONSE_MESSAGE", DEFAULT_CANNED_RESPONSE),
+        )
+
+    def worst_case_seconds(self, call_seconds: float) -> float:
+        """Upper bound on run() when each call takes at most `call_seconds`: attempts
+        only start within the deadline, then at most one fallback call, cut off at
+        `fallback_timeout` in both paths. arun() also cuts retries off at the deadline."""
+        fallback = min(call_seconds, self.fallback_timeout) if self.fallback is not None else 0.0
+        return self.deadline + call_seconds + fallback
+
+    def _count(self, key: str) -> None:
+        with self._lock:
+            self.stats[key] += 1
+        EMPTY_RESPONSE_EVENTS.labels(key).inc()
+
+    def _nudged(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        return {**state, "messages": state["messages"] + [RETRY_NUDGE]}
+
+    def _next_delay(self, attempt: int, started: float) -> Optional[float]:
+        """Backoff before the next attempt, or None when the retries are used up."""
+        remaining = self.deadline - (time.monotonic() - started)
+        if attempt >= self.max_attempts:
+            return None
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** (attempt - 1)))
+        if delay >= remaining:
+            self._count("deadline_exceeded")
+            return None
+        return delay
+
+    def _done(self, result: AIMessage, attempt: int) -> AIMessage:
+        self._count("first_attempt" if attempt == 1 else "retried")
+        return result
+
+    def _canned(self) -> AIMessage:
+        logger.warning("Empty responses from the model, answering with the canned response. Stats: %s", self.stats)
+        self._count("canned")
+        return AIMessage(content=self.canned_response)
+
+    def run(self, invoke: Callable[[Dict[str, Any]], AIMessage], state: Dict[str, Any]) -> AIMessage:
+        started = time.monotonic()
+        attempt = 0
+        while True:
+            attempt += 1
+            result = invoke(state)
+            if not is_empty_response(result):
+                return self._done(result, attempt)
+            self._count("empty_responses")
+            delay = self._next_delay(attempt, started)
+            if delay is None:
+                break
+            time.sleep(delay)
+            state = self._nudged(state)
+
+        if self.fallback is not None:
+            # In the caller's context, so the call reports to this run's callbacks
+            future = _fallback_executor.submit(contextvars.copy_context().run, self.fallback.invoke, state)
+            try:
+                result = future.result(timeout=self.fallback_timeout)
+            except Exception as e:
+                logger.warning("Fallback model failed: %r", e)
+                result = None
+            if result is not None and not is_empty_response(result):
+                self._count("fallback")
+                return result
+            self._count("fallback_failures")
+        return self._canned()
+
+    async def arun(self, ainvoke: Callable[[Dict[str, Any]], Awaitable[AIMessage]], state: Dict[str, Any]) -> AIMessage:
+        started = time.monotonic()
+        attempt = 0
+        while True:
+            attempt += 1
+            if attempt == 1:
+                result = await ainvoke(state)
+            else:
+                try:
+                    result = await asyncio.wait_for(ainvoke(state), max(0.0, self.deadline - (time.monotonic() - started)))
+                except asyncio.TimeoutError:
+                    self._count("deadline_exceeded")
+                    break
+            if not is_empty_response(result):
+                return self._done(result, attempt)
+            self._count("empty_responses")
+            delay = self._next_delay(attempt, started)
+            if delay is None:
+                break
+            await asyncio.sleep(delay)
+            state = self._nudged(state)
+
+        if self.fallback is not None:
+            try:
+                result = await asyncio.wait_for(self.fallback.ainvoke(state), self.fallback_timeout)
+            except Exception as e:
+                logger.warning("Fallback model failed: %r", e)
+                result = None
+            if result is not None and not is_empty_response(result):
+                self._count("fallback")
+                return result
+            self._count("fallback_failures")
+        return self._canned()
@@ -0,0 +1,518 @@
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Callable, Dict, NamedTuple, Optional, Tuple
+
+from src.state import ConvoState, RequiredInformation
+from src.utils.telemetry import MEMORY_BYTES, MEMORY_ENTRIES, MEMORY_EVICTIONS, SESSION_HANDOFFS, SESSION_RESTORES, span
+from src.utils.convo_serde import serialize_convo_state, pack_message, unpack_message, pack_state_fields, unpack_state_fields
+
+logger = logging.getLogger(__name__)
+
+# Per-connection conversation state (ConvoState + graph config), keyed by the
+# Socket.IO sid. The in-process store pins a conversation to the worker that
+# created it; the Redis store lets any worker or node continue it, which is what
+# allows running more than one worker (together with SOCKETIO_MESSAGE_QUEUE so
+# emits reach clients connected elsewhere).
+
+DEFAULT_SESSION_TTL = 24 * 60 * 60
+
+# Estimated footprint of a live session: the ConvoState dict and config, plus per
+# message its text and tool call arguments and about 800 bytes for the object
+# itself (tracemalloc, langchain-core 0.2)
+SESSION_BASE_BYTES = 2048
+MESSAGE_OVERHEAD_BYTES = 800
+
+
+class SessionStore:
+    """Interface for session backends used by app.py and asgi_app.py."""
+
+    # Backends doing network I/O set this so the ASGI server runs them off the event loop
+    blocking = False
+
+    def create(self, session_id: str, state: ConvoState, config: Dict[str, Any]) -> None:
+        raise NotImplementedError
+
+    def load(self, session_id: str) -> Optional[Tuple[ConvoState, Dict[str, Any]]]:
+        raise NotImplementedError
+
+    def save(self, session_id: str, state: ConvoState) -> None:
+        raise NotImplementedError
+
+    def delete(self, session_id: str) -> bool:
+        raise NotImplementedError
+
+    def dump(self, session_id: str) -> Optional[str]:
+        """Full JSON of the session, for eviction or persistence outside the store."""
+        raise NotImplementedError
+
+    def __contains__(self, session_id: str) -> bool:
+        return self.load(session_id) is not None
+
+    async def _run(self, fn, *args):
+        if self.blocking:
+            return await asyncio.to_thread(fn, *args)
+        return fn(*args)
+
+    async def acreate(self, session_id: str, state: ConvoState, config: Dict[str, Any]) -> None:
+        return await self._run(self.create, session_id, state, config)
+
+    async def aload(self, session_id: str) -> Optional[Tuple[ConvoState, Dict[str, Any]]]:
+        return await self._run(self.load, session_id)
+
+    async def asave(self, session_id: str, state: ConvoState) -> None:
+        return await self._run(self.save, session_id, state)
+
+    async def adelete(self, session_id: str) -> bool:
+        return await self._run(self.delete, session_id)
+
+
+class InMemorySessionStore(SessionStore):
+    """Live ConvoState objects in a dict of this process; lost on restart, invisible to other workers.
+
+    Nothing is serialized per turn: `load` hands out a shallow copy (its own dict
+    and message list, the messages themselves are shared) and `save` re-binds it,
+    so a turn that fails before `save` leaves no trace, as with the Redis store.
+    `dump` materializes JSON when a session has to leave the process.
+
+    Sessions are evicted, least recently used first, once there are more than
+    `max_sessions`, their estimated size passes `max_bytes`, or they have been
+    idle for `idle_seconds` (None: no limit). An evicted session keeps only its
+    config; on its next load `restore(config)` rebuilds the state, normally from
+    the thread's checkpoint (checkpoint_restorer), which every turn has already
+    written, so eviction itself writes nothing. Without `restore` an evicted
+    session is gone.
+
+    A checkpointer that drops threads of its own (BoundedMemorySaver) is asked,
+    through `restore.retain`, to keep the thread while its session is evicted
+    (writing the session's state back if it already dropped the thread), and
+    `restore.release` lets it go again. The limits always hold: a session that
+    cannot be handed off is evicted all the same and counted as lost.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_sessions: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        idle_seconds: Optional[float] = None,
+        restore: Optional[Callable[[Dict[str, Any]], Optional[ConvoState]]] = None,
+        max_evicted: int = 100000,
+    ):
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self.idle_seconds = idle_seconds
+        self.restore = restore
+        self.max_evicted = max_evicted
+        # sid -> {'state', 'config', 'used', 'count', 'bytes'}, least recently used first
+        self._sessions: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        # sid -> config of evicted sessions
+        self._evicted: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.bytes = 0
+        self._lock = threading.RLock()
+
+    def create(self, session_id, state, config):
+        with self._lock:
+            self._unevict(session_id)
+            self._put(session_id, {'state': state, 'config': config})
+            self._evict(session_id)
+
+    def load(self, session_id):
+        with self._lock:
+            record = self._sessions.get(session_id)
+            if record is not None:
+                record['used'] = time.monotonic()
+                self._sessions.move_to_end(session_id)
+                return _copy_state(record['state']), record['config']
+            config = self._evicted.get(session_id)
+        if config is None or self.restore is None:
+            return None
+
+        # Outside the lock: the checkpointer may be a database
+        state = self.restore(config)
+        with self._lock:
+            if self._unevict(session_id) is None:
+                # Deleted, or restored by a concurrent load
+                record = self._sessions.get(session_id)
+                return (_copy_state(record['state']), record['config']) if record is not None else None
+            SESSION_RESTORES.labels("restored" if state is not None else "missing").inc()
+            if state is None:
+                return None
+            self._put(session_id, {'state': state, 'config': config})
+            self._evict(session_id)
+        return _copy_state(state), config
+
+    def save(self, session_id, state):
+        with self._lock:
+            record = self._sessions.get(session_id)
+            if record is None:
+                # Evicted while its turn ran: it is the most recent session again
+                config = self._unevict(session_id)
+                if config is None:
+                    return
+                record = {'config': config}
+            record['state'] = state
+            self._put(session_id, record)
+            self._evict(session_id)
+
+    def delete(self, session_id):
+        with self._lock:
+            record = self._sessions.pop(session_id, None)
+            evicted = self._unevict(session_id)
+            if record is not None:
+                self.bytes -= record['bytes']
+                self._report()
+            return record is not None or evicted is not None
+
+    def dump(self, session_id) -> Optional[str]:
+        session = self.load(session_id)
+        if session is None:
+            return None
+        return serialize_convo_state(session[0])
+
+    async def aload(self, session_id):
+        if session_id in self._evicted and self.restore is not None:
+            return await asyncio.to_thread(self.load, session_id)
+        return self.load(session_id)
+
+    def __contains__(self, session_id):
+        return session_id in self._sessions or (self.restore is not None and session_id in self._evicted)
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def _put(self, session_id: str, record: Dict[str, Any]) -> None:
+        record['used'] = time.monotonic()
+        self._sessions[session_id] = record
+        self._sessions.move_to_end(session_id)
+        # Messages are only appended between saves; measure the new ones
+        messages = record['state']['messages']
+        count = record.get('count', 0)
+        if count > len(messages):
+            count = 0
+        size = (record['bytes'] if count else SESSION_BASE_BYTES) + sum(_approx_message_bytes(msg) for msg in messages[count:])
+        self.bytes += size - record.get('bytes', 0)
+        record['count'], record['bytes'] = len(messages), size
+
+    def _evict(self, current: str) -> None:
+        now = time.monotonic()
+        while len(self._sessions) > 1:
+            session_id, record = next(iter(self._sessions.items()))
+            if session_id == current:
+                break
+            if self.idle_seconds is not None and now - record['used'] > self.idle_seconds:
+                reason = "idle"
+            elif self.max_sessions is not None and len(self._sessions) > self.max_sessions:
+                reason = "count"
+            elif self.max_bytes is not None and self.bytes > self.max_bytes:
+                reason = "bytes"
+            else:
+                break
+            del self._sessions[session_id]
+            self.bytes -= record['bytes']
+            if self._retain(record):
+                self._evicted[session_id] = record['config']
+                while len(self._evicted) > self.max_evicted:
+                    self._release(self._evicted.popitem(last=False)[1])
+            else:
+                logger.warning("Evicted session %s has no checkpoint left to restore it from", session_id)
+            MEMORY_EVICTIONS.labels("sessions", reason).inc()
+        self._report()
+
+    def _unevict(self, session_id: str) -> Optional[Dict[str, Any]]:
+        config = self._evicted.pop(session_id, None)
+        if config is not None:
+            self._release(config)
+        return config
+
+    def _retain(self, record: Dict[str, Any]) -> bool:
+        retain = getattr(self.restore, 'retain', None)
+        return retain is None or retain(record['config'], record['state'])
+
+    def _release(self, config: Dict[str, Any]) -> None:
+        release = getattr(self.restore, 'release', None)
+        if release is not None:
+            release(config)
+
+    def _report(self) -> None:
+        MEMORY_BYTES.labels("sessions").set(self.bytes)
+        MEMORY_ENTRIES.labels("sessions").set(len(self._sessions))
+
+
+def _copy_state(state: ConvoState) -> ConvoState:
+    # Turns append to the message list and re-bind keys, never mutate messages
+    return {**state, 'messages': list(state['messages'])}
+
+
+def _approx_message_bytes(msg) -> int:
+    content = msg.content if isinstance(msg.content, str) else str(msg.content)
+    size = MESSAGE_OVERHEAD_BYTES + len(content)
+    for tool_call in getattr(msg, 'tool_calls', None) or ():
+        size += len(str(tool_call.get('args')))
+    return size
+
+
+class _CheckpointRestorer:
+    def __init__(self, graph):
+        self.graph = graph
+
+    def __call__(self, config: Dict[str, Any]) -> Optional[ConvoState]:
+        values = self.graph.get_state(config).values
+        if not values or not values.get('messages'):
+            return None
+        state = ConvoState(
+            user_input="",
+            messages=[],
+            required_information=RequiredInformation(),
+            contact_permission=None,
+            credit_pull_permission=None,
+            credit_pull_complete=None,
+            lead_create_complete=None,
+            savings_estimate=None,
+            reason_for_decline=None
+        )
+        state.update(values)
+        return state
+
+    def retain(self, config: Dict[str, Any], state: ConvoState) -> bool:
+        pin = getattr(self.graph.checkpointer, 'pin', None)
+        if pin is None:
+            return True
+        thread_id = config['configurable']['thread_id']
+        if pin(thread_id):
+            SESSION_HANDOFFS.labels("held").inc()
+            return True
+        # Dropped while the session was live: write its state back, as seed_checkpoint does
+        try:
+            self.graph.update_state(config, dict(state), as_node="assistant")
+        except Exception:
+            logger.exception("Could not write session state back to thread %s", thread_id)
+        retained = pin(thread_id)
+        SESSION_HANDOFFS.labels("rewritten" if retained else "lost").inc()
+        return retained
+
+    def release(self, config: Dict[str, Any]) -> None:
+        unpin = getattr(self.graph.checkpointer, 'unpin', None)
+        if unpin is not None:
+            unpin(config['configurable']['thread_id'])
+
+
+def checkpoint_restorer(graph) -> Callable[[Dict[str, Any]], Optional[ConvoState]]:
+    """`restore` for InMemorySessionStore: the state of the thread's latest checkpoint.
+
+    Also pins the thread of an evicted session in checkpointers that drop
+    threads (BoundedMemorySaver.pin), writing it back first if it was already
+    dropped; durable ones keep every thread anyway.
+    """
+    return _CheckpointRestorer(graph)
+
+
+class _CachedSession(NamedTuple):
+    version: int
+    epoch: int
+    count: int
+    state: ConvoState
+    config: Dict[str, Any]
+
+
+class RedisSessionStore(SessionStore):
+    """Sessions in Redis, expiring after `ttl` idle seconds.
+
+    Per sid there is a hash (config, msgpack of the non-message fields, message
+    count, version) and an append-only list with one msgpack entry per message.
+    `save` pushes only the messages added since the last save; a history that
+    was rewritten (shorter, or a different last message) bumps `epoch` and is
+    written out again.
+
+    Each worker also keeps the state it last loaded or saved. If the hash
+    version still matches, `load` returns a shallow copy of it without decoding
+    anything (so, as with InMemorySessionStore, a turn that fails before `save`
+    leaves no trace); after another worker appended, only the new tail of the
+    list is fetched.
+
+    Works with anything speaking the Redis protocol; pass a `fakeredis.FakeRedis`
+    client to run without a server.
+    """
+
+    blocking = True
+
+    def __init__(
+        self,
+        client,
+        *,
+        prefix: str = "claire:session:",
+        ttl: Optional[int] = DEFAULT_SESSION_TTL,
+        max_cached_sessions: int = 10000,
+    ):
+        self.client = client
+        self.prefix = prefix
+        self.ttl = ttl
+        self.max_cached_sessions = max_cached_sessions
+        self._cache: "OrderedDict[str, _CachedSession]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+
+    @classmethod
+    def from_url(cls, url: str, **kwargs) -> "RedisSessionStore":
+        import redis
+
+        return cls(redis.Redis.from_url(url), **kwargs)
+
+    def _key(self, session_id: str) -> str:
+        return self.prefix + session_id
+
+    def _messages_key(self, session_id: str) -> str:
+        return self.prefix + session_id + ":messages"
+
+    def _remember(self, session_id: str, entry: _CachedSession) -> None:
+        with self._cache_lock:
+            self._cache[session_id] = entry
+            self._cache.move_to_end(session_id)
+            while len(self._cache) > self.max_cached_sessions:
+                self._cache.popitem(last=False)
+
+    def _forget(self, session_id: str) -> None:
+        with self._cache_lock:
+            self._cache.pop(session_id, None)
+
+    def _expire(self, pipe, session_id: str) -> None:
+        if self.ttl:
+            pipe.expire(self._key(session_id), self.ttl)
+            pipe.expire(self._messages_key(session_id), self.ttl)
+
+    def create(self, session_id, state, config):
+        key, messages_key = self._key(session_id), self._messages_key(session_id)
+        messages = _ensure_ids(state['messages'])
+        with span("serde", "session_dumps"):
+            packed = [pack_message(msg) for msg in messages]
+            fields = pack_state_fields(state)
+        pipe = self.client.pipeline()
+        pipe.delete(key, messages_key)
+        if packed:
+            pipe.rpush(messages_key, *packed)
+        pipe.hset(key, mapping={
+            'config': json.dumps(config),
+            'fields': fields,
+            'count': len(messages),
+            'last_id': _message_id(messages),
+            'epoch': 0,
+            'version': 1,
+        })
+        self._expire(pipe, session_id)
+        pipe.execute()
+        self._remember(session_id, _CachedSession(1, 0, len(messages), _copy_state(state), config))
+
+    def load(self, session_id):
+        key = self._key(session_id)
+        cached = self._cache.get(session_id)
+        version = self.client.hget(key, 'version')
+        if version is None:
+            self._forget(session_id)
+            return None
+        if cached is not None and cached.version == int(version):
+            return _copy_state(cached.state), cached.config
+
+        config_json, fields, count, epoch = self.client.hmget(key, 'config', 'fields', 'count', 'epoch')
+        if config_json is None or fields is None:
+            return None
+        count, epoch = int(count), int(epoch)
+        if cached is not None and cached.epoch == epoch and cached.count <= count:
+            # Same history prefix: decode only what other workers appended
+            prefix = cached.state['messages'][:cached.count]
+            packed = self.client.lrange(self._messages_key(session_id), cached.count, count - 1)
+        else:
+            prefix = []
+            packed = self.client.lrange(self._messages_key(session_id), 0, count - 1)
+        with span("serde", "session_loads"):
+            messages = prefix + [unpack_message(data) for data in packed]
+            state = unpack_state_fields(fields, messages)
+        config = json.loads(config_json)
+        self._remember(session_id, _CachedSession(int(version), epoch, count, state, config))
+        return _copy_state(state), config
+
+    def save(self, session_id, state):
+        key, messages_key = self._key(session_id), self._messages_key(session_id)
+        count, last_id, epoch, config_json = self.client.hmget(key, 'count', 'last_id', 'epoch', 'config')
+        # Don't resurrect a session that was deleted (disconnect) while its turn was running
+        if count is None or config_json is None:
+            self._forget(session_id)
+            return
+        count, epoch = int(count), int(epoch)
+        last_id = last_id.decode() if isinstance(last_id, bytes) else last_id
+        messages = _ensure_ids(state['messages'])
+
+        pipe = self.client.pipeline()
+        if count <= len(messages) and _message_id(messages[:count]) == last_id:
+            new_messages = messages[count:]
+        else:
+            epoch += 1
+            new_messages = messages
+            pipe.delete(messages_key)
+        with span("serde", "session_dumps"):
+            packed = [pack_message(msg) for msg in new_messages]
+            fields = pack_state_fields(state)
+        if packed:
+            pipe.rpush(messages_key, *packed)
+        pipe.hset(key, mapping={
+            'fields': fields,
+            'count': len(messages),
+            'last_id': _message_id(messages),
+            'epoch': epoch,
+        })
+        version_index = len(pipe)
+        pipe.hincrby(key, 'version', 1)
+        self._expire(pipe, session_id)
+        version = pipe.execute()[version_index]
+        self._remember(session_id, _CachedSession(int(version), epoch, len(messages), _copy_state(state), json.loads(config_json)))
+
+    def delete(self, session_id):
+        self._forget(session_id)
+        return bool(self.client.delete(self._key(session_id), self._messages_key(session_id)))
+
+    def dump(self, session_id) -> Optional[str]:
+        session = self.load(session_id)
+        if session is None:
+            return None
+        return serialize_convo_state(session[0])
+
+    def __contains__(self, session_id):
+        return bool(self.client.exists(self._key(session_id)))
+
+
+def _ensure_ids(messages):
+    # Same as add_messages does on a message's first pass through the graph, so
+    # the id recorded here is the one the message keeps
+    for msg in messages:
+        if msg.id is None:
+            msg.id = str(uuid.uuid4())
+    return messages
+
+
+def _message_id(messages) -> str:
+    return messages[-1].id if messages else ""
+
+
+def create_session_store(restore: Optional[Callable[[Dict[str, Any]], Optional[ConvoState]]] = None) -> SessionStore:
+    """Pick the backend from SESSION_STORE (memory | redis), REDIS_URL and SESSION_TTL_SECONDS.
+
+    The memory store is bounded by SESSION_MAX_COUNT (default 5000),
+    SESSION_MAX_BYTES (default 256 MiB) and SESSION_IDLE_SECONDS (default 1800);
+    0 turns a limit off. `restore` brings evicted sessions back (checkpoint_restorer).
+    """
+    backend = os.getenv("SESSION_STORE", "memory").lower()
+    if backend == "memory":
+        return InMemorySessionStore(
+            max_sessions=int(os.getenv("SESSION_MAX_COUNT", "5000")) or None,
+            max_bytes=int(os.getenv("SESSION_MAX_BYTES", str(256 * 1024 * 1024))) or None,
+            idle_seconds=float(os.getenv("SESSION_IDLE_SECONDS", "1800")) or None,
+            restore=restore,
+        )
+    if backend == "redis":
+        url = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+        ttl = int(os.getenv("SESSION_TTL_SECONDS", DEFAULT_SESSION_TTL))
+        return RedisSessionStore.from_url(url, ttl=ttl)
+    raise ValueError(f"Unknown SESSION_STORE: {backend!r} (expected 'memory' or 'redis')")
@@ -0,0 +1,210 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Tuple
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from prometheus_client import REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, CONTENT_TYPE_LATEST
+
+# Prometheus metrics for the chat turn, served on /metrics (app.py).
+#
+# chat_span_seconds{kind, name} times the parts of a turn:
+#   node   assistant | funnel | tools | update_convo_state
+#   llm    primary | extractor
+#   tool   the tool name
+#   http   the carbon API path, per attempt
+#   serde  checkpoint_dumps | checkpoint_loads | session_dumps | session_loads
+# Nodes, LLM and tool spans come from TurnTelemetry, a callback handler passed
+# to the graph run; HTTP and serde spans are timed where they happen.
+#
+# chat_memory_bytes / chat_memory_entries{store} are what the worker holds for
+# conversations: "sessions" (InMemorySessionStore, estimated) and "checkpoints"
+# (BoundedMemorySaver); chat_memory_evictions{store, reason} what they let go
+# (reason "pinned": the thread of an evicted session, which is then lost).
+# chat_session_handoffs{outcome} counts sessions the store evicted to the
+# memory checkpointer: "held" (it still had the thread), "rewritten" (it had
+# dropped it and the session's state was written back) or "lost".
+#
+# chat_connect_seconds{kind} times a Socket.IO connect until the session is
+# ready: "new" (greeting and seeded checkpoint) or "resume" (a resume token's
+# thread restored from the checkpointer and the missed replies replayed).
+#
+# chat_empty_response_events{event} counts the Assistant's RetryPolicy outcomes
+# (first_attempt | retried | fallback | canned) and the events behind them
+# (empty_responses | deadline_exceeded | fallback_failures).
+#
+# With several gunicorn workers set PROMETHEUS_MULTIPROC_DIR (an empty directory)
+# for every process, so /metrics aggregates all workers (see gunicorn.conf.py).
+
+SPAN_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+TURN_BUCKETS = (0.1, 0.25, 0.5, 1, 1.5, 2, 3, 5, 8, 13, 20, 30, 60)
+TOKEN_BUCKETS = (100, 250, 500, 1000, 2000, 4000, 8000, 16000, 32000)
+
+SPAN_SECONDS = Histogram("chat_span_seconds", "Duration of graph nodes, model and tool calls, HTTP attempts and (de)serialization", ["kind", "name"], buckets=SPAN_BUCKETS)
+TURN_SECONDS = Histogram("chat_turn_seconds", "Time from a user message or permission answer to the end of the graph run", buckets=TURN_BUCKETS)
+FIRST_TOKEN_SECONDS = Histogram("chat_first_token_seconds", "Time from a user message to the first streamed token of the reply", buckets=TURN_BUCKETS)
+LLM_TOKENS = Counter("chat_llm_tokens", "Model tokens from usage_metadata", ["role", "type"])
+PROMPT_TOKENS = Histogram("chat_llm_prompt_tokens", "Prompt tokens per model call", ["role"], buckets=TOKEN_BUCKETS)
+LLM_ERRORS = Counter("chat_llm_errors", "Model calls that raised", ["role"])
+MEMORY_BYTES = Gauge("chat_memory_bytes", "Bytes of conversation state held in the worker", ["store"], multiprocess_mode="livesum")
+MEMORY_ENTRIES = Gauge("chat_memory_entries", "Sessions or checkpoint threads held in the worker", ["store"], multiprocess_mode="livesum")
+MEMORY_EVICTIONS = Counter("chat_memory_evictions", "Sessions or checkpoint threads dropped from memory", ["store", "reason"])
+CONNECT_SECONDS = Histogram("chat_connect_seconds", "Time from a Socket.IO connect to a ready session, new or resumed", ["kind"], buckets=SPAN_BUCKETS)
+EMPTY_RESPONSE_EVENTS = Counter("chat_empty_response_events", "Assistant reply outcomes and empty-response retries (src/utils/retry_policy.py)", ["event"])
+SESSION_HANDOFFS = Counter("chat_session_handoffs", "Sessions evicted to the memory checkpointer, by whether it still held their thread", ["outcome"])
+SESSION_RESTORES = Counter("chat_session_restores", "Loads of evicted sessions, by whether the checkpointer still had them", ["outcome"])
+
+
+@contextmanager
+def span(kind: str, name: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        SPAN_SECONDS.labels(kind, name).observe(time.perf_counter() - start)
+
+
+class TimedSerde:
+    """Wraps a checkpoint serde so every dumps/loads is a serde span."""
+
+    def __init__(self, serde, name: str):
+        self.serde = serde
+        self._dumps = SPAN_SECONDS.labels("serde", f"{name}_dumps")
+        self._loads = SPAN_SECONDS.labels("serde", f"{name}_loads")
+
+    def dumps(self, obj: Any) -> bytes:
+        start = time.perf_counter()
+        data = self.serde.dumps(obj)
+        self._dumps.observe(time.perf_counter() - start)
+        return data
+
+    def loads(self, data: bytes) -> Any:
+        start = time.perf_counter()
+        obj = self.serde.loads(data)
+        self._loads.observe(time.perf_counter() - start)
+        return obj
+
+
+class TurnTelemetry(BaseCallbackHandler):
+    """Spans of one graph run: nodes, model calls (primary vs extractor) and tools.
+
+    Pass it with `telemetry.config(config)`. Besides feeding the histograms it
+    keeps the turn's own spans, so TurnProcessor can print where the time went.
+    """
+
+    # Cheap enough to run on the event loop rather than in an executor
+    run_inline = True
+
+    def __init__(self, extractor_tag: str = "extractor"):
+        self.extractor_tag = extractor_tag
+        self.spans: List[Tuple[str, str, float]] = []
+        self.tokens: Dict[str, int] = {}
+        # run_id -> (kind, name, start)
+        self._open: Dict[UUID, Tuple[str, str, float]] = {}
+        self._lock = threading.Lock()
+
+    def config(self, config: Dict[str, Any]) -> Dict[str, Any]:
+        return {**config, "callbacks": [*(config.get("callbacks") or []), self]}
+
+    def _start(self, run_id: UUID, kind: str, name: str) -> None:
+        with self._lock:
+            self._open[run_id] = (kind, name, time.perf_counter())
+
+    def _end(self, run_id: UUID) -> Optional[Tuple[str, str]]:
+        with self._lock:
+            opened = self._open.pop(run_id, None)
+            if opened is None:
+                return None
+            kind, name, start = opened
+            seconds = time.perf_counter() - start
+            self.spans.append((kind, name, seconds))
+        SPAN_SECONDS.labels(kind, name).observe(seconds)
+        return kind, name
+
+    # Graph nodes. Inside a node run, nested runs carry the same langgraph_node
+    # metadata, and some share the node's name (RunnableLambda("assistant"), ToolNode "tools").
+    def on_chain_start(self, serialized, inputs, *, run_id, parent_run_id=None, tags=None, metadata=None, **kwargs):
+        node = (metadata or {}).get("langgraph_node")
+        # __start__ only writes the input into the channels
+        if node is None or node.startswith("__") or kwargs.get("name") != node:
+            return
+        with self._lock:
+            parent = self._open.get(parent_run_id)
+        if parent is not None and parent[:2] == ("node", node):
+            return
+        self._start(run_id, "node", node)
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        self._end(run_id)
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        self._end(run_id)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, tags=None, **kwargs):
+        self._start(run_id, "llm", "extractor" if self.extractor_tag in (tags or []) else "primary")
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        ended = self._end(run_id)
+        if ended is None:
+            return
+        role = ended[1]
+        usage = _usage(response)
+        if usage:
+            prompt, completion = usage
+            LLM_TOKENS.labels(role, "prompt").inc(prompt)
+            LLM_TOKENS.labels(role, "completion").inc(completion)
+            PROMPT_TOKENS.labels(role).observe(prompt)
+            with self._lock:
+                self.tokens[f"{role}_prompt"] = self.tokens.get(f"{role}_prompt", 0) + prompt
+                self.tokens[f"{role}_completion"] = self.tokens.get(f"{role}_completion", 0) + completion
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        ended = self._end(run_id)
+        if ended is not None:
+            LLM_ERRORS.labels(ended[1]).inc()
+
+    def on_tool_start(self, serialized, input_str, *, run_id, **kwargs):
+        self._start(run_id, "tool", kwargs.get("name") or (serialized or {}).get("name", "tool"))
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        self._end(run_id)
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        self._end(run_id)
+
+    def observe_turn(self, timings: Dict[str, float]) -> None:
+        TURN_SECONDS.observe(timings["total"])
+        if "ttft" in timings:
+            FIRST_TOKEN_SECONDS.observe(timings["ttft"])
+
+    def summary(self) -> Dict[str, float]:
+        """Seconds per kind:name over the turn, slowest first."""
+        totals: Dict[str, float] = {}
+        with self._lock:
+            for kind, name, seconds in self.spans:
+                key = f"{kind}:{name}"
+                totals[key] = totals.get(key, 0.0) + seconds
+        return {key: round(seconds, 3) for key, seconds in sorted(totals.items(), key=lambda item: -item[1])}
+
+
+def _usage(response) -> Optional[Tuple[int, int]]:
+    for generations in response.generations:
+        for generation in generations:
+            usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+            if usage:
+                return usage.get("input_tokens", 0), usage.get("output_tokens", 0)
+    token_usage = (response.llm_output or {}).get("token_usage") or {}
+    if token_usage:
+        return token_usage.get("prompt_tokens", 0), token_usage.get("completion_tokens", 0)
+    return None
+
+
+def render_metrics() -> Tuple[bytes, str]:
+    registry = REGISTRY
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -0,0 +1,180 @@
+import logging
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage
+from src.agents.assistant import track_timings
+from src.utils.handle_convo import get_permission_question, PERMISSION_TOOLS
+from src.utils.info_collector import EXTRACTOR_TAG
+from src.utils.misc import _print_event
+from src.utils.log import sample_turn
+from src.utils.telemetry import TurnTelemetry
+
+logger = logging.getLogger(__name__)
+
+# The state key each permission question sets once answered
+PERMISSION_STATE_KEYS = {"AskContactPermissionTool": "contact_permission", "AskCreditPullPermissionTool": "credit_pull_permission"}
+
+STATE_KEYS = ['required_information', 'contact_permission', 'credit_pull_permission', 'credit_pull_complete', 'lead_create_complete', 'savings_estimate', 'reason_for_decline']
+
+class TurnProcessor:
+    """Turns the graph's "values" events for one user turn into Socket.IO emits.
+
+    Shared by the eventlet (app.py) and ASGI (asgi_app.py) servers, which only
+    differ in how they iterate the graph stream and send the emits. Run the
+    graph with `turn.config(config)` so the turn's spans are recorded.
+    """
+
+    def __init__(self, state, printed: set):
+        self.state = state
+        self.printed = printed
+        self.telemetry = TurnTelemetry(EXTRACTOR_TAG)
+        # Nodes run in copies of this context, so the whole turn is logged or none of it
+        sample_turn()
+        # The assistant's primary/extraction stage timings of this turn
+        self.assistant_timings = track_timings()
+        self.message = None
+        self.done = False
+        self.started_at = time.perf_counter()
+        self.first_token_at: Optional[float] = None
+        self.timings: Dict[str, float] = {}
+
+    def config(self, config: Dict[str, Any]) -> Dict[str, Any]:
+        return self.telemetry.config(config)
+
+    def feed_token(self, chunk: AIMessageChunk) -> List[Tuple[str, Dict[str, Any]]]:
+        """Incremental text of the assistant's reply as `bot_response_delta` emits.
+
+        Tool-call argument chunks carry no text for the user and are dropped. The
+        whole message still arrives as `bot_response` from `feed`, which the client
+        uses to finalize the streamed bubble.
+        """
+        if self.done or chunk.tool_call_chunks:
+            return []
+        delta = _chunk_text(chunk.content)
+        if not delta:
+            return []
+        if self.first_token_at is None:
+            self.first_token_at = time.perf_counter()
+        return [('bot_response_delta', {'id': chunk.id, 'delta': delta})]
+
+    def feed(self, event: Dict[str, Any]) -> List[Tuple[str, Dict[str, Any]]]:
+        emits = []
+        message = event.get("messages")
+        if message:
+            if isinstance(message, list):
+                message = message[-1]
+            self.message = message
+            if message.id not in self.printed:
+                if isinstance(message, AIMessage):
+                    if len(message.content.strip()) > 0:
+                        emits.append(('bot_response', {'message': message.content, 'id': message.id}))
+                    if message.tool_calls:
+                        for tool_call in message.tool_calls:
+                            tool_name = tool_call["name"]
+                            tool_call_id = tool_call["id"]
+                            if tool_name in PERMISSION_TOOLS:
+                                question = get_permission_question(tool_name)
+                                self.state['messages'].append(message)
+                                _print_event(event, self.printed)
+                                emits.append(('user_input_required', {
+                                    'tool_name': tool_name,
+                                    'tool_call_id': tool_call_id,
+                                    'message': question,
+                                    'id': message.id
+                                }))
+                                self.done = True
+                                return emits
+
+        _print_event(event, self.printed)
+
+        # Update the state with any new information from the event
+        for key in STATE_KEYS:
+            if key in event:
+                self.state[key] = event[key]
+        return emits
+
+    def finish(self):
+        if not self.done and self.message is not None:
+            self.state['messages'].append(self.message)
+        self.timings = {"total": time.perf_counter() - self.started_at}
+        if self.first_token_at is not None:
+            self.timings["ttft"] = self.first_token_at - self.started_at
+        self.telemetry.observe_turn(self.timings)
+        if logger.isEnabledFor(logging.INFO):
+            timings = {k: round(v, 3) for k, v in self.timings.items()}
+            spans = self.telemetry.summary()
+            assistant = {k: round(v, 3) for k, v in self.assistant_timings.items()}
+            logger.info("Turn timings (s): %s assistant: %s spans: %s", timings, assistant, spans,
+                        extra={"timings": timings, "assistant": assistant, "spans": spans, "tokens": self.telemetry.tokens})
+        return self.state
+
+
+def save_question(graph, config, turn: TurnProcessor) -> None:
+    """Checkpoint the permission question `turn` stopped at.
+
+    The servers stop reading the graph's stream at the question, and the graph
+    only saves a step's checkpoint after yielding its values, so otherwise the
+    thread's checkpoint ends before the question and a resumed or restored
+    session would not know it is waiting for an answer.
+    """
+    if turn.done:
+        graph.update_state(config, _question_values(turn), as_node="assistant")
+
+
+async def asave_question(graph, config, turn: TurnProcessor) -> None:
+    if turn.done:
+        await graph.aupdate_state(config, _question_values(turn), as_node="assistant")
+
+
+def _question_values(turn: TurnProcessor) -> Dict[str, Any]:
+    values = {key: turn.state[key] for key in STATE_KEYS if key in turn.state}
+    values["messages"] = [turn.message]
+    return values
+
+
+def replay_emits(state, after_id: Optional[str] = None) -> List[Tuple[str, Dict[str, Any]]]:
+    """The emits of a restored conversation that came after message `after_id`.
+
+    For a client resuming its thread: the assistant's replies it missed while
+    disconnected, as `bot_response`, and the permission question if the thread
+    is still waiting for its answer, as `user_input_required`. With no or an
+    unknown `after_id` (a reloaded page) the whole conversation is replayed.
+    Nothing is sent to the model.
+    """
+    messages = state['messages']
+    start = 0
+    if after_id:
+        for index, message in enumerate(messages):
+            if message.id == after_id:
+                start = index + 1
+                break
+    last_ai = max((index for index, message in enumerate(messages) if isinstance(message, AIMessage)), default=-1)
+    answered = any(isinstance(message, HumanMessage) for message in messages[last_ai + 1:])
+
+    emits = []
+    for index in range(start, len(messages)):
+        message = messages[index]
+        if not isinstance(message, AIMessage):
+            continue
+        if len(message.content.strip()) > 0:
+            emits.append(('bot_response', {'message': message.content, 'id': message.id}))
+        if index != last_ai or answered:
+            continue
+        for tool_call in message.tool_calls:
+            tool_name = tool_call["name"]
+            if tool_name in PERMISSION_TOOLS and state.get(PERMISSION_STATE_KEYS[tool_name]) is None:
+                emits.append(('user_input_required', {
+                    'tool_name': tool_name,
+                    'tool_call_id': tool_call["id"],
+                    'message': get_permission_question(tool_name),
+                    'id': message.id
+                }))
+                break
+    return emits
+
+
+def _chunk_text(content) -> str:
+    # OpenAI streams str content; Anthropic streams a list of content blocks
+    if isinstance(content, str):
+        return content
+    return "".join(block.get("text", "") for block in content if isinstance(block, dict) and block.get("type") == "text")
@@ -0,0 +1,143 @@
+import argparse
+import csv
+import io
+import logging
+import os
+import pickle
+import threading
+import zipfile
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Offline zip -> (city, state) lookup. The index is a plain dict pickled to
+# disk once (see `python -m src.utils.zip_index`) and loaded at startup, so
+# lookups never touch pandas, pgeocode or the network.
+#
+# The Docker image builds it into the image; the Procfile builds it (with
+# --if-missing) before starting gunicorn, since dyno filesystems start fresh.
+# Local runs must run the command above once or point ZIP_INDEX_PATH at a
+# built index. Without one the server still starts, logs an error and infers
+# no city or state.
+
+DEFAULT_INDEX_PATH = Path(__file__).resolve().parents[2] / "data" / "us_zip_index.pkl"
+INDEX_VERSION = 1
+
+
+class ZipIndex:
+    def __init__(self, entries: Dict[str, Tuple[str, str]]):
+        self.entries = entries
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def lookup(self, zip_code) -> Tuple[Optional[str], Optional[str]]:
+        key = normalize_zip(zip_code)
+        if key is None:
+            return None, None
+        return self.entries.get(key, (None, None))
+
+    def save(self, path: Path = DEFAULT_INDEX_PATH) -> None:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(".tmp")
+        with open(tmp_path, "wb") as f:
+            pickle.dump({"version": INDEX_VERSION, "entries": self.entries}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: Path = DEFAULT_INDEX_PATH) -> "ZipIndex":
+        with open(path, "rb") as f:
+            data = pickle.load(f)
+        if data.get("version") != INDEX_VERSION:
+            raise ValueError(f"Unsupported zip index version in {path}: {data.get('version')}")
+        return cls(data["entries"])
+
+    @classmethod
+    def from_geonames(cls, source) -> "ZipIndex":
+        """Build from a GeoNames postal-code dump (US.txt or US.zip), the same data pgeocode uses."""
+        source = Path(source)
+        if source.suffix == ".zip":
+            with zipfile.ZipFile(source) as archive:
+                text = archive.read("US.txt").decode("utf-8")
+        else:
+            text = source.read_text(encoding="utf-8")
+
+        entries: Dict[str, Tuple[str, str]] = {}
+        names: Dict[str, str] = {}
+        # country, postal_code, place_name, admin_name1, admin_code1, ...
+        for row in csv.reader(io.StringIO(text), delimiter="\t"):
+            if len(row) < 5 or not row[2] or not row[4]:
+                continue
+            key = normalize_zip(row[1])
+            if key is None or key in entries:
+                continue
+            city = names.setdefault(row[2], row[2])
+            state = names.setdefault(row[4], row[4])
+            entries[key] = (city, state)
+        return cls(entries)
+
+    @classmethod
+    def from_pgeocode(cls) -> "ZipIndex":
+        """Build from pgeocode's cached table (downloads it if it is not cached yet)."""
+        import pgeocode
+
+        # _data_unique is the per-zip table query_postal_code reads from.
+        data = pgeocode.Nominatim("us")._data_unique.reset_index()
+        data = data.dropna(subset=["postal_code", "place_name", "state_code"])
+        entries: Dict[str, Tuple[str, str]] = {}
+        for zip_code, city, state in zip(data["postal_code"], data["place_name"], data["state_code"]):
+            key = normalize_zip(zip_code)
+            if key is not None and key not in entries:
+                entries[key] = (str(city), str(state))
+        return cls(entries)
+
+
+def normalize_zip(zip_code) -> Optional[str]:
+    if zip_code is None:
+        return None
+    zip_code = str(zip_code).strip()[:5]
+    if len(zip_code) != 5 or not zip_code.isdigit():
+        return None
+    return zip_code
+
+
+_index: Optional[ZipIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_zip_index() -> ZipIndex:
+    """Return the process-wide index, loading it on first use."""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                path = Path(os.getenv("ZIP_INDEX_PATH", DEFAULT_INDEX_PATH))
+                if path.exists():
+                    _index = ZipIndex.load(path)
+                else:
+                    # Never built (or downloaded) from a serving process
+                    logger.error("Zip index not found at %s; city and state will not be inferred from zip codes. "
+                                 "Build it with `python -m src.utils.zip_index`.", path)
+                    _index = ZipIndex({})
+    return _index
+
+
+def lookup_zip(zip_code) -> Tuple[Optional[str], Optional[str]]:
+    return get_zip_index().lookup(zip_code)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the offline zip -> (city, state) index.")
+    parser.add_argument("--source", help="GeoNames US.txt or US.zip; defaults to pgeocode's cached table")
+    parser.add_argument("--output", default=os.getenv("ZIP_INDEX_PATH", str(DEFAULT_INDEX_PATH)))
+    parser.add_argument("--if-missing", action="store_true", help="do nothing if the output already exists")
+    args = parser.parse_args()
+
+    if args.if_missing and Path(args.output).exists():
+        print(f"Zip index already at {args.output}")
+        raise SystemExit(0)
+    index = ZipIndex.from_geonames(args.source) if args.source else ZipIndex.from_pgeocode()
+    index.save(Path(args.output))
+    print(f"Wrote {len(index)} zip codes to {args.output}")